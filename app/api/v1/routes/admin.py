@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from app.core.security import require_api_key
+from app.services.retriever_provider import reindex
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_api_key)],)
+
+
+@router.post("/reindex")
+def reindex_docs():
+    # sync route: runs in the threadpool, queries keep using the current index
+    return reindex().to_dict()
@@ -1,30 +1,51 @@
+import json
+import logging
+
 from fastapi import APIRouter, Request, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from app.models.ask import QuestionRequest, AnswerData
+from app.core.config import settings
+from app.models.ask import AnswerData, BatchAnswerItem, BatchQuestionRequest, QuestionRequest
 from app.models.common import ApiResponse, ResponseMeta
 from app.services.ask_service import AskService
 from app.services.dependencies import get_ask_service
 from app.core.metrics import STORE, RequestMetrics
 import time
-from app.core.rate_limit import rate_limit_dependency
+from app.core.rate_limit import check_rate_limit, rate_limit_dependency
 from app.core.security import require_api_key
+from app.llm.cache import LLM_CACHE_BYPASS
 
 router = APIRouter(tags=["ask"])
+logger = logging.getLogger("app.ask")
+
+
+async def llm_cache_bypass(request: Request) -> None:
+    # X-LLM-Cache: bypass -> skip cached answers/responses and ask the LLM again
+    # (async so the context variable is set in the endpoint's own context)
+    LLM_CACHE_BYPASS.set(request.headers.get("X-LLM-Cache", "").lower() == "bypass")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
-@router.post("/ask", response_model=ApiResponse, dependencies=[Depends(require_api_key), Depends(rate_limit_dependency)],)
+@router.post("/ask", response_model=ApiResponse, dependencies=[Depends(require_api_key), Depends(rate_limit_dependency), Depends(llm_cache_bypass)],)
 async def ask(
     request: Request,
     payload: QuestionRequest,
     service: AskService = Depends(get_ask_service),
 ):
-    result = await service.answer(payload.question)
+    result = await service.answer(
+        payload.question, nprobe=payload.nprobe, ef_search=payload.ef_search, filters=payload.filters
+    )
 
     meta = ResponseMeta(
         request_id=getattr(request.state, "request_id", None),
         latency_ms=result.latency_ms,
         model=result.model,
         tokens_used=result.tokens_used,
+        cached=result.cached,
     )
 
     data = AnswerData(
@@ -56,4 +77,135 @@ async def ask(
         success=True,
         data=data.model_dump(),
         meta=meta,
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/ask/batch", response_model=ApiResponse, dependencies=[Depends(require_api_key), Depends(llm_cache_bypass)],)
+async def ask_batch(
+    request: Request,
+    payload: BatchQuestionRequest,
+    service: AskService = Depends(get_ask_service),
+):
+    # a batch spends one rate limit slot per question
+    check_rate_limit(request, cost=len(payload.questions))
+    start = time.perf_counter()
+
+    items: list[BatchAnswerItem | None] = [None] * len(payload.questions)
+    valid: list[int] = []
+    for i, question in enumerate(payload.questions):
+        try:
+            QuestionRequest(question=question)
+            valid.append(i)
+        except ValidationError:
+            items[i] = BatchAnswerItem(index=i, success=False, error="Validation error")
+
+    results = await service.answer_batch(
+        [payload.questions[i] for i in valid],
+        nprobe=payload.nprobe,
+        ef_search=payload.ef_search,
+        llm_concurrency=settings.ask_batch_llm_concurrency,
+        filters=payload.filters,
+    )
+
+    req_id = getattr(request.state, "request_id", None)
+    for i, result in zip(valid, results):
+        if result.error:
+            items[i] = BatchAnswerItem(index=i, success=False, error=result.error, latency_ms=result.latency_ms)
+            continue
+        items[i] = BatchAnswerItem(
+            index=i,
+            success=True,
+            data=AnswerData(
+                answer=result.answer,
+                confidence=result.confidence,
+                sources=result.sources or [],
+                used_sources=result.used_sources or [],
+            ),
+            latency_ms=result.latency_ms,
+            model=result.model,
+            tokens_used=result.tokens_used,
+            cached=result.cached,
+        )
+        STORE.add(
+            RequestMetrics(
+                ts=time.time(),
+                request_id=req_id,
+                path=str(request.url.path),
+                method=request.method,
+                status_code=200,
+                latency_ms=result.latency_ms,
+                model=result.model,
+                tokens_used=result.tokens_used,
+                retrieved_k=len(result.sources or []),
+                sources_returned=len(result.sources or []),
+                confidence=result.confidence,
+                answered=(result.answer != "I don't know."),
+            )
+        )
+
+    meta = ResponseMeta(
+        request_id=req_id,
+        latency_ms=(time.perf_counter() - start) * 1000,
+        tokens_used=sum(item.tokens_used or 0 for item in items),
+    )
+    return ApiResponse(
+        success=True,
+        data={
+            "items": [item.model_dump() for item in items],
+            "failed": sum(not item.success for item in items),
+        },
+        meta=meta,
+    )
+
+
+@router.post("/ask/stream", dependencies=[Depends(require_api_key), Depends(rate_limit_dependency), Depends(llm_cache_bypass)],)
+async def ask_stream(
+    request: Request,
+    payload: QuestionRequest,
+    service: AskService = Depends(get_ask_service),
+):
+    """
+    Server-Sent Events: `sources` once retrieval is done, `token` events as the
+    answer is generated, then `done` with the guardrail-checked answer
+    (or `error` if generation fails midway).
+    """
+    req_id = getattr(request.state, "request_id", None)
+
+    async def events():
+        n_sources = 0
+        try:
+            async for event, data in service.answer_stream(
+                payload.question, nprobe=payload.nprobe, ef_search=payload.ef_search, filters=payload.filters
+            ):
+                if event == "sources":
+                    n_sources = len(data["sources"])
+                elif event == "done":
+                    data["request_id"] = req_id
+                    STORE.add(
+                        RequestMetrics(
+                            ts=time.time(),
+                            request_id=req_id,
+                            path=str(request.url.path),
+                            method=request.method,
+                            status_code=200,
+                            latency_ms=data["latency_ms"],
+                            model=data["model"],
+                            tokens_used=data["tokens_used"],
+                            retrieved_k=n_sources,
+                            sources_returned=n_sources,
+                            confidence=data["confidence"],
+                            answered=(data["answer"] != "I don't know."),
+                            ttft_ms=data["ttft_ms"],
+                        )
+                    )
+                yield _sse(event, data)
+        except Exception as e:
+            # headers are already sent; report the failure in-band
+            logger.exception(f"request_id={req_id} answer stream failed")
+            yield _sse("error", {"error": type(e).__name__, "request_id": req_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Depends
 from app.core.metrics import STORE
 from app.core.security import require_api_key
+from app.core.config import settings
+from app.llm.cache import get_response_cache
+from app.rag.embedding_cache import get_embedding_cache
+from app.services.answer_cache import ANSWER_CACHE
+from app.services.singleflight import ASK_SINGLEFLIGHT
 
 router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_api_key)],)
 
@@ -12,4 +17,12 @@ def get_metrics():
 
 @router.get("/summary", dependencies=[Depends(require_api_key)])
 def get_metrics_summary():
-    return STORE.summary()
\ No newline at end of file
+    llm_cache = get_response_cache()
+    embedding_cache = get_embedding_cache(settings.embedding_cache_dir) if settings.embedding_cache_dir else None
+    return {
+        **STORE.summary(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "coalescing": ASK_SINGLEFLIGHT.stats(),
+    }
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 from fastapi import APIRouter
 from app.core.config import settings
+from app.core.metrics import process_memory
+from app.services.retriever_provider import RETRIEVER_PROVIDER, index_generation
 
 router = APIRouter(tags=["meta"])
 
@@ -11,4 +13,7 @@ def version():
         "environment": settings.environment,
         "llm_provider": settings.llm_provider,
         "git_sha": os.getenv("GIT_SHA"),
+        "index": RETRIEVER_PROVIDER.index_info(),
+        # the worker that served this request (uvicorn --workers N)
+        "worker": {**process_memory(), "index_generation": index_generation()},
     }
\ No newline at end of file
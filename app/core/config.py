@@ -18,6 +18,79 @@ class Settings(BaseSettings):
     # LLM/RAG
     llm_provider: str = Field(default="openai", alias="LLM_PROVIDER")
     rag_min_score: float = Field(default=0.05, alias="RAG_MIN_SCORE")
+    rag_chunk_size: int = Field(default=300, alias="RAG_CHUNK_SIZE")
+    rag_chunk_overlap: int = Field(default=50, alias="RAG_CHUNK_OVERLAP")
+    # unit of RAG_CHUNK_SIZE / RAG_CHUNK_OVERLAP: chars | tokens (whitespace-separated)
+    rag_chunk_unit: str = Field(default="chars", alias="RAG_CHUNK_UNIT")
+    # JSONL / CSV exports: record field -> doc_id / text / chunk metadata (comma-separated; empty = all other fields)
+    rag_record_id_field: str = Field(default="id", alias="RAG_RECORD_ID_FIELD")
+    rag_record_text_field: str = Field(default="text", alias="RAG_RECORD_TEXT_FIELD")
+    rag_record_metadata_fields: str = Field(default="", alias="RAG_RECORD_METADATA_FIELDS")
+    embedding_dim: int = Field(default=256, alias="EMBEDDING_DIM")
+    # registered embedder (app.rag.embedding_executor.register_embedder); "hashing" is built in
+    embedding_backend: str = Field(default="hashing", alias="EMBEDDING_BACKEND")
+    # >1 embeds chunk batches of EMBEDDING_BATCH_SIZE in parallel on a thread or process pool
+    embedding_workers: int = Field(default=1, alias="EMBEDDING_WORKERS")
+    embedding_batch_size: int = Field(default=1024, alias="EMBEDDING_BATCH_SIZE")
+    embedding_executor: str = Field(default="thread", alias="EMBEDDING_EXECUTOR")
+    # directory of the on-disk embedding cache (unset disables it)
+    embedding_cache_dir: str | None = Field(default=None, alias="EMBEDDING_CACHE_DIR")
+    # share of the BM25 score in hybrid retrieval (0 = vector search only)
+    rag_hybrid_weight: float = Field(default=0.3, alias="RAG_HYBRID_WEIGHT")
+    # answer cache: exact questions (+ near-duplicates with a min similarity), cleared when the index changes
+    answer_cache_enabled: bool = Field(default=True, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_max_entries: int = Field(default=10000, alias="ANSWER_CACHE_MAX_ENTRIES")
+    answer_cache_max_mb: float = Field(default=64.0, alias="ANSWER_CACHE_MAX_MB")
+    answer_cache_ttl_s: float = Field(default=3600.0, alias="ANSWER_CACHE_TTL_S")
+    # unset = exact matches only; the hashing embedder is blind to word order and negation
+    answer_cache_min_similarity: float | None = Field(default=None, alias="ANSWER_CACHE_MIN_SIMILARITY")
+    ask_coalesce_enabled: bool = Field(default=True, alias="ASK_COALESCE_ENABLED")
+    # pooled async HTTP client for the LLM API
+    llm_connect_timeout_s: float = Field(default=5.0, alias="LLM_CONNECT_TIMEOUT_S")
+    llm_read_timeout_s: float = Field(default=60.0, alias="LLM_READ_TIMEOUT_S")
+    llm_max_connections: int = Field(default=32, alias="LLM_MAX_CONNECTIONS")
+    llm_max_retries: int = Field(default=2, alias="LLM_MAX_RETRIES")
+    # persistent LLM response cache (SQLite file); unset disables it
+    llm_cache_path: str | None = Field(default=None, alias="LLM_CACHE_PATH")
+    llm_cache_max_entries: int = Field(default=50000, alias="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_ttl_s: float | None = Field(default=None, alias="LLM_CACHE_TTL_S")
+    # max concurrent LLM calls per /ask/batch request
+    ask_batch_llm_concurrency: int = Field(default=8, alias="ASK_BATCH_LLM_CONCURRENCY")
+
+    # Index
+    docs_dir: str = Field(default="data/docs", alias="DOCS_DIR")
+    index_snapshot_dir: str | None = Field(default=None, alias="INDEX_SNAPSHOT_DIR")
+    index_verify_corpus: bool = Field(default=False, alias="INDEX_VERIFY_CORPUS")
+    # uvicorn --workers N: all workers mmap one published generation under INDEX_SNAPSHOT_DIR
+    index_shared: bool = Field(default=False, alias="INDEX_SHARED")
+    index_generations_keep: int = Field(default=2, alias="INDEX_GENERATIONS_KEEP")
+    index_generation_poll_s: float = Field(default=1.0, alias="INDEX_GENERATION_POLL_S")  # 0 disables
+    docs_watch_interval_s: float = Field(default=5.0, alias="DOCS_WATCH_INTERVAL_S")  # 0 disables
+    # index type: flat | ivf_flat | ivf_pq | hnsw | sparse (nprobe / ef_search only affect search)
+    faiss_index_type: str = Field(default="flat", alias="FAISS_INDEX_TYPE")
+    faiss_nlist: int = Field(default=1024, alias="FAISS_NLIST")
+    faiss_nprobe: int = Field(default=16, alias="FAISS_NPROBE")
+    faiss_pq_m: int = Field(default=16, alias="FAISS_PQ_M")
+    faiss_pq_bits: int = Field(default=8, alias="FAISS_PQ_BITS")
+    faiss_hnsw_m: int = Field(default=32, alias="FAISS_HNSW_M")
+    faiss_ef_construction: int = Field(default=40, alias="FAISS_EF_CONSTRUCTION")
+    faiss_ef_search: int = Field(default=64, alias="FAISS_EF_SEARCH")
+    # vector storage of flat / ivf_flat / hnsw: float32 | fp16 | int8
+    faiss_quantization: str = Field(default="float32", alias="FAISS_QUANTIZATION")
+    # split the index into N shards searched in parallel; shard_by: chunk | doc
+    faiss_shards: int = Field(default=1, alias="FAISS_SHARDS")
+    faiss_shard_by: str = Field(default="chunk", alias="FAISS_SHARD_BY")
+    # /ask micro-batching: concurrent retrievals share one FAISS search (RETRIEVAL_BATCH_MAX=1 disables)
+    retrieval_batch_max: int = Field(default=32, alias="RETRIEVAL_BATCH_MAX")
+    retrieval_batch_wait_ms: float = Field(default=0.0, alias="RETRIEVAL_BATCH_WAIT_MS")
+    # query rows from which flat search uses one BLAS product (applied at startup; FAISS default 20)
+    faiss_blas_threshold: int = Field(default=3, alias="FAISS_BLAS_THRESHOLD")
+    retriever_background_init: bool = Field(default=True, alias="RETRIEVER_BACKGROUND_INIT")
+    retriever_warmup: bool = Field(default=False, alias="RETRIEVER_WARMUP")
+    retriever_warmup_queries: str = Field(
+        default="password expiry policy,access approval,incident reporting",
+        alias="RETRIEVER_WARMUP_QUERIES",
+    )
 
     # Security/ops
     api_key: str | None = Field(default=None, alias="API_KEY")
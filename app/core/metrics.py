@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from threading import Lock
 from typing import Optional, Dict, Any, List
+import os
 import time
 
 
@@ -23,6 +24,7 @@ class RequestMetrics:
     sources_returned: Optional[int] = None
     confidence: Optional[float] = None
     answered: Optional[bool] = None   # True if not "I don't know."
+    ttft_ms: Optional[float] = None   # time to first answer token (streaming only)
 
 
 class MetricsStore:
@@ -52,11 +54,13 @@ class MetricsStore:
                 "avg_latency_ms": None,
                 "avg_tokens": None,
                 "answered_rate": None,
+                "avg_ttft_ms": None,
             }
 
         latencies = [x.latency_ms for x in items if x.latency_ms is not None]
         tokens = [x.tokens_used for x in items if x.tokens_used is not None]
         answered = [x.answered for x in items if x.answered is not None]
+        ttfts = [x.ttft_ms for x in items if x.ttft_ms is not None]
 
         def avg(vals):
             return (sum(vals) / len(vals)) if vals else None
@@ -70,8 +74,35 @@ class MetricsStore:
             "avg_latency_ms": avg(latencies),
             "avg_tokens": avg(tokens),
             "answered_rate": answered_rate,
+            "avg_ttft_ms": avg(ttfts),
         }
 
 
+_SMAPS_FIELDS = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb"}
+
+
+def process_memory(pid: int | str = "self") -> Dict[str, Any]:
+    """
+    Resident memory of a process in MB, from /proc/<pid>/smaps_rollup (Linux).
+    rss counts every page the process maps, so pages shared between uvicorn
+    workers (a memory-mapped index) count in each of them; pss splits a
+    shared page between the processes mapping it and sums to the real total.
+    All None where smaps_rollup is unavailable.
+    """
+    memory: Dict[str, Any] = {"pid": os.getpid() if pid == "self" else int(pid)}
+    memory.update(dict.fromkeys(("rss_mb", "pss_mb", "shared_mb")))
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return memory
+    for line in lines:
+        name, _, value = line.partition(":")
+        key = _SMAPS_FIELDS.get(name)
+        if key is not None:
+            memory[key] = (memory[key] or 0.0) + int(value.split()[0]) / 1024
+    return memory
+
+
 # Global singleton store
 STORE = MetricsStore(max_items=500)
\ No newline at end of file
@@ -12,7 +12,16 @@ class RateLimiter:
         self._events = {}
         self._lock = Lock()
 
-    def check(self, key: str) -> None:
+    def check(self, key: str, cost: int = 1) -> None:
+        """
+        Record `cost` events for key, or raise 429 if they don't fit in the window.
+        A cost above the whole budget could never fit, so it gets a 413 instead.
+        """
+        if cost > self.max_requests:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{cost} requests exceed the rate limit of {self.max_requests} per {self.window_seconds}s",
+            )
         now = time.time()
         with self._lock:
             q = self._events.get(key)
@@ -24,15 +33,15 @@ class RateLimiter:
             while q and (now - q[0]) > self.window_seconds:
                 q.popleft()
 
-            if len(q) >= self.max_requests:
+            if len(q) + cost > self.max_requests:
                 raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-            q.append(now)
+            q.extend([now] * cost)
 
 # global limiter: 30 requests/min per key
 LIMITER = RateLimiter(max_requests=30, window_seconds=60)
 
-def rate_limit_dependency(request: Request):
+def check_rate_limit(request: Request, cost: int = 1) -> None:
     # Disable rate limiting during tests or local dev if configured
     if settings.disable_rate_limit:
         return
@@ -40,4 +49,7 @@ def rate_limit_dependency(request: Request):
     api_key = request.headers.get("X-API-Key")
     client_ip = request.client.host if request.client else "unknown"
     key = api_key or client_ip
-    LIMITER.check(key)
\ No newline at end of file
+    LIMITER.check(key, cost=cost)
+
+def rate_limit_dependency(request: Request):
+    check_rate_limit(request)
\ No newline at end of file
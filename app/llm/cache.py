@@ -0,0 +1,198 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Type
+
+from app.core.config import settings
+from app.llm.client import AsyncLLMClient, LLMResult, LLMStreamChunk, T
+
+# Set per request (X-LLM-Cache: bypass): skip lookups but still store the fresh response.
+LLM_CACHE_BYPASS: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_SCHEMA_KEYS: Dict[type, str] = {}
+
+
+def _schema_key(schema: type) -> str:
+    # model_json_schema() is slow-ish; compute once per schema class
+    key = _SCHEMA_KEYS.get(schema)
+    if key is None:
+        key = _SCHEMA_KEYS[schema] = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return key
+
+
+def prompt_key(prompt: str, model: str, schema: type) -> str:
+    h = hashlib.sha256()
+    for part in (model, _schema_key(schema), prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed store of validated LLM responses, keyed by prompt_key().
+    Keys and LRU order live in memory, so a miss never touches SQLite and a hit
+    is one primary-key read. Writes (misses only) go through WAL with
+    synchronous=NORMAL: no fsync per insert. Rows beyond max_entries are evicted
+    least recently used first; on restart the order falls back to insertion time.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 50_000, ttl_s: Optional[float] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " tokens_used INTEGER, created_at REAL NOT NULL)"
+        )
+        # key -> created_at, least recently used first
+        self._index: "OrderedDict[str, float]" = OrderedDict(
+            self._db.execute("SELECT key, created_at FROM responses ORDER BY created_at")
+        )
+        self._evict_over_limit()
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, LLMResult]]:
+        """(response JSON, raw result as first produced) or None."""
+        with self._lock:
+            created_at = self._index.get(key)
+            if created_at is None:
+                self.misses += 1
+                return None
+            if self.ttl_s is not None and time.time() - created_at > self.ttl_s:
+                self._delete([key])
+                self.misses += 1
+                return None
+            row = self._db.execute(
+                "SELECT model, response, tokens_used FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:  # deleted by another process sharing the file
+                del self._index[key]
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            self.tokens_saved += row[2] or 0
+        model, response, tokens_used = row
+        return response, LLMResult(text=response, model=model, tokens_used=tokens_used)
+
+    def put(self, key: str, response: str, raw: LLMResult) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, tokens_used, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, raw.model, response, raw.tokens_used, now),
+            )
+            self._index.pop(key, None)
+            self._index[key] = now
+            self._evict_over_limit()
+
+    def _evict_over_limit(self) -> None:
+        over = len(self._index) - self.max_entries
+        if over > 0:
+            self._delete([k for k, _ in zip(self._index, range(over))])
+
+    def _delete(self, keys: list) -> None:
+        for k in keys:
+            self._index.pop(k, None)
+        self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in keys])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._index.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "tokens_saved": self.tokens_saved,
+            }
+
+
+class CachingLLMClient(AsyncLLMClient):
+    """
+    Wraps any AsyncLLMClient. Structured calls with a prompt, model and schema
+    seen before are answered from the LLMResponseCache (tokens_used=0) instead
+    of being sent again; new responses are stored once they validate.
+    """
+
+    def __init__(self, inner: AsyncLLMClient, cache: LLMResponseCache):
+        self.inner = inner
+        self.cache = cache
+        self.model = getattr(inner, "model", type(inner).__name__)
+
+    def _lookup(self, prompt: str, schema: Type[T]) -> Tuple[str, Optional[Tuple[T, LLMResult]]]:
+        key = prompt_key(prompt, self.model, schema)
+        if LLM_CACHE_BYPASS.get():
+            return key, None
+        hit = self.cache.get(key)
+        if hit is None:
+            return key, None
+        response, raw = hit
+        return key, (schema.model_validate_json(response), LLMResult(text=raw.text, model=raw.model, tokens_used=0))
+
+    async def generate(self, prompt: str) -> LLMResult:
+        return await self.inner.generate(prompt)
+
+    async def generate_structured(self, prompt: str, schema: Type[T]) -> tuple[T, LLMResult]:
+        key, hit = self._lookup(prompt, schema)
+        if hit is not None:
+            return hit
+        parsed, raw = await self.inner.generate_structured(prompt, schema)
+        self.cache.put(key, parsed.model_dump_json(), raw)
+        return parsed, raw
+
+    async def stream_structured(self, prompt: str, schema: Type[T]) -> AsyncIterator[LLMStreamChunk[T]]:
+        key, hit = self._lookup(prompt, schema)
+        if hit is not None:
+            parsed, raw = hit
+            yield LLMStreamChunk(delta=getattr(parsed, "answer", ""))
+            yield LLMStreamChunk(parsed=parsed, raw=raw)
+            return
+        async for chunk in self.inner.stream_structured(prompt, schema):
+            if chunk.parsed is not None:
+                self.cache.put(key, chunk.parsed.model_dump_json(), chunk.raw)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+_CACHES: Dict[str, LLMResponseCache] = {}
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Process-wide cache for LLM_CACHE_PATH (None when unset)."""
+    if not settings.llm_cache_path:
+        return None
+    cache = _CACHES.get(settings.llm_cache_path)
+    if cache is None:
+        cache = _CACHES[settings.llm_cache_path] = LLMResponseCache(
+            settings.llm_cache_path,
+            max_entries=settings.llm_cache_max_entries,
+            ttl_s=settings.llm_cache_ttl_s,
+        )
+    return cache
@@ -1,10 +1,14 @@
+import asyncio
 import re
 import os
 from dataclasses import dataclass
-from typing import Type, TypeVar
+from typing import AsyncIterator, Dict, Generic, Optional, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
 
+from app.core.config import settings
+from app.llm.streaming import AnswerFieldExtractor
+
 T = TypeVar("T", bound=BaseModel)
 
 
@@ -15,6 +19,17 @@ class LLMResult:
     tokens_used: int | None = None
 
 
+@dataclass
+class LLMStreamChunk(Generic[T]):
+    """
+    One step of a structured stream: `delta` is newly generated answer text;
+    the last chunk instead carries the parsed object and the raw result.
+    """
+    delta: str = ""
+    parsed: Optional[T] = None
+    raw: Optional[LLMResult] = None
+
+
 class LLMClient:
     def generate(self, prompt: str) -> LLMResult:
         raise NotImplementedError
@@ -121,6 +136,161 @@ class OpenAILLMClient(LLMClient):
             return parsed, LLMResult(text=text, model=self.model, tokens_used=tokens_used)
 
 
+class AsyncLLMClient:
+    """
+    Async counterpart of LLMClient: awaiting a completion never blocks the
+    event loop, so concurrent /ask requests overlap their LLM calls.
+    """
+
+    async def generate(self, prompt: str) -> LLMResult:
+        raise NotImplementedError
+
+    async def generate_structured(self, prompt: str, schema: Type[T]) -> tuple[T, LLMResult]:
+        raise NotImplementedError
+
+    async def stream_structured(self, prompt: str, schema: Type[T]) -> AsyncIterator[LLMStreamChunk[T]]:
+        """
+        Yields the schema's `answer` text as it is generated, then a final chunk
+        with the parsed object. Default: no streaming, one delta with the whole answer.
+        """
+        parsed, raw = await self.generate_structured(prompt, schema)
+        yield LLMStreamChunk(delta=getattr(parsed, "answer", ""))
+        yield LLMStreamChunk(parsed=parsed, raw=raw)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class AsyncStubLLMClient(AsyncLLMClient):
+    model = "stub-llm"
+
+    def __init__(self):
+        self._stub = StubLLMClient()
+
+    async def generate(self, prompt: str) -> LLMResult:
+        return self._stub.generate(prompt)
+
+    async def generate_structured(self, prompt: str, schema: Type[T]) -> tuple[T, LLMResult]:
+        return self._stub.generate_structured(prompt, schema)
+
+    async def stream_structured(self, prompt: str, schema: Type[T]) -> AsyncIterator[LLMStreamChunk[T]]:
+        # synthetic tokens: the stub answer split into words
+        parsed, raw = self._stub.generate_structured(prompt, schema)
+        for token in re.findall(r"\S+\s*", getattr(parsed, "answer", "")):
+            await asyncio.sleep(0)
+            yield LLMStreamChunk(delta=token)
+        yield LLMStreamChunk(parsed=parsed, raw=raw)
+
+
+class AsyncOpenAILLMClient(AsyncLLMClient):
+    """
+    Holds one AsyncOpenAI client, and with it one httpx connection pool, for its
+    whole lifetime. Calls reuse warm keep-alive connections instead of paying
+    TCP + TLS setup per request; max_connections caps concurrent calls upstream.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str | None = None,
+        connect_timeout_s: float = 5.0,
+        read_timeout_s: float = 60.0,
+        max_connections: int = 32,
+        max_retries: int = 2,
+    ):
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        self.model = model
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=max_retries,
+            http_client=DefaultAsyncHttpxClient(
+                timeout=httpx.Timeout(read_timeout_s, connect=connect_timeout_s),
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            ),
+        )
+
+    async def generate(self, prompt: str) -> LLMResult:
+        resp = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+        )
+        text = (resp.choices[0].message.content or "").strip()
+        usage = getattr(resp, "usage", None)
+        tokens_used = getattr(usage, "total_tokens", None) if usage else None
+        return LLMResult(text=text, model=self.model, tokens_used=tokens_used)
+
+    async def generate_structured(self, prompt: str, schema: Type[T]) -> tuple[T, LLMResult]:
+        """
+        Uses Structured Outputs when available; falls back to manual JSON parsing.
+        Connection errors and timeouts are raised, not retried through the fallback.
+        """
+        from openai import APIConnectionError
+
+        try:
+            resp = await self._client.chat.completions.parse(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format=schema,
+                temperature=0.2,
+            )
+            parsed: T = resp.choices[0].message.parsed
+            usage = getattr(resp, "usage", None)
+            tokens_used = getattr(usage, "total_tokens", None) if usage else None
+            raw = LLMResult(text=parsed.model_dump_json(), model=self.model, tokens_used=tokens_used)
+            return parsed, raw
+        except APIConnectionError:
+            raise
+        except Exception:
+            resp = await self._client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                response_format={"type": "json_object"},
+            )
+            text = (resp.choices[0].message.content or "").strip()
+            usage = getattr(resp, "usage", None)
+            tokens_used = getattr(usage, "total_tokens", None) if usage else None
+
+            parsed = schema.model_validate_json(text)
+            return parsed, LLMResult(text=text, model=self.model, tokens_used=tokens_used)
+
+    async def stream_structured(self, prompt: str, schema: Type[T]) -> AsyncIterator[LLMStreamChunk[T]]:
+        """
+        Streams Structured Outputs and forwards the `answer` field as it is decoded
+        from the partial JSON; the final chunk carries the validated object.
+        """
+        extractor = AnswerFieldExtractor()
+        async with self._client.chat.completions.stream(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=schema,
+            temperature=0.2,
+            stream_options={"include_usage": True},
+        ) as stream:
+            async for event in stream:
+                if event.type == "content.delta":
+                    delta = extractor.feed(event.delta)
+                    if delta:
+                        yield LLMStreamChunk(delta=delta)
+            completion = await stream.get_final_completion()
+
+        parsed: T = completion.choices[0].message.parsed
+        usage = getattr(completion, "usage", None)
+        tokens_used = getattr(usage, "total_tokens", None) if usage else None
+        yield LLMStreamChunk(
+            parsed=parsed,
+            raw=LLMResult(text=parsed.model_dump_json(), model=self.model, tokens_used=tokens_used),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+
 def get_llm_client() -> LLMClient:
     provider = os.getenv("LLM_PROVIDER", "stub").lower()
     if provider == "openai":
@@ -128,4 +298,57 @@ def get_llm_client() -> LLMClient:
         model = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
         if api_key:
             return OpenAILLMClient(api_key=api_key, model=model)
-    return StubLLMClient()
\ No newline at end of file
+    return StubLLMClient()
+
+
+_ASYNC_STUB = AsyncStubLLMClient()
+# (api_key, model, base_url) -> (client, event loop its connection pool belongs to)
+_ASYNC_CLIENTS: Dict[Tuple[str, str, Optional[str]], Tuple[AsyncLLMClient, asyncio.AbstractEventLoop]] = {}
+
+
+def get_async_llm_client() -> AsyncLLMClient:
+    """
+    Process-wide async client, created on first use and reused afterwards.
+    Call from async code: pooled connections are tied to the running event loop,
+    so a client created under another loop (e.g. a previous TestClient) is replaced.
+    With LLM_CACHE_PATH set, structured calls go through the persistent response cache.
+    """
+    from app.llm.cache import CachingLLMClient, get_response_cache
+
+    client = _base_async_client()
+    cache = get_response_cache()
+    return CachingLLMClient(client, cache) if cache is not None else client
+
+
+def _base_async_client() -> AsyncLLMClient:
+    provider = os.getenv("LLM_PROVIDER", "stub").lower()
+    if provider == "openai":
+        api_key = os.getenv("OPENAI_API_KEY", "").strip()
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()
+        base_url = os.getenv("OPENAI_BASE_URL", "").strip() or None
+        if api_key:
+            key = (api_key, model, base_url)
+            loop = asyncio.get_running_loop()
+            cached = _ASYNC_CLIENTS.get(key)
+            if cached is None or cached[1] is not loop:
+                client = AsyncOpenAILLMClient(
+                    api_key=api_key,
+                    model=model,
+                    base_url=base_url,
+                    connect_timeout_s=settings.llm_connect_timeout_s,
+                    read_timeout_s=settings.llm_read_timeout_s,
+                    max_connections=settings.llm_max_connections,
+                    max_retries=settings.llm_max_retries,
+                )
+                cached = _ASYNC_CLIENTS[key] = (client, loop)
+            return cached[0]
+    return _ASYNC_STUB
+
+
+async def aclose_llm_clients() -> None:
+    """Close pooled connections owned by the running loop (app shutdown)."""
+    loop = asyncio.get_running_loop()
+    for key, (client, owner) in list(_ASYNC_CLIENTS.items()):
+        if owner is loop:
+            del _ASYNC_CLIENTS[key]
+            await client.aclose()
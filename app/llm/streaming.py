@@ -0,0 +1,64 @@
+import json
+import re
+
+_ANSWER_START = re.compile(r'"answer"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class AnswerFieldExtractor:
+    """
+    Pulls the decoded value of the top-level "answer" string out of a JSON
+    object that arrives in arbitrary text fragments, so answer tokens can be
+    forwarded while the model is still writing the rest of the object.
+    feed() returns the newly decoded characters (possibly "").
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = -1  # index into _buf of the next undecoded answer char; -1 until found
+        self.done = False
+
+    def feed(self, fragment: str) -> str:
+        if self.done:
+            return ""
+        self._buf += fragment
+        if self._pos < 0:
+            m = _ANSWER_START.search(self._buf)
+            if not m:
+                return ""
+            self._pos = m.end()
+
+        out = []
+        buf, i = self._buf, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # escape sequence: wait for the rest of it if the fragment split it
+            if i + 1 >= len(buf):
+                break
+            code = buf[i + 1]
+            if code == "u":
+                if i + 6 > len(buf):
+                    break
+                # surrogate pairs come as two \u escapes; decode them together
+                if 0xD800 <= int(buf[i + 2:i + 6], 16) < 0xDC00:
+                    if i + 12 > len(buf):
+                        break
+                    out.append(json.loads(f'"{buf[i:i + 12]}"'))
+                    i += 12
+                else:
+                    out.append(chr(int(buf[i + 2:i + 6], 16)))
+                    i += 6
+                continue
+            out.append(_ESCAPES.get(code, code))
+            i += 2
+
+        self._pos = i
+        return "".join(out)
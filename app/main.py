@@ -1,5 +1,8 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 
 
 from app.api.v1.router import api_router
@@ -9,20 +12,57 @@ from app.core.errors import validation_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
+from app.llm.client import aclose_llm_clients
+from app.rag.vector_store import set_blas_threshold
+from app.services.docs_watcher import DocsWatcher
+from app.services.retrieval_batcher import RETRIEVAL_BATCHER
+from app.services.retriever_provider import RETRIEVER_PROVIDER, follow_generation, reindex, shared_index
+from app.services.shared_index import GenerationWatcher
+
 from app.core.config import settings
 
+def _split_csv(value: str) -> list[str]:
+    return [x.strip() for x in value.split(",") if x.strip()]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Batched retrieval: multi-row flat searches go through BLAS sooner
+    default_blas_threshold = set_blas_threshold(settings.faiss_blas_threshold)
+    # Build/load the index without blocking /health (unless configured otherwise)
+    warmup = _split_csv(settings.retriever_warmup_queries) if settings.retriever_warmup else []
+    RETRIEVER_PROVIDER.start(background=settings.retriever_background_init, warmup_queries=warmup)
+
+    # Hot reload: rebuild changed docs in the background and swap the index in
+    watcher = None
+    if settings.docs_watch_interval_s > 0:
+        watcher = DocsWatcher(settings.docs_dir, on_change=reindex, interval_s=settings.docs_watch_interval_s)
+        watcher.start()
+    # Shared index: follow the generations other workers publish
+    follower = None
+    if settings.index_shared and settings.index_generation_poll_s > 0:
+        follower = GenerationWatcher(
+            shared_index().generations, on_change=follow_generation, interval_s=settings.index_generation_poll_s
+        )
+        follower.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    if follower is not None:
+        follower.stop()
+    await RETRIEVAL_BATCHER.stop()
+    await aclose_llm_clients()
+    set_blas_threshold(default_blas_threshold)
+
 def create_app() -> FastAPI:
     configure_logging(settings.log_level)
 
     app = FastAPI(
         title=settings.app_name,
         version="1.0.0",
-        description="RAG-based AI system with guardrails and testing"
+        description="RAG-based AI system with guardrails and testing",
+        lifespan=lifespan,
     )
 
-    def _split_csv(value: str) -> list[str]:
-        return [x.strip() for x in value.split(",") if x.strip()]
-
     # Trusted hosts (Host header protection)
     app.add_middleware(
         TrustedHostMiddleware,
@@ -52,6 +92,12 @@ def create_app() -> FastAPI:
             "app_name": settings.app_name,
             "environment": settings.environment,
         }
+
+    @app.get("/ready")
+    def ready():
+        # Readiness (index loaded) is separate from liveness (/health)
+        status = RETRIEVER_PROVIDER.status()
+        return JSONResponse(status_code=200 if RETRIEVER_PROVIDER.ready else 503, content=status)
     
     # Versioned API
     app.include_router(api_router)
@@ -1,9 +1,29 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, List, Optional, Union
+
+# metadata field -> allowed value(s), e.g. {"source_file": ["policy_access.txt"]}
+MetadataFilters = Dict[str, Union[str, List[str]]]
 
 
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=3, max_length=2000)
+    # approximate-index search knobs; default to FAISS_NPROBE / FAISS_EF_SEARCH
+    nprobe: Optional[int] = Field(default=None, ge=1, le=4096)
+    ef_search: Optional[int] = Field(default=None, ge=1, le=4096)
+    # only chunks matching every field (any of its listed values) are searched
+    filters: Optional[MetadataFilters] = Field(default=None, max_length=8)
+
+
+# upper bound on questions per /ask/batch call
+MAX_BATCH_QUESTIONS = 256
+
+
+class BatchQuestionRequest(BaseModel):
+    # items are validated one by one, so a bad question fails only its own item
+    questions: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUESTIONS)
+    nprobe: Optional[int] = Field(default=None, ge=1, le=4096)
+    ef_search: Optional[int] = Field(default=None, ge=1, le=4096)
+    filters: Optional[MetadataFilters] = Field(default=None, max_length=8)
 
 
 class SourceItem(BaseModel):
@@ -16,4 +36,15 @@ class AnswerData(BaseModel):
     answer: str
     sources: List[SourceItem] = []
     used_sources: List[str] = []
-    confidence: Optional[float] = None
\ No newline at end of file
+    confidence: Optional[float] = None
+
+
+class BatchAnswerItem(BaseModel):
+    index: int
+    success: bool
+    data: Optional[AnswerData] = None
+    error: Optional[str] = None
+    latency_ms: Optional[float] = None
+    model: Optional[str] = None
+    tokens_used: Optional[int] = None
+    cached: Optional[str] = None
@@ -6,6 +6,7 @@ class ResponseMeta(BaseModel):
     latency_ms: Optional[float] = None
     model: Optional[str] = None
     tokens_used: Optional[int] = None
+    cached: Optional[str] = None  # "exact" / "semantic" for answer cache hits
 
 class ApiResponse(BaseModel):
     success: bool
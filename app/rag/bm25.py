@@ -0,0 +1,354 @@
+import re
+import struct
+import zipfile
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.documents import Chunk
+
+BM25_FILE = "bm25.npz"
+
+_TOKEN = re.compile(r"\w+")
+# zip local file header: fixed part, then file name and extra field
+_ZIP_HEADER = 30
+# term frequencies are stored as uint16; BM25 saturates long before this
+_MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; punctuation splits ("SEC-2041" -> "sec", "2041")."""
+    return _TOKEN.findall(text.lower())
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class Segment:
+    """Immutable CSR postings: for buckets[j], ids / weights in [offsets[j], offsets[j + 1])."""
+
+    __slots__ = ("buckets", "offsets", "ids", "weights")
+
+    def __init__(self, buckets: np.ndarray, offsets: np.ndarray, ids: np.ndarray, weights: np.ndarray):
+        self.buckets = buckets
+        self.offsets = offsets
+        self.ids = ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, terms: np.ndarray, ids: np.ndarray, weights: np.ndarray) -> "Segment":
+        order = np.argsort(terms, kind="stable")
+        terms = terms[order]
+        buckets, starts = np.unique(terms, return_index=True)
+        offsets = np.append(starts, len(terms)).astype(np.int64)
+        return cls(buckets.astype(np.int32), offsets, ids[order], weights[order])
+
+    @property
+    def nnz(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.buckets, self.offsets, self.ids, self.weights))
+
+    def terms(self) -> np.ndarray:
+        return np.repeat(self.buckets, np.diff(self.offsets))
+
+    def ranges(self, buckets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(which query buckets are present here, their posting starts, ends)."""
+        if not len(self.buckets):
+            return np.zeros(len(buckets), dtype=bool), self.offsets[:0], self.offsets[:0]
+        pos = np.minimum(np.searchsorted(self.buckets, buckets), len(self.buckets) - 1)
+        hit = self.buckets[pos] == buckets
+        return hit, self.offsets[pos[hit]], self.offsets[pos[hit] + 1]
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    out = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    out[: len(array)] = array
+    return out
+
+
+class _Vocab(dict):
+    """term -> term id; looking up an unknown term assigns the next id."""
+
+    def __missing__(self, term: str) -> int:
+        tid = self[term] = len(self)
+        return tid
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunks, keyed by the same int64 ids as FaissVectorStore.
+    Postings (term id -> chunk ids / term frequencies) live in a few immutable
+    CSR segments, as in SparseIndex: add() tokenizes only the added chunks,
+    appends their postings as a segment and merges neighbours of similar
+    size; remove() only zeroes doc_len, and the dead postings are dropped
+    when a merge next touches them. copy() shares the segments, so a delta
+    reindex costs what it adds, not the size of the corpus.
+    Only the vocabulary is a Python dict (term -> term id).
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = _Vocab()
+        self.segments: List[Segment] = []
+        # indexed by chunk id: token count (0 = not in the index) / removed, postings not dropped yet
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.stale = np.zeros(0, dtype=bool)
+        # distinct terms per chunk id (its posting count); derived lazily for loaded indexes
+        self._terms_by_id: Optional[np.ndarray] = np.zeros(0, dtype=np.int32)
+        self._num_docs = 0
+        self._total_len = 0.0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_len / self._num_docs if self._num_docs else 0.0
+
+    @property
+    def nnz(self) -> int:
+        return sum(s.nnz for s in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self.segments) + self.doc_len.nbytes + self.stale.nbytes
+
+    @classmethod
+    def from_chunks(cls, ids: Sequence[int], chunks: Sequence[Chunk], **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        index.add(ids, [c.text for c in chunks])
+        return index
+
+    def _terms_per_id(self) -> np.ndarray:
+        if self._terms_by_id is None:
+            counts = [np.bincount(s.ids, minlength=len(self.doc_len)) for s in self.segments]
+            self._terms_by_id = np.sum(counts, axis=0, dtype=np.int32) if counts else np.zeros(
+                len(self.doc_len), dtype=np.int32
+            )
+        return self._terms_by_id
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(texts):
+            raise ValueError("ids length must match texts")
+        if not len(ids):
+            return
+        known = ids[ids < len(self.doc_len)]
+        if (self.doc_len[known] > 0).any():
+            raise ValueError("ids already present in the BM25 index")
+
+        tokens = [tokenize(t) for t in texts]
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        # one (chunk row, term id) pair per token; unknown terms get new ids on lookup
+        term_ids = np.fromiter(
+            map(self.vocab.__getitem__, chain.from_iterable(tokens)), dtype=np.int64, count=int(lengths.sum())
+        )
+        rows = np.repeat(np.arange(len(ids), dtype=np.int64), lengths)
+        vocab_size = max(len(self.vocab), 1)
+        pairs, tfs = np.unique(rows * vocab_size + term_ids, return_counts=True)
+
+        terms_by_id = self._terms_per_id()
+        size = int(ids.max()) + 1
+        self.doc_len = _grow(self.doc_len, size)
+        self.stale = _grow(self.stale, size)
+        terms_by_id = self._terms_by_id = _grow(terms_by_id, size)
+        if self.stale[ids].any():
+            # old postings of a re-added id must go before the new ones arrive
+            self._compact()
+        # chunks without tokens can never match; they are left out (doc_len 0)
+        self.doc_len[ids] = lengths
+        terms_by_id[ids] = np.bincount(pairs // vocab_size, minlength=len(ids))
+        self._num_docs += int(np.count_nonzero(lengths))
+        self._total_len += float(lengths.sum())
+
+        if len(pairs):
+            self.segments.append(
+                Segment.build(pairs % vocab_size, ids[pairs // vocab_size], np.minimum(tfs, _MAX_TF).astype(np.uint16))
+            )
+            while len(self.segments) > 1 and self.segments[-2].nnz <= 2 * self.segments[-1].nnz:
+                last = self.segments.pop()
+                self.segments[-1] = self._merge([self.segments[-1], last])
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Remove chunks by id. Returns how many were removed."""
+        ids = np.unique(np.asarray([i for i in ids if 0 <= i < len(self.doc_len)], dtype=np.int64))
+        ids = ids[self.doc_len[ids] > 0]
+        if not len(ids):
+            return 0
+        self._num_docs -= len(ids)
+        self._total_len -= float(self.doc_len[ids].sum())
+        self._dead += int(self._terms_per_id()[ids].sum())
+        self.doc_len[ids] = 0
+        self.stale[ids] = True
+        if self._dead * 2 > self.nnz:
+            self._compact()
+        return len(ids)
+
+    def _live(self, segments: Sequence[Segment]) -> Segment:
+        """One segment with the postings of segments that belong to chunks still indexed."""
+        terms = np.concatenate([s.terms() for s in segments])
+        ids = np.concatenate([s.ids for s in segments])
+        tfs = np.concatenate([s.weights for s in segments])
+        live = self.doc_len[ids] > 0
+        return Segment.build(terms[live], ids[live], tfs[live])
+
+    def _merge(self, segments: Sequence[Segment]) -> Segment:
+        merged = self._live(segments)
+        self._dead -= sum(s.nnz for s in segments) - merged.nnz
+        return merged
+
+    def _compact(self) -> None:
+        """Merge everything into one segment, dropping all removed postings."""
+        self.segments = [self._merge(self.segments)] if self.segments else []
+        self.stale[:] = False
+        self._dead = 0
+
+    def copy(self) -> "BM25Index":
+        """Independent copy (updates are applied off to the side, like FaissVectorStore.copy)."""
+        other = BM25Index(k1=self.k1, b=self.b)
+        other.vocab = _Vocab(self.vocab)
+        # segments are immutable: shared
+        other.segments = list(self.segments)
+        other.doc_len = np.array(self.doc_len)
+        other.stale = self.stale.copy()
+        other._terms_by_id = self._terms_per_id().copy()
+        other._num_docs = self._num_docs
+        other._total_len = self._total_len
+        other._dead = self._dead
+        return other
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (chunk ids, scores) of every chunk containing a query term, ids ascending.
+        Scores are normalized to 0..1: each query term contributes at most
+        idf * (k1 + 1), and the sum of those bounds maps to 1. Terms missing
+        from the corpus count with the highest idf, so a query that matches on
+        one common word out of several scores low.
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+        terms = set(tokenize(query))
+        tids = np.array(sorted(self.vocab[t] for t in terms if t in self.vocab), dtype=np.int32)
+        if not len(tids) or not self._num_docs:
+            return empty
+
+        docs, tfs, which = [], [], []
+        for seg in self.segments:
+            hit, starts, ends = seg.ranges(tids)
+            for t, s, e in zip(np.flatnonzero(hit).tolist(), starts.tolist(), ends.tolist()):
+                docs.append(seg.ids[s:e])
+                tfs.append(seg.weights[s:e])
+                which.append(np.full(e - s, t, dtype=np.int64))
+        if not docs:
+            return empty
+        docs, tf, which = np.concatenate(docs), np.concatenate(tfs).astype(np.float32), np.concatenate(which)
+        # postings of removed chunks stay in their segment until the next merge
+        live = self.doc_len[docs] > 0
+        docs, tf, which = docs[live], tf[live], which[live]
+        # terms whose chunks were all removed stay in the vocabulary with no postings
+        df = np.bincount(which, minlength=len(tids)).astype(np.float64)
+        present = df > 0
+        if not present.any():
+            return empty
+        idf = np.log1p((self._num_docs - df + 0.5) / (df + 0.5))
+
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+        contrib = idf[which].astype(np.float32) * tf * (self.k1 + 1) / (tf + norm)
+
+        # sum per document: candidates are only the docs in the query terms' postings
+        unique, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=contrib, minlength=len(unique))
+        unseen = len(terms) - int(present.sum())
+        bound = idf[present].sum() + unseen * np.log1p((self._num_docs + 0.5) / 0.5)
+        scores /= float(bound * (self.k1 + 1))
+        return unique, scores
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (chunk id, score) pairs, best first."""
+        ids, scores = self.scores(query)
+        if k <= 0 or not len(ids):
+            return []
+        top = top_k(scores, k)
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str | Path) -> None:
+        """One flat CSR over the whole vocabulary (offsets[t]..offsets[t + 1] for term t), live postings only."""
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        if self.segments:
+            seg = self._live(self.segments)
+        else:
+            seg = Segment.build(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16))
+        offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(seg.terms(), minlength=len(self.vocab)), out=offsets[1:])
+        # terms are \w+ tokens, so newline-joined text round-trips
+        terms = "\n".join(sorted(self.vocab, key=self.vocab.__getitem__)).encode("utf-8")
+        np.savez(
+            out / BM25_FILE,
+            terms=np.frombuffer(terms, dtype=np.uint8),
+            offsets=offsets,
+            doc_ids=seg.ids.astype(np.int64),
+            tfs=seg.weights.astype(np.uint16),
+            doc_len=self.doc_len,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "BM25Index":
+        """With mmap=True the postings stay in the page cache (shared by processes loading the same file)."""
+        data = _load_npz(Path(path) / BM25_FILE, mmap)
+        k1, b = data["params"].tolist()
+        index = cls(k1=k1, b=b)
+        terms = data["terms"].tobytes().decode("utf-8")
+        index.vocab = _Vocab((t, i) for i, t in enumerate(terms.split("\n"))) if terms else _Vocab()
+        if len(data["doc_ids"]):
+            # the saved CSR is one segment with a (possibly empty) range for every term id
+            buckets = np.arange(len(data["offsets"]) - 1, dtype=np.int32)
+            index.segments = [Segment(buckets, data["offsets"], data["doc_ids"], data["tfs"])]
+        index.doc_len = data["doc_len"]
+        index.stale = np.zeros(len(index.doc_len), dtype=bool)
+        index._terms_by_id = None
+        index._num_docs = int(np.count_nonzero(index.doc_len))
+        index._total_len = float(index.doc_len.sum())
+        return index
+
+
+def _load_npz(file: Path, mmap: bool) -> Dict[str, np.ndarray]:
+    """
+    The arrays of an np.savez file. np.savez stores members uncompressed, so
+    with mmap each one is mapped read-only at its offset in the archive.
+    """
+    if not mmap:
+        with np.load(file) as data:
+            return {name: data[name] for name in data.files}
+    arrays = {}
+    with zipfile.ZipFile(file) as archive, file.open("rb") as f:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info))
+                continue
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(_ZIP_HEADER)[26:30])
+            f.seek(info.header_offset + _ZIP_HEADER + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(f)
+            if not np.prod(shape):
+                arrays[name] = np.zeros(shape, dtype=dtype)  # nothing to map
+                continue
+            arrays[name] = np.memmap(
+                file, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran else "C"
+            )
+    return arrays
@@ -0,0 +1,308 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.documents import Chunk
+
+CHUNKS_DIR = "chunks"
+_COLUMNS_FILE = "columns.json"
+_ROW_ARRAYS = ("alive", "text_start", "text_len", "cid_start", "cid_len", "doc")
+
+
+class _Interner(dict):
+    """value -> int32 code; looking up an unknown value assigns the next code."""
+
+    def __init__(self, values: Sequence[str] = ()):
+        super().__init__((v, i) for i, v in enumerate(values))
+        self.values: List[str] = list(values)
+
+    def __missing__(self, value: str) -> int:
+        code = self[value] = len(self.values)
+        self.values.append(value)
+        return code
+
+
+def _grow(array: np.ndarray, size: int, fill=0) -> np.ndarray:
+    out = np.full(size, fill, dtype=array.dtype)
+    out[: len(array)] = array
+    return out
+
+
+def _gather(buf: np.ndarray, start: np.ndarray, new_start: np.ndarray, lengths: np.ndarray, total: int) -> np.ndarray:
+    """Copy each row's bytes from buf[start:start+len] to out[new_start:new_start+len]."""
+    out = np.empty(total, dtype=np.uint8)
+    ids = np.flatnonzero(lengths)
+    # bounded blocks: the per-byte index array is 8x the bytes it moves
+    for block in np.array_split(ids, max(1, total >> 22)):
+        if not len(block):
+            continue
+        n = lengths[block].astype(np.int64)
+        lo = int(new_start[block[0]])
+        hi = int(new_start[block[-1]] + n[-1])
+        src = np.repeat(start[block] - new_start[block], n) + np.arange(lo, hi)
+        out[lo:hi] = buf[src]
+    return out
+
+
+class ChunkStore:
+    """
+    Columnar chunk table addressed by the vector store's int64 ids:
+    - text and chunk_id: one contiguous UTF-8 buffer each, plus per-id start/length
+    - doc_id and every metadata field: dictionary-encoded int32 columns (-1 = absent),
+      so "policy.txt" is stored once instead of once per chunk
+    Chunk objects are only built in get(), i.e. for the hits actually returned.
+    Removed ids leave their bytes behind until save() compacts them, or
+    copy() does once they are the larger part of the text buffer.
+    Loaded with mmap=True, the columns are read-only views of the snapshot
+    files; the first add/remove copies them into memory.
+    """
+
+    def __init__(self):
+        self.alive = np.zeros(0, dtype=bool)
+        self.text_start = np.zeros(0, dtype=np.int64)
+        self.text_len = np.zeros(0, dtype=np.int32)
+        self.cid_start = np.zeros(0, dtype=np.int64)
+        self.cid_len = np.zeros(0, dtype=np.int32)
+        self.doc = np.zeros(0, dtype=np.int32)
+        self.meta: Dict[str, np.ndarray] = {}
+        self.text_buf = np.zeros(0, dtype=np.uint8)
+        self.cid_buf = np.zeros(0, dtype=np.uint8)
+        self._text_used = 0
+        self._cid_used = 0
+        self.docs = _Interner()
+        self.meta_values: Dict[str, _Interner] = {}
+        self._count = 0
+        self._readonly = False
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def n_rows(self) -> int:
+        """One past the highest id ever stored."""
+        return len(self.alive)
+
+    def __contains__(self, id: int) -> bool:
+        return 0 <= id < self.n_rows and bool(self.alive[id])
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < self.n_rows)
+        out = np.zeros(len(ids), dtype=bool)
+        out[inside] = self.alive[ids[inside]]
+        return out
+
+    def ids(self) -> np.ndarray:
+        """Stored ids, ascending."""
+        return np.flatnonzero(self.alive).astype(np.int64)
+
+    # ---- reads -------------------------------------------------------------
+
+    def text(self, id: int) -> str:
+        start = int(self.text_start[id])
+        return self.text_buf[start:start + int(self.text_len[id])].tobytes().decode("utf-8")
+
+    def texts(self, ids: Sequence[int]) -> List[str]:
+        return [self.text(int(i)) for i in ids]
+
+    def get(self, id: int) -> Optional[Chunk]:
+        if id not in self:
+            return None
+        start = int(self.cid_start[id])
+        metadata = {
+            field: self.meta_values[field].values[code]
+            for field, column in self.meta.items()
+            if (code := int(column[id])) >= 0
+        }
+        return Chunk(
+            doc_id=self.docs.values[self.doc[id]],
+            chunk_id=self.cid_buf[start:start + int(self.cid_len[id])].tobytes().decode("utf-8"),
+            text=self.text(id),
+            metadata=metadata,
+        )
+
+    def __iter__(self) -> Iterator[Tuple[int, Chunk]]:
+        for id in self.ids().tolist():
+            yield id, self.get(id)
+
+    def columns(self) -> Iterator[Tuple[str, np.ndarray, List[str]]]:
+        """(field, int32 codes by id, values) for doc_id and each metadata field."""
+        yield "doc_id", self.doc, self.docs.values
+        for field, column in self.meta.items():
+            yield field, column, self.meta_values[field].values
+
+    # ---- writes ------------------------------------------------------------
+
+    def _ensure_writable(self) -> None:
+        if self._readonly:
+            for name in _ROW_ARRAYS:
+                setattr(self, name, np.array(getattr(self, name)))
+            self.meta = {field: np.array(column) for field, column in self.meta.items()}
+            self.text_buf = np.array(self.text_buf)
+            self.cid_buf = np.array(self.cid_buf)
+            self._readonly = False
+
+    def _reserve_rows(self, n: int) -> None:
+        if n <= len(self.alive):
+            return
+        self.alive = _grow(self.alive, n, False)
+        self.text_start = _grow(self.text_start, n)
+        self.text_len = _grow(self.text_len, n)
+        self.cid_start = _grow(self.cid_start, n)
+        self.cid_len = _grow(self.cid_len, n)
+        self.doc = _grow(self.doc, n, -1)
+        self.meta = {field: _grow(column, n, -1) for field, column in self.meta.items()}
+
+    @staticmethod
+    def _append(buf: np.ndarray, used: int, encoded: List[bytes]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        if used + len(blob) > len(buf):
+            # amortized doubling, like a list
+            buf = _grow(buf, max(used + len(blob), 2 * len(buf)))
+        buf[used:used + len(blob)] = blob
+        starts = used + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        return buf, starts, lengths, used + len(blob)
+
+    def add(self, ids: np.ndarray, chunks: Sequence[Chunk]) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        self._ensure_writable()
+        self._reserve_rows(int(ids.max()) + 1)
+
+        self.text_buf, starts, lengths, self._text_used = self._append(
+            self.text_buf, self._text_used, [c.text.encode("utf-8") for c in chunks]
+        )
+        self.text_start[ids], self.text_len[ids] = starts, lengths
+        self.cid_buf, starts, lengths, self._cid_used = self._append(
+            self.cid_buf, self._cid_used, [c.chunk_id.encode("utf-8") for c in chunks]
+        )
+        self.cid_start[ids], self.cid_len[ids] = starts, lengths
+        self.doc[ids] = np.fromiter((self.docs[c.doc_id] for c in chunks), dtype=np.int32, count=len(chunks))
+
+        for field in dict.fromkeys(f for c in chunks for f in c.metadata):
+            if field not in self.meta:
+                self.meta[field] = np.full(self.n_rows, -1, dtype=np.int32)
+                self.meta_values[field] = _Interner()
+            values = self.meta_values[field]
+            self.meta[field][ids] = np.fromiter(
+                (values[c.metadata[field]] if field in c.metadata else -1 for c in chunks),
+                dtype=np.int32,
+                count=len(chunks),
+            )
+        for field, column in self.meta.items():
+            if not any(field in c.metadata for c in chunks):
+                column[ids] = -1
+
+        self._count += int(np.count_nonzero(~self.alive[ids]))
+        self.alive[ids] = True
+
+    def remove(self, ids: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[self.contains(ids)]
+        if not len(ids):
+            return
+        self._ensure_writable()
+        self.alive[ids] = False
+        self._count -= len(np.unique(ids))
+
+    def copy(self) -> "ChunkStore":
+        """
+        Independent in-memory copy. A plain copy of the columns while most
+        bytes are live (a delta reindex then costs a memcpy, not a re-gather
+        of every string); compacted once removed chunks hold more than half.
+        """
+        other = ChunkStore()
+        live_bytes = int(self.text_len[self.alive].sum())
+        if (self._text_used - live_bytes) * 2 > self._text_used:
+            other._load_columns(self._compacted())
+        else:
+            other._load_columns({
+                **{name: np.array(getattr(self, name)) for name in _ROW_ARRAYS},
+                **{f"meta.{field}": np.array(column) for field, column in self.meta.items()},
+                "text_buf": np.array(self.text_buf[:self._text_used]),
+                "cid_buf": np.array(self.cid_buf[:self._cid_used]),
+            })
+        other.docs = _Interner(self.docs.values)
+        other.meta_values = {field: _Interner(values.values) for field, values in self.meta_values.items()}
+        other._count = self._count
+        return other
+
+    def _compacted(self) -> Dict[str, np.ndarray]:
+        """Columns with the live strings rewritten contiguously in id order."""
+        live = self.alive
+        columns = {
+            "alive": live.copy(),
+            "doc": self.doc.copy(),
+            **{f"meta.{field}": column.copy() for field, column in self.meta.items()},
+        }
+        for name, buf in (("text", self.text_buf), ("cid", self.cid_buf)):
+            start, length = getattr(self, f"{name}_start"), getattr(self, f"{name}_len")
+            lengths = np.where(live, length, 0).astype(np.int32)
+            starts = np.zeros(len(live), dtype=np.int64)
+            starts[1:] = np.cumsum(lengths[:-1])
+            total = int(lengths.sum())
+            if np.array_equal(start[live], starts[live]):
+                # already contiguous in id order (no removals, ids added in order)
+                columns[f"{name}_buf"] = np.array(buf[:total])
+            else:
+                columns[f"{name}_buf"] = _gather(buf, start, starts, lengths, total)
+            columns[f"{name}_start"] = starts
+            columns[f"{name}_len"] = lengths
+        return columns
+
+    def _load_columns(self, columns: Dict[str, np.ndarray]) -> None:
+        for name in _ROW_ARRAYS:
+            setattr(self, name, columns[name])
+        self.meta = {key[len("meta."):]: column for key, column in columns.items() if key.startswith("meta.")}
+        self.text_buf, self.cid_buf = columns["text_buf"], columns["cid_buf"]
+        self._text_used, self._cid_used = len(self.text_buf), len(self.cid_buf)
+
+    # ---- persistence -------------------------------------------------------
+
+    def save(self, path: str | Path) -> None:
+        """Write one .npy file per column (compacted) plus the value dictionaries."""
+        out = Path(path) / CHUNKS_DIR
+        out.mkdir(parents=True, exist_ok=True)
+        columns = self._compacted()
+        fields = list(self.meta)
+        for key, array in columns.items():
+            name = f"meta{fields.index(key[len('meta.'):])}" if key.startswith("meta.") else key
+            np.save(out / f"{name}.npy", array)
+        header = {
+            "count": self._count,
+            "docs": self.docs.values,
+            "fields": [[field, self.meta_values[field].values] for field in fields],
+        }
+        (out / _COLUMNS_FILE).write_text(json.dumps(header, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "ChunkStore":
+        src = Path(path) / CHUNKS_DIR
+        header = json.loads((src / _COLUMNS_FILE).read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        columns = {
+            name: np.load(src / f"{name}.npy", mmap_mode=mode)
+            for name in (*_ROW_ARRAYS, "text_buf", "cid_buf")
+        }
+        for i, (field, _) in enumerate(header["fields"]):
+            columns[f"meta.{field}"] = np.load(src / f"meta{i}.npy", mmap_mode=mode)
+
+        store = cls()
+        store._load_columns(columns)
+        store.docs = _Interner(header["docs"])
+        store.meta_values = {field: _Interner(values) for field, values in header["fields"]}
+        store._count = header["count"]
+        store._readonly = mmap
+        return store
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns (buffers at their used size) and value dictionaries."""
+        rows = sum(getattr(self, name).nbytes for name in _ROW_ARRAYS)
+        rows += sum(column.nbytes for column in self.meta.values())
+        values = sum(len(v.encode("utf-8")) for v in self.docs.values)
+        values += sum(len(v.encode("utf-8")) for i in self.meta_values.values() for v in i.values)
+        return rows + self._text_used + self._cid_used + values
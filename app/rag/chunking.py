@@ -1,7 +1,39 @@
 import re
-from typing import List
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from app.models.documents import Document, Chunk
+from app.rag.loaders import (
+    TEXT_EXTENSIONS,
+    RecordFields,
+    doc_key,
+    iter_documents,
+    read_blocks,
+    source_name,
+    split_suffix,
+)
+
+CHUNK_UNITS = ("chars", "tokens")
+
+# only runs that actually change: sub() on every single space would build a
+# list of tiny strings the size of the block
+_SPACES = re.compile(r"\t[ \t]*| [ \t]+")
+_LINE_EDGES = re.compile(r" \n ?|\n ")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_TOKEN = re.compile(r"\S+")
+_WHITESPACE = re.compile(r"\s+")
+
+# chunk end candidates, best first: the cut goes after the last match of the
+# first pattern found in the tolerance window
+_PARAGRAPH_END = re.compile(r"(?=\n\n)")
+_SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*(?=\s)")
+_LINE_END = re.compile(r"(?=\n)")
+_WORD_END = re.compile(r"(?= )")
+_END_BOUNDARIES = (_PARAGRAPH_END, _SENTENCE_END, _LINE_END, _WORD_END)
+# overlap start candidates: the first sentence start, else the first word start
+_SENTENCE_START = re.compile(r"(?:\n\n|[.!?][\"'”’)\]]*\s)\s*")
 
 
 def clean_text(text: str) -> str:
@@ -11,16 +43,41 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
-def chunk_text(
-    text: str,
-    chunk_size: int = 400,
-    overlap: int = 80,
-) -> List[str]:
+def _normalize(text: str) -> str:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # substring checks are much cheaper than a regex pass over clean text
+    if "\t" in text or "  " in text:
+        text = _SPACES.sub(" ", text)
+    if " \n" in text or "\n " in text:
+        text = _LINE_EDGES.sub("\n", text)
+    if "\n\n\n" in text:
+        text = _BLANK_LINES.sub("\n\n", text)
+    return text
+
+
+def normalize_blocks(blocks: Iterable[str]) -> Iterator[str]:
     """
-    Simple character-based chunking with overlap.
-    - chunk_size: max characters per chunk
-    - overlap: repeated characters between chunks
+    clean_text() over a stream of text blocks, plus no spaces around line breaks.
+    Trailing whitespace of a block is held back until the next block, so a
+    whitespace run split across blocks is normalized as one.
     """
+    carry = ""
+    started = False
+    for block in blocks:
+        text = carry + block
+        cut = len(text.rstrip(" \t\r\n"))
+        body, carry = text[:cut], text[cut:]
+        if len(carry) > 1024:
+            # a block of pure whitespace: keep only what it normalizes to (and a trailing \r of a \r\n)
+            carry = _normalize(carry[:-1]) + carry[-1]
+        if not started:
+            body = body.lstrip()
+        if body:
+            started = True
+            yield _normalize(body)
+
+
+def _check_sizes(chunk_size: int, overlap: int) -> None:
     if chunk_size <= 0:
         raise ValueError("chunk_size must be > 0")
     if overlap < 0:
@@ -28,42 +85,181 @@ def chunk_text(
     if overlap >= chunk_size:
         raise ValueError("overlap must be < chunk_size")
 
-    text = clean_text(text)
-    if not text:
-        return []
 
-    chunks: List[str] = []
-    start = 0
-    n = len(text)
+class _Chars:
+    @staticmethod
+    def end(buf: str, pos: int, n: int) -> int:
+        """Offset just past n units from pos (len(buf) if there are fewer)."""
+        return min(pos + n, len(buf))
 
-    while start < n:
-        end = min(start + chunk_size, n)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+    @staticmethod
+    def back(buf: str, pos: int, end: int, n: int) -> int:
+        """Offset where the last n units before end start (pos if there are fewer)."""
+        return max(pos, end - n)
 
-        if end == n:
-            break
-        start = max(0, end - overlap)
 
-    return chunks
+class _Tokens:
+    """Whitespace-separated tokens (about 1.3 LLM tokens each for English prose)."""
+
+    @staticmethod
+    def end(buf: str, pos: int, n: int) -> int:
+        count, last = 0, None
+        for count, last in enumerate(islice(_TOKEN.finditer(buf, pos), n), 1):
+            pass
+        # fewer than n tokens, or the n-th may continue in the next block
+        return last.end() if count == n and last.end() < len(buf) else len(buf)
+
+    @staticmethod
+    def back(buf: str, pos: int, end: int, n: int) -> int:
+        starts = deque((m.start() for m in _TOKEN.finditer(buf, pos, end)), maxlen=n)
+        return starts[0] if n and len(starts) == n else pos
+
+
+_SIZERS = {"chars": _Chars, "tokens": _Tokens}
+
+
+def _snap_end(buf: str, lo: int, hi: int) -> int:
+    """Best cut in buf[lo:hi]; hi itself when no boundary falls in the window."""
+    for boundary in _END_BOUNDARIES:
+        last = None
+        # hi + 1: a sentence end needs to see the whitespace after it
+        for last in boundary.finditer(buf, lo, hi + 1):
+            pass
+        if last is not None and last.end() <= hi:
+            return last.end()
+    return hi
+
+
+def _snap_start(buf: str, lo: int, hi: int) -> int:
+    """Earliest sentence start in buf[lo:hi], else word start, else lo."""
+    for m in _SENTENCE_START.finditer(buf, max(0, lo - 4), hi):
+        if lo <= m.end() < hi:
+            return m.end()
+    if lo == 0 or buf[lo - 1].isspace():
+        return lo
+    m = _WHITESPACE.search(buf, lo, hi)
+    return m.end() if m and m.end() < hi else lo
+
+
+def iter_chunks(
+    blocks: Iterable[str],
+    chunk_size: int = 400,
+    overlap: int = 80,
+    unit: str = "chars",
+    tolerance: float = 0.2,
+) -> Iterator[str]:
+    """
+    Streaming chunker over text blocks (e.g. read_blocks(path)).
+    - chunk_size / overlap: in characters, or in whitespace tokens with unit="tokens"
+    - a chunk ends at the last paragraph break, else sentence end, else line
+      break, else space within its final `tolerance` share; only text with
+      none of those is cut mid-word
+    - the overlap starts at a sentence or word start
+    Each block is scanned a constant number of times and at most one chunk
+    plus one block is held in memory, so input size is unbounded.
+    """
+    _check_sizes(chunk_size, overlap)
+    if unit not in _SIZERS:
+        raise ValueError(f"Unknown chunk unit {unit!r} (expected one of {CHUNK_UNITS})")
+    sizer = _SIZERS[unit]
+    min_size = max(1, int(chunk_size * (1 - tolerance)))
+
+    stream = normalize_blocks(blocks)
+    buf, pos, eof = "", 0, False
+    while True:
+        # a full chunk plus one character to see what follows the cut
+        while not eof and sizer.end(buf, pos, chunk_size) >= len(buf):
+            block = next(stream, None)
+            if block is None:
+                eof = True
+            else:
+                buf, pos = buf[pos:] + block, 0
+
+        hard = sizer.end(buf, pos, chunk_size)
+        if hard >= len(buf):
+            piece = buf[pos:].strip()
+            if piece:
+                yield piece
+            return
+
+        cut = _snap_end(buf, sizer.end(buf, pos, min_size), hard)
+        piece = buf[pos:cut].strip()
+        if piece:
+            yield piece
+        if overlap:
+            start = max(pos + 1, sizer.back(buf, pos, cut, overlap))
+            pos = _snap_start(buf, start, cut)
+        else:
+            pos = cut
+
+
+def chunk_text(
+    text: str,
+    chunk_size: int = 400,
+    overlap: int = 80,
+    unit: str = "chars",
+) -> List[str]:
+    """
+    Boundary-aware chunking with overlap (see iter_chunks).
+    - chunk_size: max characters (or tokens) per chunk
+    - overlap: repeated characters (or tokens) between chunks
+    """
+    return list(iter_chunks([text], chunk_size=chunk_size, overlap=overlap, unit=unit))
+
+
+def make_chunk(doc_id: str, i: int, text: str, metadata: dict) -> Chunk:
+    return Chunk(
+        doc_id=doc_id,
+        chunk_id=f"{doc_id}::chunk_{i}",
+        text=text,
+        metadata={**metadata, "chunk_index": str(i)},
+    )
 
 
 def chunk_documents(
     docs: List[Document],
     chunk_size: int = 400,
     overlap: int = 80,
+    unit: str = "chars",
 ) -> List[Chunk]:
     all_chunks: List[Chunk] = []
     for doc in docs:
-        pieces = chunk_text(doc.text, chunk_size=chunk_size, overlap=overlap)
+        pieces = chunk_text(doc.text, chunk_size=chunk_size, overlap=overlap, unit=unit)
+        all_chunks.extend(make_chunk(doc.doc_id, i, piece, doc.metadata) for i, piece in enumerate(pieces))
+    return all_chunks
+
+
+def iter_document_pieces(
+    file_path: Path,
+    chunk_size: int = 400,
+    overlap: int = 80,
+    unit: str = "chars",
+    root: Optional[Path] = None,
+    fields: Optional[RecordFields] = None,
+) -> Iterator[Tuple[str, dict, Iterator[str]]]:
+    """
+    (doc_id, metadata, chunk texts) per document of one file. Text files are
+    read block by block; record files (JSONL, CSV, ...) one record at a time.
+    """
+    fmt, _ = split_suffix(file_path)
+    if fmt in TEXT_EXTENSIONS:
+        source = source_name(file_path, root)
+        pieces = iter_chunks(read_blocks(file_path), chunk_size=chunk_size, overlap=overlap, unit=unit)
+        yield doc_key(source), {"source_file": source}, pieces
+        return
+    for doc in iter_documents(file_path, root=root, fields=fields):
+        yield doc.doc_id, doc.metadata, iter_chunks([doc.text], chunk_size=chunk_size, overlap=overlap, unit=unit)
+
+
+def chunk_file(
+    file_path: Path,
+    chunk_size: int = 400,
+    overlap: int = 80,
+    unit: str = "chars",
+    root: Optional[Path] = None,
+    fields: Optional[RecordFields] = None,
+) -> Iterator[Chunk]:
+    """Chunks of one document file, streamed (same ids and metadata as load_documents_from_folder + chunk_documents)."""
+    for doc_id, metadata, pieces in iter_document_pieces(file_path, chunk_size, overlap, unit, root, fields):
         for i, piece in enumerate(pieces):
-            all_chunks.append(
-                Chunk(
-                    doc_id=doc.doc_id,
-                    chunk_id=f"{doc.doc_id}::chunk_{i}",
-                    text=piece,
-                    metadata={**doc.metadata, "chunk_index": str(i)},
-                )
-            )
-    return all_chunks
\ No newline at end of file
+            yield make_chunk(doc_id, i, piece, metadata)
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.embeddings import Embedder, SparseRows
+
+_KEY_BYTES = 16
+_LOCK_FILE = "LOCK"
+# misses are sent to the wrapped embedder this many texts at a time
+DEFAULT_MISS_BATCH = 256
+
+
+def text_key(identity: str, text: str) -> bytes:
+    """Cache key of a text under one embedder identity (which includes its dim)."""
+    h = hashlib.blake2b(digest_size=_KEY_BYTES)
+    h.update(identity.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding vectors on disk, one pair of append-only
+    files per dim in `path`:
+    - vectors-<dim>.f32: float32 rows back to back (a headerless .npy body), read through a mmap
+    - keys-<dim>.bin: the 16-byte text_key() of every row, loaded into a key -> row dict
+    Rows are appended vectors first, keys second, so a crash mid-write leaves
+    at most an unindexed tail that the next writer truncates. Every lookup
+    and append holds an exclusive flock on <path>/LOCK and first catches up
+    with the rows other processes (e.g. uvicorn workers) appended, so row
+    numbers always come from the files, not from a per-process counter.
+    Rows are never rewritten in place: compact() drops the ones this process
+    has not used since it opened the cache (or last compacted), e.g. after a
+    full rebuild; other processes reload the rewritten files.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files: Dict[int, "_DimFile"] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive across threads and processes. POSIX only."""
+        import fcntl
+
+        with self._lock, open(self.path / _LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _file(self, dim: int) -> "_DimFile":
+        """The files of one dim, caught up with other processes' appends. Call under _locked()."""
+        f = self._files.get(dim)
+        if f is None:
+            f = self._files[dim] = _DimFile(self.path, dim)
+        else:
+            f.sync()
+        return f
+
+    def get(self, keys: List[bytes], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(found mask, (n, dim) vectors with zero rows for the misses)."""
+        out = np.zeros((len(keys), dim), dtype=np.float32)
+        with self._locked():
+            f = self._file(dim)
+            rows = np.fromiter((f.rows.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+            found = rows >= 0
+            if found.any():
+                out[found] = f.read(rows[found])
+                f.used[rows[found]] = True
+            self.hits += int(found.sum())
+            self.misses += len(keys) - int(found.sum())
+        return found, out
+
+    def put(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Append the rows whose key is not stored yet."""
+        with self._locked():
+            self._file(vectors.shape[1]).append(keys, vectors)
+
+    def compact(self) -> int:
+        """Rewrite the files keeping only the rows used since open / the last compaction. Returns rows dropped."""
+        dropped = 0
+        with self._locked():
+            for f in self._files.values():
+                f.sync()
+                dropped += f.compact()
+        return dropped
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(f.rows) for f in self._files.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(f.rows) for f in self._files.values()),
+                "bytes": sum(f.nbytes for f in self._files.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+class _DimFile:
+    def __init__(self, folder: Path, dim: int):
+        self.dim = dim
+        self.vectors_path = folder / f"vectors-{dim}.f32"
+        self.keys_path = folder / f"keys-{dim}.bin"
+        self.vectors_path.touch()
+        self.keys_path.touch()
+        self._open()
+
+    def _open(self) -> None:
+        self.rows: Dict[bytes, int] = {}
+        self.n_rows = 0
+        self.used = np.zeros(0, dtype=bool)
+        self._mmap: Optional[np.ndarray] = None
+        # compact() replaces the files; a new inode means every row number changed
+        self._inode = self.keys_path.stat().st_ino
+        self.sync()
+
+    def sync(self) -> None:
+        """Index the rows appended since the last sync (by any process). Call under the directory lock."""
+        if self.keys_path.stat().st_ino != self._inode:
+            self._open()
+            return
+        row_bytes = self.dim * 4
+        n = min(self.keys_path.stat().st_size // _KEY_BYTES, self.vectors_path.stat().st_size // row_bytes)
+        # drop a torn tail (crash between the two appends) before anything is appended after it
+        for file, size in ((self.keys_path, n * _KEY_BYTES), (self.vectors_path, n * row_bytes)):
+            if file.stat().st_size != size:
+                os.truncate(file, size)
+        if n <= self.n_rows:
+            return
+        with self.keys_path.open("rb") as f:
+            f.seek(self.n_rows * _KEY_BYTES)
+            keys = f.read((n - self.n_rows) * _KEY_BYTES)
+        # later rows win, so duplicate appends resolve to the newest copy
+        for i in range(n - self.n_rows):
+            self.rows[keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]] = self.n_rows + i
+        self.used = np.concatenate([self.used, np.zeros(n - self.n_rows, dtype=bool)])
+        self.n_rows = n
+
+    @property
+    def nbytes(self) -> int:
+        return self.n_rows * (self.dim * 4 + _KEY_BYTES)
+
+    def read(self, rows: np.ndarray) -> np.ndarray:
+        if self._mmap is None or len(self._mmap) < self.n_rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.n_rows, self.dim))
+        return self._mmap[rows]
+
+    def append(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        new = [i for i, k in enumerate(keys) if k not in self.rows]
+        # a text repeated within one batch is stored once
+        new = list({keys[i]: i for i in new}.values())
+        if not new:
+            return
+        with self.vectors_path.open("ab") as f:
+            f.write(np.ascontiguousarray(vectors[new], dtype=np.float32).tobytes())
+        with self.keys_path.open("ab") as f:
+            f.write(b"".join(keys[i] for i in new))
+        for row, i in enumerate(new, self.n_rows):
+            self.rows[keys[i]] = row
+        self.n_rows += len(new)
+        self.used = np.concatenate([self.used, np.ones(len(new), dtype=bool)])
+
+    def compact(self) -> int:
+        live = {row: key for key, row in self.rows.items() if self.used[row]}
+        dropped = self.n_rows - len(live)
+        if not dropped:
+            return 0
+        order = np.array(sorted(live), dtype=np.int64)
+        vectors = self.read(order) if len(order) else np.zeros((0, self.dim), dtype=np.float32)
+        for path, data in (
+            (self.vectors_path, np.ascontiguousarray(vectors).tobytes()),
+            (self.keys_path, b"".join(live[row] for row in order.tolist())),
+        ):
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        self._open()
+        # everything kept was in use
+        self.used[:] = True
+        return dropped
+
+
+class CachedEmbedder(Embedder):
+    """
+    Wraps any Embedder: texts embedded before (same embedder identity and
+    dim) are read from the EmbeddingCache; only the misses go to the wrapped
+    embedder, miss_batch texts at a time, and are then stored. Queries and
+    sparse rows bypass the cache.
+    """
+
+    def __init__(self, inner: Embedder, cache: EmbeddingCache, miss_batch: int = DEFAULT_MISS_BATCH):
+        self.inner = inner
+        self.cache = cache
+        self.miss_batch = miss_batch
+        self.dim = inner.dim
+
+    @property
+    def identity(self) -> str:
+        return self.inner.identity
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        identity = f"{self.inner.identity}:{self.dim}"
+        keys = [text_key(identity, t) for t in texts]
+        found, out = self.cache.get(keys, self.dim)
+        misses = np.flatnonzero(~found)
+        for start in range(0, len(misses), self.miss_batch):
+            rows = misses[start:start + self.miss_batch]
+            vectors = self.inner.embed_texts([texts[i] for i in rows.tolist()])
+            out[rows] = vectors
+            self.cache.put([keys[i] for i in rows.tolist()], vectors)
+        return out
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.inner.embed_queries(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.inner.embed_query(text)
+
+    def embed_sparse(self, texts: List[str]) -> SparseRows:
+        return self.inner.embed_sparse(texts)
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(path: str | Path) -> EmbeddingCache:
+    """Process-wide cache for a directory, so every embedder using it shares the key index."""
+    key = str(Path(path).resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = EmbeddingCache(path)
+        return cache
+
+
+def cached_embedder(embedder: Embedder, cache_dir: Optional[str]) -> Embedder:
+    """embedder wrapped in the cache for cache_dir; unchanged when cache_dir is empty."""
+    if not cache_dir:
+        return embedder
+    return CachedEmbedder(embedder, get_embedding_cache(cache_dir))
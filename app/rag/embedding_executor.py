@@ -0,0 +1,141 @@
+import multiprocessing as mp
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.rag.embeddings import Embedder, HashingEmbedder, SparseRows
+
+EXECUTOR_KINDS = ("thread", "process")
+DEFAULT_BATCH_SIZE = 1024
+
+# name -> factory(dim) building an Embedder; EMBEDDING_BACKEND picks one
+EmbedderFactory = Callable[[int], Embedder]
+EMBEDDERS: Dict[str, EmbedderFactory] = {}
+
+
+def register_embedder(name: str, factory: EmbedderFactory) -> None:
+    """Make factory(dim) selectable as EMBEDDING_BACKEND=name / --embedding-backend name."""
+    EMBEDDERS[name] = factory
+
+
+register_embedder("hashing", lambda dim: HashingEmbedder(dim=dim))
+
+
+def make_embedder(name: str, dim: int) -> Embedder:
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend {name!r} (registered: {', '.join(sorted(EMBEDDERS))})")
+    return EMBEDDERS[name](dim)
+
+
+# the embedder of a process-pool worker, unpickled once by the initializer
+_WORKER_EMBEDDER: Optional[Embedder] = None
+
+
+def _init_worker(embedder: Embedder) -> None:
+    global _WORKER_EMBEDDER
+    _WORKER_EMBEDDER = embedder
+
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    return _WORKER_EMBEDDER.embed_texts(texts)
+
+
+def _embed_sparse_in_worker(texts: List[str]) -> SparseRows:
+    return _WORKER_EMBEDDER.embed_sparse(texts)
+
+
+class ParallelEmbedder(Embedder):
+    """
+    Splits embed_texts() input into batch_size batches and embeds them on a
+    pool of `workers`, writing each batch into its rows of one preallocated
+    output matrix, so the result is in input order and never concatenated.
+    - thread: for backends that wait on I/O or release the GIL (remote models, BLAS)
+    - process: for pure-Python backends such as HashingEmbedder; each worker
+      gets its own copy of the embedder (spawned, like the ingest chunkers)
+    The pool starts on the first call with more than one batch; a single
+    batch runs inline.
+    """
+
+    def __init__(
+        self,
+        inner: Embedder,
+        workers: int = 2,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        kind: str = "thread",
+    ):
+        if workers < 1 or batch_size < 1:
+            raise ValueError("workers and batch_size must be >= 1")
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor {kind!r}; expected one of {EXECUTOR_KINDS}")
+        self.inner = inner
+        self.dim = inner.dim
+        self.workers = workers
+        self.batch_size = batch_size
+        self.kind = kind
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def identity(self) -> str:
+        return self.inner.identity
+
+    def _executor(self) -> Executor:
+        with self._pool_lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(
+                        self.workers, mp_context=mp.get_context("spawn"), initializer=_init_worker, initargs=(self.inner,)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="embed")
+            return self._pool
+
+    def _map(self, texts: List[str], sparse: bool) -> list:
+        """Per-batch results in input order."""
+        bounds = [(i, min(i + self.batch_size, len(texts))) for i in range(0, len(texts), self.batch_size)]
+        if len(bounds) <= 1 or self.workers == 1:
+            embed = self.inner.embed_sparse if sparse else self.inner.embed_texts
+            return [embed(texts[lo:hi]) for lo, hi in bounds]
+        if self.kind == "process":
+            fn = _embed_sparse_in_worker if sparse else _embed_in_worker
+        else:
+            fn = self.inner.embed_sparse if sparse else self.inner.embed_texts
+        return list(self._executor().map(fn, [texts[lo:hi] for lo, hi in bounds]))
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start, vectors in zip(range(0, len(texts), self.batch_size), self._map(texts, sparse=False)):
+            out[start:start + len(vectors)] = vectors
+        return out
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        # a handful of queries: the pool round trip would cost more than it saves
+        return self.inner.embed_queries(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.inner.embed_query(text)
+
+    def embed_sparse(self, texts: List[str]) -> SparseRows:
+        return SparseRows.vstack([SparseRows.empty(self.dim)] + self._map(texts, sparse=True))
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def build_embedder(
+    backend: str,
+    dim: int,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    executor: str = "thread",
+) -> Embedder:
+    """The registered backend, behind a ParallelEmbedder when workers > 1."""
+    embedder = make_embedder(backend, dim)
+    if workers > 1:
+        embedder = ParallelEmbedder(embedder, workers=workers, batch_size=batch_size, kind=executor)
+    return embedder
@@ -1,34 +1,205 @@
 import hashlib
+from dataclasses import dataclass
+from itertools import chain
+from typing import List, Sequence, Tuple, Union
+
 import numpy as np
-from typing import List
+
+# Texts tokenized and scattered per block; bounds the temporary token list
+# and count buffer (rows * dim int64) no matter how large the batch is, and
+# keeps each GIL-holding C call short so background re-embedding does not
+# stall query threads.
+_BLOCK_ROWS = 512
+
+
+class _BucketCache(dict):
+    """
+    Bounded token -> bucket id cache.
+    Hits are plain dict lookups (C speed when driven through map());
+    misses pay the MD5 + big-int modulo once. When full, the oldest half
+    of the entries (insertion order) is dropped.
+    """
+
+    def __init__(self, dim: int, max_size: int = 1 << 18):
+        super().__init__()
+        self.dim = dim
+        self.max_size = max_size
+
+    def __missing__(self, token: str) -> int:
+        if len(self) >= self.max_size:
+            for old in list(self)[: self.max_size // 2]:
+                self.pop(old, None)
+        h = hashlib.md5(token.encode("utf-8")).hexdigest()
+        idx = int(h, 16) % self.dim
+        self[token] = idx
+        return idx
+
+
+@dataclass
+class SparseRows:
+    """
+    Embeddings as CSR rows: row i has the nonzero dims indices[indptr[i]:indptr[i + 1]]
+    (ascending) with the matching values. Memory is O(nonzeros), not O(rows * dim).
+    """
+    indptr: np.ndarray   # int64, rows + 1
+    indices: np.ndarray  # int32
+    values: np.ndarray   # float32
+    dim: int
+
+    ndim = 2
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self), self.dim
+
+    def __getitem__(self, rows: Union[int, slice]) -> "SparseRows":
+        """One row (as a 1-row SparseRows) or a contiguous slice of rows."""
+        if isinstance(rows, (int, np.integer)):
+            rows = slice(int(rows) % len(self), int(rows) % len(self) + 1)
+        start, stop, step = rows.indices(len(self))
+        if step != 1:
+            raise ValueError("SparseRows slices must be contiguous")
+        lo, hi = self.indptr[start], self.indptr[max(start, stop)]
+        return SparseRows(self.indptr[start:max(start, stop) + 1] - lo, self.indices[lo:hi], self.values[lo:hi], self.dim)
+
+    def take(self, rows: np.ndarray) -> "SparseRows":
+        """The given rows, in the given order."""
+        counts = np.diff(self.indptr)[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        # position of every value of the picked rows in indices / values
+        src = np.repeat(self.indptr[rows] - indptr[:-1], counts) + np.arange(indptr[-1])
+        return SparseRows(indptr, self.indices[src], self.values[src], self.dim)
+
+    @classmethod
+    def empty(cls, dim: int) -> "SparseRows":
+        return cls(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), dim)
+
+    @classmethod
+    def vstack(cls, blocks: Sequence["SparseRows"]) -> "SparseRows":
+        if not blocks:
+            raise ValueError("nothing to stack")
+        ends = np.cumsum([0] + [len(b.indices) for b in blocks[:-1]])
+        return cls(
+            np.concatenate([blocks[0].indptr[:1]] + [b.indptr[1:] + end for b, end in zip(blocks, ends)]),
+            np.concatenate([b.indices for b in blocks]),
+            np.concatenate([b.values for b in blocks]),
+            blocks[0].dim,
+        )
+
+    @classmethod
+    def from_dense(cls, vectors: np.ndarray) -> "SparseRows":
+        rows, cols = np.nonzero(vectors)
+        indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(vectors)), out=indptr[1:])
+        return cls(indptr, cols.astype(np.int32), vectors[rows, cols].astype(np.float32), vectors.shape[1])
+
+    def row_ids(self) -> np.ndarray:
+        """Row number of every stored value."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def dot(self, query: "SparseRows") -> np.ndarray:
+        """Dot product of every row with a single-row query."""
+        dense = np.zeros(self.dim, dtype=np.float32)
+        dense[query.indices] = query.values
+        return np.bincount(self.row_ids(), weights=self.values * dense[self.indices], minlength=len(self))
+
+    def toarray(self) -> np.ndarray:
+        out = np.zeros(self.shape, dtype=np.float32)
+        out[self.row_ids(), self.indices] = self.values
+        return out
+
 
 class Embedder:
+    dim: int
+
+    @property
+    def identity(self) -> str:
+        """
+        Names what the vectors depend on besides dim (caches key on it).
+        Embedders backed by a model should include the model name / version.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
 
     def embed_texts(self, texts: List[str]) -> np.ndarray:
         raise NotImplementedError
 
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of search queries (by default the same as embed_texts)."""
+        return self.embed_texts(texts)
+
     def embed_query(self, text: str) -> np.ndarray:
-        return self.embed_texts([text])[0]
-    
+        return self.embed_queries([text])[0]
+
+    def embed_sparse(self, texts: List[str]) -> SparseRows:
+        """embed_texts() as sparse rows (for the sparse index)."""
+        return SparseRows.from_dense(self.embed_texts(texts))
+
 class HashingEmbedder(Embedder):
-    def __init__(self, dim: int = 256):
+    def __init__(self, dim: int = 256, token_cache_size: int = 1 << 18):
         self.dim = dim
-    
-    def _hash_to_vec(self, text: str) -> np.ndarray:
-        vec = np.zeros(self.dim, dtype=np.float32)
-
-        #simple tokenization
-        tokens = text.lower().split()
-        for tok in tokens:
-            h = hashlib.md5(tok.encode("utf-8")).hexdigest()
-            idx = int(h,16) % self.dim
-            vec[idx] += 1.0
-
-        #normalize
-        norm = np.linalg.norm(vec)
-        if norm > 0:
-            vec /= norm
-        return vec
-    
+        self._buckets = _BucketCache(dim, max_size=token_cache_size)
+
+    def _token_buckets(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row, bucket) of every token of a block of texts."""
+        # simple tokenization
+        tokens = [t.lower().split() for t in texts]
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        total = int(lengths.sum())
+        buckets = np.fromiter(
+            map(self._buckets.__getitem__, chain.from_iterable(tokens)), dtype=np.int64, count=total
+        )
+        return np.repeat(np.arange(len(texts), dtype=np.int64), lengths), buckets
+
+    def _embed_block(self, texts: List[str], out: np.ndarray) -> None:
+        """
+        Scatter bucket counts for one block of texts into `out` (zeroed rows)
+        and L2-normalize them.
+        """
+        dim = self.dim
+        rows, buckets = self._token_buckets(texts)
+        if not len(rows):
+            return
+        counts = np.bincount(rows * dim + buckets, minlength=len(texts) * dim)
+        out[:] = counts.reshape(len(texts), dim)
+
+        # normalize rows in place
+        norms = np.sqrt(np.einsum("ij,ij->i", out, out))[:, None]
+        np.divide(out, norms, out=out, where=norms > 0)
+
     def embed_texts(self, texts: List[str]) -> np.ndarray:
-        return np.stack([self._hash_to_vec(t) for t in texts], axis=0).astype(np.float32)
\ No newline at end of file
+        """
+        Batched bag-of-words hashing.
+        Output is bit-for-bit identical to hashing each text on its own:
+        bucket counts are small integers, so float32 sums and squared norms
+        are exact regardless of accumulation order.
+        """
+        n = len(texts)
+        out = np.zeros((n, self.dim), dtype=np.float32)
+
+        for r0 in range(0, n, _BLOCK_ROWS):
+            r1 = min(r0 + _BLOCK_ROWS, n)
+            self._embed_block(texts[r0:r1], out[r0:r1])
+        return out
+
+    def embed_sparse(self, texts: List[str]) -> SparseRows:
+        """
+        The rows of embed_texts() without materializing them: bucket counts
+        per row, L2-normalized. Memory is O(tokens) at any dim.
+        """
+        blocks = [SparseRows.empty(self.dim)]
+        for r0 in range(0, len(texts), _BLOCK_ROWS):
+            block = texts[r0:r0 + _BLOCK_ROWS]
+            rows, buckets = self._token_buckets(block)
+            keys, counts = np.unique(rows * self.dim + buckets, return_counts=True)
+            rows = keys // self.dim
+            values = counts.astype(np.float32)
+            norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(block))).astype(np.float32)
+            values /= norms[rows]
+            indptr = np.zeros(len(block) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=len(block)), out=indptr[1:])
+            blocks.append(SparseRows(indptr, (keys % self.dim).astype(np.int32), values, self.dim))
+        return SparseRows.vstack(blocks)
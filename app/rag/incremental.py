@@ -0,0 +1,156 @@
+import time
+from dataclasses import asdict, dataclass
+from itertools import chain, islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.models.documents import Chunk
+from app.rag.bm25 import BM25Index
+from app.rag.chunking import chunk_file
+from app.rag.loaders import RecordFields, file_digest, iter_document_files, source_name
+from app.rag.retriever import Retriever
+from app.rag.snapshot import DocState
+from app.rag.vector_store import store_class
+
+# chunks embedded and added per store.add(): bounds memory on huge documents
+_ADD_BATCH = 16384
+
+
+@dataclass
+class ReindexStats:
+    added: int = 0      # chunks embedded and added
+    removed: int = 0    # chunks dropped (deleted or changed documents)
+    kept: int = 0       # chunks of unchanged documents, left untouched
+    docs_added: int = 0
+    docs_changed: int = 0
+    docs_removed: int = 0
+    duration_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class IncrementalIndexer:
+    """
+    Brings a Retriever in line with a docs folder by re-chunking and
+    re-embedding only files whose content hash changed. A JSONL / CSV export
+    is tracked as one unit: any change re-chunks all of its records.
+
+    Unchanged files are recognised by (mtime, size) without being read;
+    touched-but-identical files are hashed but not re-embedded. Changed files
+    are streamed through the chunker and embedded in batches, so no document
+    is ever held in memory whole.
+    Updates are applied to a copy of the store, so the retriever passed in
+    keeps serving queries until the caller swaps in the returned one.
+    """
+
+    def __init__(
+        self,
+        folder_path: str,
+        chunk_size: int = 400,
+        overlap: int = 80,
+        chunk_unit: str = "chars",
+        fields: Optional[RecordFields] = None,
+    ):
+        self.folder_path = folder_path
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.chunk_unit = chunk_unit
+        self.fields = fields or RecordFields()
+
+    def _chunks(self, files: List[Path]) -> Iterator[Chunk]:
+        root = Path(self.folder_path)
+        return chain.from_iterable(
+            chunk_file(f, self.chunk_size, self.overlap, self.chunk_unit, root=root, fields=self.fields) for f in files
+        )
+
+    def reindex(self, retriever: Retriever) -> Tuple[Retriever, ReindexStats]:
+        start = time.perf_counter()
+        stats = ReindexStats()
+        previous = retriever.documents
+        documents: Dict[str, DocState] = {}
+        changed: List[Tuple[Path, DocState]] = []
+        stale_ids: List[int] = []
+
+        seen = set()
+        root = Path(self.folder_path)
+        for file_path in iter_document_files(self.folder_path):
+            # keyed by the full relative path: policy.txt and policy.md are separate files
+            key = source = source_name(file_path, root)
+            seen.add(key)
+            st = file_path.stat()
+            prev = previous.get(key)
+
+            if prev and prev.mtime_ns == st.st_mtime_ns and prev.size == st.st_size:
+                documents[key] = prev
+                stats.kept += len(prev.chunk_ids)
+                continue
+
+            digest = file_digest(file_path)
+            state = DocState(source_file=source, content_hash=digest, mtime_ns=st.st_mtime_ns, size=st.st_size)
+
+            if prev and prev.content_hash == digest:
+                state.chunk_ids = prev.chunk_ids
+                documents[key] = state
+                stats.kept += len(prev.chunk_ids)
+                continue
+
+            if prev:
+                stale_ids.extend(prev.chunk_ids)
+                stats.docs_changed += 1
+            elif st.st_size:
+                stats.docs_added += 1
+            documents[key] = state
+            changed.append((file_path, state))
+
+        for key, prev in previous.items():
+            if key not in seen:
+                stale_ids.extend(prev.chunk_ids)
+                stats.docs_removed += 1
+
+        if not stale_ids and not changed:
+            # nothing to re-embed: keep serving the same retriever (only file stats moved)
+            retriever.documents = documents
+            stats.duration_ms = (time.perf_counter() - start) * 1000
+            return retriever, stats
+
+        if stale_ids and not retriever.store.supports_remove:
+            # e.g. HNSW: vectors cannot be deleted, so re-embed everything into a fresh index
+            empty = Retriever(
+                embedder=retriever.embedder,
+                store=store_class(retriever.store.spec)(dim=retriever.store.dim, spec=retriever.store.spec),
+                bm25=BM25Index(k1=retriever.bm25.k1, b=retriever.bm25.b) if retriever.bm25 is not None else None,
+                hybrid_weight=retriever.hybrid_weight,
+            )
+            rebuilt, full = self.reindex(empty)
+            full.removed = len(retriever.store)
+            full.docs_added, full.docs_changed, full.docs_removed = stats.docs_added, stats.docs_changed, stats.docs_removed
+            full.duration_ms = (time.perf_counter() - start) * 1000
+            return rebuilt, full
+
+        store = retriever.store.copy()
+        stats.removed = store.remove(stale_ids)
+        # the BM25 postings follow the store: same ids, updated on a copy
+        bm25 = retriever.bm25.copy() if retriever.bm25 is not None else None
+        if bm25 is not None:
+            bm25.remove(stale_ids)
+
+        states = {s.source_file: s for _, s in changed}
+        stream = self._chunks([f for f, _ in changed])
+        while chunks := list(islice(stream, _ADD_BATCH)):
+            texts = [c.text for c in chunks]
+            ids = store.add(retriever.embed(texts), chunks)
+            if bm25 is not None:
+                bm25.add(ids, texts)
+            for chunk_id, chunk in zip(ids.tolist(), chunks):
+                states[chunk.metadata["source_file"]].chunk_ids.append(chunk_id)
+            stats.added += len(chunks)
+
+        stats.duration_ms = (time.perf_counter() - start) * 1000
+        return Retriever(
+            embedder=retriever.embedder,
+            store=store,
+            documents=documents,
+            bm25=bm25,
+            hybrid_weight=retriever.hybrid_weight,
+        ), stats
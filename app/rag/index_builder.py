@@ -1,14 +1,356 @@
-from app.rag.loaders import load_documents_from_folder
-from app.rag.chunking import chunk_documents
-from app.rag.retriever import Retriever
+import argparse
+import logging
+import shutil
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from app.rag.bm25 import BM25Index
+from app.rag.chunking import CHUNK_UNITS
+from app.rag.embedding_cache import cached_embedder, get_embedding_cache
+from app.rag.embedding_executor import EXECUTOR_KINDS, build_embedder
+from app.rag.embeddings import Embedder, HashingEmbedder
+from app.rag.incremental import IncrementalIndexer
+from app.rag.loaders import RecordFields
+from app.rag.retriever import DEFAULT_HYBRID_WEIGHT, Retriever
+from app.rag.vector_store import INDEX_KINDS, QUANTIZATIONS, SHARD_KEYS, IndexSpec, store_class
+from app.rag.snapshot import SnapshotManifest, corpus_hash, read_manifest
+
+logger = logging.getLogger("app.rag.index_builder")
 
 def build_retriever_from_folder(
         folder_path: str = "data/docs",
         chunk_size: int = 400,
         overlap: int = 80,
         dim: int = 256,
+        spec: IndexSpec | None = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        chunk_unit: str = "chars",
+        fields: RecordFields | None = None,
+        embedder: Embedder | None = None,
 ) -> Retriever:
-    docs = load_documents_from_folder(folder_path)
-    chunks = chunk_documents(docs, chunk_size=chunk_size, overlap=overlap)
-    return Retriever.from_chunks(chunks, dim=dim)
+    # a full build is a delta against an empty index
+    empty = Retriever(
+        embedder=embedder or HashingEmbedder(dim=dim),
+        store=store_class(spec)(dim=dim, spec=spec),
+        bm25=BM25Index() if hybrid_weight > 0 else None,
+        hybrid_weight=hybrid_weight,
+    )
+    indexer = IncrementalIndexer(folder_path, chunk_size=chunk_size, overlap=overlap, chunk_unit=chunk_unit, fields=fields)
+    retriever, _ = indexer.reindex(empty)
+    return retriever
+
+
+def build_snapshot(
+        folder_path: str,
+        out_dir: str,
+        chunk_size: int = 400,
+        overlap: int = 80,
+        dim: int = 256,
+        spec: IndexSpec | None = None,
+        chunk_unit: str = "chars",
+        fields: RecordFields | None = None,
+        embedder: Embedder | None = None,
+) -> SnapshotManifest:
+    """
+    Build the index offline and write it as a snapshot directory.
+    Written to a sibling temp dir first, then swapped in, so readers never
+    see a partially written snapshot.
+    """
+    embedder = embedder or HashingEmbedder(dim=dim)
+    manifest = SnapshotManifest(
+        chunk_size=chunk_size,
+        overlap=overlap,
+        dim=dim,
+        corpus_hash=corpus_hash(folder_path),
+        num_chunks=0,
+        chunk_unit=chunk_unit,
+        record_fields=(fields or RecordFields()).to_dict(),
+        embedder=embedder.identity,
+        index=(spec or IndexSpec()).build_params(),
+    )
+    retriever = build_retriever_from_folder(
+        folder_path,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        dim=dim,
+        spec=spec,
+        chunk_unit=chunk_unit,
+        fields=fields,
+        embedder=embedder,
+    )
+    write_snapshot(retriever, manifest, out_dir)
+    return manifest
+
+
+def write_snapshot(retriever: Retriever, manifest: SnapshotManifest, out_dir: str) -> None:
+    """Save into a sibling temp dir, then swap it in for out_dir."""
+    manifest.num_chunks = len(retriever.store)
+    out = Path(out_dir)
+    tmp = out.with_name(out.name + ".tmp")
+    old = out.with_name(out.name + ".old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    retriever.save(tmp, manifest)
+
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_or_build_retriever(
+        folder_path: str = "data/docs",
+        snapshot_dir: str | None = None,
+        chunk_size: int = 400,
+        overlap: int = 80,
+        dim: int = 256,
+        verify_corpus: bool = False,
+        spec: IndexSpec | None = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        chunk_unit: str = "chars",
+        fields: RecordFields | None = None,
+        embedder: Embedder | None = None,
+) -> Retriever:
+    """
+    Load the snapshot when it matches the requested chunking/dim/index type, else build in memory.
+    verify_corpus re-hashes the docs folder (O(corpus) reads) to catch stale snapshots.
+    """
+    if snapshot_dir and Path(snapshot_dir).exists():
+        problem = snapshot_problem(
+            snapshot_dir, folder_path, chunk_size, overlap, dim, verify_corpus, spec, chunk_unit, fields,
+            embedder.identity if embedder else None,
+        )
+        if problem is None:
+            try:
+                return load_snapshot(snapshot_dir, spec=spec, hybrid_weight=hybrid_weight, embedder=embedder)
+            except ValueError as e:
+                problem = f"unusable ({e})"
+        logger.warning(f"snapshot={snapshot_dir} {problem}; rebuilding in memory")
+
+    return build_retriever_from_folder(
+        folder_path,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        dim=dim,
+        spec=spec,
+        hybrid_weight=hybrid_weight,
+        chunk_unit=chunk_unit,
+        fields=fields,
+        embedder=embedder,
+    )
+
+
+def snapshot_problem(
+        snapshot_dir: str | Path,
+        folder_path: str,
+        chunk_size: int,
+        overlap: int,
+        dim: int,
+        verify_corpus: bool = False,
+        spec: IndexSpec | None = None,
+        chunk_unit: str = "chars",
+        fields: RecordFields | None = None,
+        embedder: str | None = None,
+) -> str | None:
+    """Why the snapshot cannot serve these settings, or None when it can. embedder: Embedder.identity."""
+    try:
+        manifest = read_manifest(snapshot_dir)
+    except ValueError as e:
+        return f"unusable ({e})"
+    if manifest.embedder != (embedder or HashingEmbedder().identity):
+        return f"built with another embedder ({manifest.embedder})"
+    if not manifest.matches(
+        chunk_size=chunk_size, overlap=overlap, dim=dim, spec=spec, chunk_unit=chunk_unit, fields=fields,
+        embedder=embedder,
+    ):
+        return "built with different settings"
+    if verify_corpus and manifest.corpus_hash != corpus_hash(folder_path):
+        return "is stale (corpus changed)"
+    return None
+
+
+def load_snapshot(
+        snapshot_dir: str | Path,
+        spec: IndexSpec | None = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        embedder: Embedder | None = None,
+) -> Retriever:
+    """Memory-mapped Retriever.load, logged with its load time."""
+    start = time.perf_counter()
+    retriever = Retriever.load(snapshot_dir, mmap=True, spec=spec, hybrid_weight=hybrid_weight, embedder=embedder)
+    logger.info(
+        f"snapshot={snapshot_dir} chunks={len(retriever.store)} load_ms={(time.perf_counter() - start) * 1000:.2f}"
+    )
+    return retriever
+
+
+def embedder_from_settings(dim: int) -> Embedder:
+    """EMBEDDING_BACKEND of dim on its executor, behind the EMBEDDING_CACHE_DIR cache when it is set."""
+    from app.core.config import settings
+
+    embedder = build_embedder(
+        settings.embedding_backend,
+        dim,
+        workers=settings.embedding_workers,
+        batch_size=settings.embedding_batch_size,
+        executor=settings.embedding_executor,
+    )
+    return cached_embedder(embedder, settings.embedding_cache_dir)
+
+
+def index_spec_from_settings() -> IndexSpec:
+    from app.core.config import settings
+
+    return IndexSpec(
+        kind=settings.faiss_index_type,
+        nlist=settings.faiss_nlist,
+        nprobe=settings.faiss_nprobe,
+        pq_m=settings.faiss_pq_m,
+        pq_bits=settings.faiss_pq_bits,
+        hnsw_m=settings.faiss_hnsw_m,
+        ef_construction=settings.faiss_ef_construction,
+        ef_search=settings.faiss_ef_search,
+        quantization=settings.faiss_quantization,
+        shards=settings.faiss_shards,
+        shard_by=settings.faiss_shard_by,
+    )
+
+
+def record_fields_from_settings() -> RecordFields:
+    from app.core.config import settings
+
+    return RecordFields(
+        id=settings.rag_record_id_field,
+        text=settings.rag_record_text_field,
+        metadata=_field_list(settings.rag_record_metadata_fields),
+    )
+
+
+def _field_list(value: str) -> tuple[str, ...]:
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+def add_build_args(parser: argparse.ArgumentParser) -> None:
+    """Docs folder, snapshot dir, chunking and index flags (shared with app.rag.ingest)."""
+    from app.core.config import settings
+
+    parser.add_argument(
+        "--docs", default=settings.docs_dir, help="folder with .txt/.md documents and .jsonl/.csv exports (also .gz)"
+    )
+    parser.add_argument("--out", default=settings.index_snapshot_dir or "data/index", help="snapshot directory")
+    parser.add_argument("--chunk-size", type=int, default=settings.rag_chunk_size)
+    parser.add_argument("--overlap", type=int, default=settings.rag_chunk_overlap)
+    parser.add_argument("--chunk-unit", choices=CHUNK_UNITS, default=settings.rag_chunk_unit)
+    parser.add_argument("--dim", type=int, default=settings.embedding_dim)
+    parser.add_argument("--index-type", choices=INDEX_KINDS, default=settings.faiss_index_type)
+    parser.add_argument("--nlist", type=int, default=settings.faiss_nlist, help="IVF clusters")
+    parser.add_argument("--pq-m", type=int, default=settings.faiss_pq_m, help="PQ sub-quantizers (must divide dim)")
+    parser.add_argument("--pq-bits", type=int, default=settings.faiss_pq_bits)
+    parser.add_argument("--hnsw-m", type=int, default=settings.faiss_hnsw_m, help="HNSW graph degree")
+    parser.add_argument("--ef-construction", type=int, default=settings.faiss_ef_construction)
+    parser.add_argument(
+        "--quantization", choices=QUANTIZATIONS, default=settings.faiss_quantization, help="vector storage precision"
+    )
+    parser.add_argument("--shards", type=int, default=settings.faiss_shards, help="index shards searched in parallel")
+    parser.add_argument("--shard-by", choices=SHARD_KEYS, default=settings.faiss_shard_by)
+    parser.add_argument("--id-field", default=settings.rag_record_id_field, help="JSONL/CSV field used as doc_id")
+    parser.add_argument("--text-field", default=settings.rag_record_text_field, help="JSONL/CSV field with the text")
+    parser.add_argument("--embedding-backend", default=settings.embedding_backend, help="registered embedder name")
+    parser.add_argument(
+        "--embedding-workers",
+        type=int,
+        default=settings.embedding_workers,
+        help="embed batches on this many pool workers (1 = inline)",
+    )
+    parser.add_argument("--embedding-batch-size", type=int, default=settings.embedding_batch_size)
+    parser.add_argument("--embedding-executor", choices=EXECUTOR_KINDS, default=settings.embedding_executor)
+    parser.add_argument(
+        "--embedding-cache",
+        default=settings.embedding_cache_dir,
+        help="directory of the on-disk embedding cache (unchanged chunks are not re-embedded)",
+    )
+    parser.add_argument(
+        "--compact-embedding-cache",
+        action="store_true",
+        help="after the build, drop cached embeddings of chunks that are no longer in the corpus",
+    )
+    parser.add_argument(
+        "--metadata-fields",
+        default=settings.rag_record_metadata_fields,
+        help="comma-separated JSONL/CSV fields kept as metadata (default: all other fields)",
+    )
+
+
+def spec_from_args(args: argparse.Namespace) -> IndexSpec:
+    return replace(
+        index_spec_from_settings(),
+        kind=args.index_type,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        pq_bits=args.pq_bits,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction,
+        quantization=args.quantization,
+        shards=args.shards,
+        shard_by=args.shard_by,
+    )
+
+
+def fields_from_args(args: argparse.Namespace) -> RecordFields:
+    return RecordFields(id=args.id_field, text=args.text_field, metadata=_field_list(args.metadata_fields))
+
+
+def embedder_from_args(args: argparse.Namespace) -> Embedder:
+    embedder = build_embedder(
+        args.embedding_backend,
+        args.dim,
+        workers=args.embedding_workers,
+        batch_size=args.embedding_batch_size,
+        executor=args.embedding_executor,
+    )
+    return cached_embedder(embedder, args.embedding_cache)
+
+
+def finish_embedding_cache(args: argparse.Namespace) -> str:
+    """Compact the embedding cache if asked; returns its summary for the build report ("" without a cache)."""
+    if not args.embedding_cache:
+        return ""
+    cache = get_embedding_cache(args.embedding_cache)
+    dropped = cache.compact() if args.compact_embedding_cache else 0
+    stats = cache.stats()
+    hit_rate = stats["hit_rate"] if stats["hit_rate"] is not None else 0.0
+    return (
+        f"embedding_cache={args.embedding_cache} hit_rate={hit_rate:.3f} hits={stats['hits']} "
+        f"misses={stats['misses']} entries={stats['entries']} compacted={dropped}"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build an index snapshot from a docs folder.")
+    add_build_args(parser)
+    args = parser.parse_args(argv)
+
+    spec = spec_from_args(args)
+    start = time.perf_counter()
+    manifest = build_snapshot(
+        args.docs,
+        args.out,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        dim=args.dim,
+        spec=spec,
+        chunk_unit=args.chunk_unit,
+        fields=fields_from_args(args),
+        embedder=embedder_from_args(args),
+    )
+    print(
+        f"snapshot={args.out} chunks={manifest.num_chunks} dim={manifest.dim} index={spec.kind} "
+        f"corpus_hash={manifest.corpus_hash[:12]} build_s={time.perf_counter() - start:.2f}"
+    )
+    if cache_line := finish_embedding_cache(args):
+        print(cache_line)
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.bm25 import BM25Index
+from app.rag.chunking import iter_document_pieces, make_chunk
+from app.rag.embeddings import Embedder, HashingEmbedder
+from app.rag.index_builder import (
+    add_build_args,
+    embedder_from_args,
+    fields_from_args,
+    finish_embedding_cache,
+    spec_from_args,
+    write_snapshot,
+)
+from app.rag.loaders import RecordFields, file_digest, iter_document_files, source_name
+from app.rag.retriever import DEFAULT_HYBRID_WEIGHT, Retriever
+from app.rag.snapshot import DocState, SnapshotManifest, corpus_hash
+from app.rag.vector_store import IndexSpec, store_class
+
+logger = logging.getLogger("app.rag.ingest")
+
+# end-of-stream marker on every queue
+_DONE = None
+# IVF indexes train on the first vectors written: buffer this many per cluster first
+_TRAIN_POINTS_PER_LIST = 40
+# int8 flat / hnsw indexes learn their value ranges from the first vectors written
+_SQ_TRAIN_POINTS = 16384
+
+
+@dataclass
+class StageStats:
+    docs: int = 0
+    chunks: int = 0
+    busy_s: float = 0.0  # summed over the stage's workers
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, docs: int = 0, chunks: int = 0, busy_s: float = 0.0) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now - busy_s
+            self.finished = now
+            self.docs += docs
+            self.chunks += chunks
+            self.busy_s += busy_s
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished - self.started) if self.started is not None else 0.0
+
+    def to_dict(self) -> dict:
+        elapsed = self.elapsed_s or float("inf")
+        return {
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "busy_s": round(self.busy_s, 3),
+            "elapsed_s": round(self.elapsed_s, 3),
+            "docs_per_s": round(self.docs / elapsed, 1),
+            "chunks_per_s": round(self.chunks / elapsed, 1),
+        }
+
+
+@dataclass
+class IngestStats:
+    discover: StageStats = field(default_factory=StageStats)
+    chunk: StageStats = field(default_factory=StageStats)
+    embed: StageStats = field(default_factory=StageStats)
+    write: StageStats = field(default_factory=StageStats)
+    duration_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        stages = {name: stage.to_dict() for name, stage in self.stages()}
+        return {**stages, "duration_s": round(self.duration_s, 3)}
+
+    def stages(self) -> List[Tuple[str, StageStats]]:
+        return [("discover", self.discover), ("chunk", self.chunk), ("embed", self.embed), ("write", self.write)]
+
+    def progress_line(self) -> str:
+        return " ".join(f"{name}={stage.docs}d/{stage.chunks}c" for name, stage in self.stages())
+
+
+# a slice of one document's chunks: (position of the first text among the
+# file's chunks, doc_id, metadata, chunk_index of the first text, texts)
+_Row = Tuple[int, str, dict, int, List[str]]
+
+
+@dataclass
+class _Batch:
+    rows: List[_Row] = field(default_factory=list)
+    docs: List[DocState] = field(default_factory=list)
+    size: int = 0
+
+
+def _chunk_worker(
+    paths, out, root: str, chunk_size: int, overlap: int, unit: str, fields: RecordFields, batch_size: int
+) -> None:
+    """
+    Process-pool stage: read, normalize and chunk one file at a time.
+    A file's chunks go out in messages of about batch_size texts (many small
+    records share one message), then a "doc" message with its DocState
+    fields; a failure becomes an "error" message so the parent can report it.
+    """
+    while (path := paths.get()) is not _DONE:
+        start = time.perf_counter()
+        file_path = Path(path)
+        source = source_name(file_path, Path(root))
+        try:
+            st = file_path.stat()
+            digest = file_digest(file_path)
+            rows: List[_Row] = []
+            pos = size = 0
+            for doc_id, metadata, pieces in iter_document_pieces(
+                file_path, chunk_size, overlap, unit, root=Path(root), fields=fields
+            ):
+                first, texts = 0, []
+                for text in pieces:
+                    texts.append(text)
+                    if size + len(texts) == batch_size:
+                        out.put(("chunks", source, rows + [(pos, doc_id, metadata, first, texts)]))
+                        pos, first, texts = pos + len(texts), first + len(texts), []
+                        rows, size = [], 0
+                if texts:
+                    rows.append((pos, doc_id, metadata, first, texts))
+                    pos, size = pos + len(texts), size + len(texts)
+            if rows:
+                out.put(("chunks", source, rows))
+            out.put(("doc", source, digest, st.st_mtime_ns, st.st_size, time.perf_counter() - start))
+        except Exception as e:
+            out.put(("error", source, f"{type(e).__name__}: {e}"))
+    out.put(_DONE)
+
+
+def _concat(pending: List[Tuple[np.ndarray, list, List[int]]]) -> Tuple[np.ndarray, list, List[int]]:
+    return (
+        np.vstack([v for v, _, _ in pending]),
+        [c for _, cs, _ in pending for c in cs],
+        [p for _, _, ps in pending for p in ps],
+    )
+
+
+class IngestPipeline:
+    """
+    Staged, parallel index build:
+    discovery -> read/clean/chunk (process pool) -> batched embedding
+    (threads) -> single index writer (the calling thread).
+    Stages are connected by bounded queues, so a slow stage holds the
+    earlier ones back instead of letting chunks pile up in memory.
+    """
+
+    def __init__(
+        self,
+        folder_path: str,
+        chunk_size: int = 400,
+        overlap: int = 80,
+        chunk_unit: str = "chars",
+        fields: Optional[RecordFields] = None,
+        dim: int = 256,
+        spec: Optional[IndexSpec] = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        workers: int = 2,
+        embed_workers: int = 2,
+        batch_size: int = 1024,
+        queue_size: int = 8,
+        embedder: Optional[Embedder] = None,
+    ):
+        if workers < 1 or embed_workers < 1 or batch_size < 1 or queue_size < 1:
+            raise ValueError("workers, embed_workers, batch_size and queue_size must be >= 1")
+        self.folder_path = folder_path
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.chunk_unit = chunk_unit
+        self.fields = fields or RecordFields()
+        self.spec = spec or IndexSpec()
+        self.dim = dim
+        self.hybrid_weight = hybrid_weight
+        self.workers = workers
+        self.embed_workers = embed_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.embedder = embedder or HashingEmbedder(dim=dim)
+        self.stats = IngestStats()
+        self._errors: List[str] = []
+
+    # ---- stages ------------------------------------------------------------
+
+    def _discover(self, paths) -> None:
+        try:
+            for file_path in iter_document_files(self.folder_path):
+                paths.put(str(file_path))
+                self.stats.discover.record(docs=1)
+        except Exception as e:
+            self._errors.append(f"{self.folder_path}: {type(e).__name__}: {e}")
+        finally:
+            for _ in range(self.workers):
+                paths.put(_DONE)
+
+    def _collect(self, chunked, batches: queue.Queue, procs: list) -> None:
+        """Regroup the workers' per-document slices into embedding batches of batch_size texts."""
+        batch, running = _Batch(), self.workers
+        while running:
+            try:
+                msg = chunked.get(timeout=1.0)
+            except queue.Empty:
+                if any(p.is_alive() for p in procs):
+                    continue
+                # a worker died without its end marker (killed, or failed to start)
+                codes = [p.exitcode for p in procs]
+                self._errors.append(f"chunk worker exited unexpectedly (exit codes {codes})")
+                break
+            if msg is _DONE:
+                running -= 1
+                continue
+            kind, source_file, *rest = msg
+            if kind == "chunks":
+                (rows,) = rest
+                self.stats.chunk.record(chunks=sum(len(row[-1]) for row in rows))
+                for pos, doc_id, metadata, first, texts in rows:
+                    while texts:
+                        take = texts[: self.batch_size - batch.size]
+                        batch.rows.append((pos, doc_id, metadata, first, take))
+                        batch.size += len(take)
+                        pos, first, texts = pos + len(take), first + len(take), texts[len(take):]
+                        if batch.size == self.batch_size:
+                            batches.put(batch)
+                            batch = _Batch()
+            elif kind == "doc":
+                digest, mtime_ns, size, seconds = rest
+                batch.docs.append(DocState(source_file=source_file, content_hash=digest, mtime_ns=mtime_ns, size=size))
+                self.stats.chunk.record(docs=1, busy_s=seconds)
+            else:
+                self._errors.append(f"{source_file}: {rest[0]}")
+        if batch.rows or batch.docs:
+            batches.put(batch)
+        for _ in range(self.embed_workers):
+            batches.put(_DONE)
+
+    def _embed(self, batches: queue.Queue, embedded: queue.Queue) -> None:
+        while (batch := batches.get()) is not _DONE:
+            start = time.perf_counter()
+            texts = [t for row in batch.rows for t in row[-1]]
+            if self.spec.is_sparse:
+                vectors = self.embedder.embed_sparse(texts)
+            else:
+                vectors = self.embedder.embed_texts(texts) if texts else np.zeros((0, self.dim), dtype=np.float32)
+            self.stats.embed.record(chunks=len(texts), busy_s=time.perf_counter() - start)
+            embedded.put((batch, vectors))
+        embedded.put(_DONE)
+
+    def _write(self, embedded: queue.Queue, progress: Optional[Callable[[IngestStats], None]], progress_s: float) -> Retriever:
+        store = store_class(self.spec)(dim=self.dim, spec=self.spec)
+        bm25 = BM25Index() if self.hybrid_weight > 0 else None
+        documents: Dict[str, DocState] = {}
+        # source_file -> (position among the file's chunks, store id) pairs
+        chunk_ids: Dict[str, List[Tuple[int, int]]] = {}
+        # hold batches back until there is enough to train IVF clusters / int8 ranges on
+        train_size = 0
+        if self.spec.is_ivf:
+            train_size = _TRAIN_POINTS_PER_LIST * self.spec.nlist
+        elif self.spec.needs_training:
+            train_size = _SQ_TRAIN_POINTS
+        # each shard trains on its own share of the buffer
+        train_size *= self.spec.shards
+        pending: List[Tuple[np.ndarray, list, List[int]]] = []
+        pending_rows = 0
+        # every BM25 add re-merges all postings: add in doubling steps (amortized
+        # linear) and read the texts back from the store instead of holding them
+        bm25_ids: List[np.ndarray] = []
+
+        def flush_bm25() -> None:
+            ids = np.concatenate(bm25_ids)
+            bm25_ids.clear()
+            bm25.add(ids, [store.text(i) for i in ids.tolist()])
+
+        def add(vectors: np.ndarray, chunks: list, positions: List[int]) -> None:
+            start = time.perf_counter()
+            ids = store.add(vectors, chunks)
+            if bm25 is not None:
+                bm25_ids.append(ids)
+                if sum(map(len, bm25_ids)) >= max(len(bm25), 8 * self.batch_size):
+                    flush_bm25()
+            for chunk_id, chunk, pos in zip(ids.tolist(), chunks, positions):
+                chunk_ids.setdefault(chunk.metadata["source_file"], []).append((pos, chunk_id))
+            self.stats.write.record(chunks=len(chunks), busy_s=time.perf_counter() - start)
+
+        last_report = time.perf_counter()
+        running = self.embed_workers
+        while running:
+            item = embedded.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            batch, vectors = item
+            for state in batch.docs:
+                documents[state.source_file] = state
+            self.stats.write.record(docs=len(batch.docs))
+            chunks, positions = [], []
+            for pos, doc_id, metadata, first, texts in batch.rows:
+                chunks.extend(make_chunk(doc_id, first + i, text, metadata) for i, text in enumerate(texts))
+                positions.extend(range(pos, pos + len(texts)))
+            if not chunks:
+                continue
+            if pending_rows + len(chunks) < train_size and not store.is_trained:
+                pending.append((vectors, chunks, positions))
+                pending_rows += len(chunks)
+            else:
+                if pending:
+                    pending.append((vectors, chunks, positions))
+                    add(*_concat(pending))
+                    pending, pending_rows = [], 0
+                else:
+                    add(vectors, chunks, positions)
+            if progress is not None and time.perf_counter() - last_report >= progress_s:
+                progress(self.stats)
+                last_report = time.perf_counter()
+        if pending:
+            add(*_concat(pending))
+        if bm25_ids:
+            start = time.perf_counter()
+            flush_bm25()
+            self.stats.write.record(busy_s=time.perf_counter() - start)
+
+        for state in documents.values():
+            # slices of one file can be embedded out of order; keep chunk order
+            state.chunk_ids = [i for _, i in sorted(chunk_ids.get(state.source_file, []))]
+        return Retriever(
+            embedder=self.embedder, store=store, documents=documents, bm25=bm25, hybrid_weight=self.hybrid_weight
+        )
+
+    # ---- driver ------------------------------------------------------------
+
+    def run(
+        self,
+        progress: Optional[Callable[[IngestStats], None]] = None,
+        progress_s: float = 5.0,
+    ) -> Tuple[Retriever, IngestStats]:
+        start = time.perf_counter()
+        # spawn, not fork: the parent may already run threads (FAISS/BLAS pools)
+        ctx = mp.get_context("spawn")
+        paths = ctx.Queue(maxsize=self.queue_size * self.workers)
+        chunked = ctx.Queue(maxsize=self.queue_size * self.workers)
+        batches: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        procs = [
+            ctx.Process(
+                target=_chunk_worker,
+                args=(
+                    paths, chunked, self.folder_path, self.chunk_size, self.overlap,
+                    self.chunk_unit, self.fields, self.batch_size,
+                ),
+                daemon=True,
+            )
+            for _ in range(self.workers)
+        ]
+        for p in procs:
+            p.start()
+        threads = [
+            threading.Thread(target=self._discover, args=(paths,), daemon=True),
+            threading.Thread(target=self._collect, args=(chunked, batches, procs), daemon=True),
+            *(threading.Thread(target=self._embed, args=(batches, embedded), daemon=True) for _ in range(self.embed_workers)),
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            retriever = self._write(embedded, progress, progress_s)
+            for t in threads[1:]:
+                t.join()
+            if not self._errors:
+                # after a worker died, discovery may be stuck on a full queue; it is a daemon
+                threads[0].join()
+                for p in procs:
+                    p.join()
+        finally:
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+
+        if self._errors:
+            raise ValueError(f"Ingest failed ({len(self._errors)} errors): " + "; ".join(self._errors[:5]))
+        self.stats.duration_s = time.perf_counter() - start
+        return retriever, self.stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build an index snapshot with a parallel ingestion pipeline.")
+    add_build_args(parser)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="chunking processes")
+    parser.add_argument("--embed-workers", type=int, default=2, help="embedding threads")
+    parser.add_argument("--batch-size", type=int, default=1024, help="chunks per embedding batch")
+    parser.add_argument("--queue-size", type=int, default=8, help="bound of each inter-stage queue")
+    parser.add_argument("--progress-s", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    spec = spec_from_args(args)
+    fields = fields_from_args(args)
+    embedder = embedder_from_args(args)
+    pipeline = IngestPipeline(
+        args.docs,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        chunk_unit=args.chunk_unit,
+        fields=fields,
+        dim=args.dim,
+        spec=spec,
+        workers=args.workers,
+        embed_workers=args.embed_workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        embedder=embedder,
+    )
+    retriever, stats = pipeline.run(
+        progress=lambda s: print(f"progress {s.progress_line()}", file=sys.stderr, flush=True),
+        progress_s=args.progress_s,
+    )
+    manifest = SnapshotManifest(
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        dim=args.dim,
+        corpus_hash=corpus_hash(args.docs),
+        num_chunks=0,
+        chunk_unit=args.chunk_unit,
+        record_fields=fields.to_dict(),
+        embedder=embedder.identity,
+        index=spec.build_params(),
+    )
+    write_snapshot(retriever, manifest, args.out)
+
+    for name, stage in stats.stages():
+        s = stage.to_dict()
+        print(
+            f"{name:>8} docs={s['docs']} chunks={s['chunks']} docs/s={s['docs_per_s']} "
+            f"chunks/s={s['chunks_per_s']} busy_s={s['busy_s']}"
+        )
+    print(
+        f"snapshot={args.out} chunks={manifest.num_chunks} dim={manifest.dim} index={spec.kind} "
+        f"workers={args.workers} embed_workers={args.embed_workers} total_s={stats.duration_s:.2f}"
+    )
+    if cache_line := finish_embedding_cache(args):
+        print(cache_line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,190 @@
+import csv
+import gzip
+import hashlib
+import json
+import sys
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
 
 from app.models.documents import Document
 
 
-SUPPORTED_EXTENSIONS = {".txt", ".md"}
+# read block by block by the chunker; every other format goes through its loader
+TEXT_EXTENSIONS = {".txt", ".md"}
+# compression suffix -> opener; "a.jsonl.gz" is loaded as ".jsonl"
+COMPRESSED_EXTENSIONS: Dict[str, Callable[..., IO]] = {".gz": gzip.open}
 
 
-def load_documents_from_folder(folder_path: str) -> List[Document]:
+@dataclass(frozen=True)
+class RecordFields:
+    """
+    Which fields of a JSONL / CSV record become the Document.
+    - id: doc_id (records without one get "<file>:<record number>")
+    - text: the text to chunk (records without text are skipped)
+    - metadata: fields kept as chunk metadata; empty keeps every other scalar field
+    """
+    id: str = "id"
+    text: str = "text"
+    metadata: Tuple[str, ...] = ()
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "text": self.text, "metadata": list(self.metadata)}
+
+
+# loader(file_path, source_name, fields) -> Documents of one file, lazily
+Loader = Callable[[Path, str, RecordFields], Iterator[Document]]
+LOADERS: Dict[str, Loader] = {}
+
+
+def register_loader(suffix: str, loader: Loader) -> None:
+    """Index files ending in suffix (e.g. ".xml") with loader; also picked up when gzip-compressed."""
+    LOADERS[suffix.lower()] = loader
+
+
+def split_suffix(file_path: Path) -> Tuple[str, Optional[str]]:
+    """(format suffix, compression suffix or None): "a.jsonl.gz" -> (".jsonl", ".gz")."""
+    suffixes = [s.lower() for s in file_path.suffixes]
+    if suffixes and suffixes[-1] in COMPRESSED_EXTENSIONS:
+        return (suffixes[-2] if len(suffixes) > 1 else ""), suffixes[-1]
+    return (suffixes[-1] if suffixes else ""), None
+
+
+def source_name(file_path: Path, root: Optional[Path] = None) -> str:
+    """The file's path relative to the docs folder (just its name without a root); the source_file metadata."""
+    return file_path.relative_to(root).as_posix() if root is not None else file_path.name
+
+
+def doc_key(source: str) -> str:
+    """source_name without format / compression suffix: "hr/leave.md.gz" -> "hr/leave"."""
+    path = Path(source)
+    fmt, compression = split_suffix(path)
+    name = path.name[: len(path.name) - len(fmt) - len(compression or "")]
+    return (path.parent / name).as_posix() if path.parent != Path(".") else name
+
+
+def open_text(file_path: Path, newline: Optional[str] = None) -> IO[str]:
+    _, compression = split_suffix(file_path)
+    opener = COMPRESSED_EXTENSIONS[compression] if compression else open
+    return opener(file_path, "rt", encoding="utf-8", newline=newline)
+
+
+def iter_document_files(folder_path: str) -> Iterator[Path]:
+    """Indexable files under folder_path, recursively, in relative path order (hidden directories skipped)."""
     folder = Path(folder_path)
     if not folder.exists() or not folder.is_dir():
         raise ValueError(f"Folder not found or not a directory: {folder_path}")
 
-    docs: List[Document] = []
-    for file_path in sorted(folder.iterdir()):
-        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+    files = []
+    for file_path in folder.rglob("*"):
+        rel = file_path.relative_to(folder)
+        if any(part.startswith(".") for part in rel.parts[:-1]) or not file_path.is_file():
             continue
+        if split_suffix(file_path)[0] in LOADERS:
+            files.append((rel.as_posix(), file_path))
+    for _, file_path in sorted(files):
+        yield file_path
+
+
+def read_blocks(file_path: Path, block_size: int = 1 << 16) -> Iterator[str]:
+    """Decoded text of a (possibly compressed) file in blocks of block_size characters; \r\n and \r become \n."""
+    with open_text(file_path) as f:
+        yield from iter(lambda: f.read(block_size), "")
 
-        text = file_path.read_text(encoding="utf-8").strip()
-        if not text:
-            continue
 
-        docs.append(
-            Document(
-                doc_id=file_path.stem,
-                text=text,
-                metadata={"source_file": file_path.name},
-            )
-        )
+def file_digest(file_path: Path) -> str:
+    """sha256 of the file bytes, read in 1 MiB blocks."""
+    h = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_text(file_path: Path, source: str, fields: RecordFields) -> Iterator[Document]:
+    with open_text(file_path) as f:
+        text = f.read().strip()
+    if text:
+        yield Document(doc_id=doc_key(source), text=text, metadata={"source_file": source})
+
+
+def record_document(record: dict, source: str, n: int, fields: RecordFields) -> Optional[Document]:
+    """Document of the n-th record of a file; None when it has no text."""
+    text = record.get(fields.text)
+    if text is None or not str(text).strip():
+        return None
+    doc_id = record.get(fields.id)
+    doc_id = str(doc_id) if doc_id not in (None, "") else f"{doc_key(source)}:{n}"
+
+    if fields.metadata:
+        metadata = {k: str(record[k]) for k in fields.metadata if record.get(k) is not None}
+    else:
+        metadata = {
+            k: str(v) for k, v in record.items()
+            if k not in (fields.id, fields.text) and isinstance(v, (str, int, float, bool))
+        }
+    metadata["source_file"] = source
+    return Document(doc_id=doc_id, text=str(text).strip(), metadata=metadata)
+
+
+def _load_jsonl(file_path: Path, source: str, fields: RecordFields) -> Iterator[Document]:
+    with open_text(file_path) as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{source}:{n}: invalid JSON ({e})") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"{source}:{n}: expected a JSON object, got {type(record).__name__}")
+            doc = record_document(record, source, n, fields)
+            if doc is not None:
+                yield doc
+
+
+def _load_csv(file_path: Path, source: str, fields: RecordFields) -> Iterator[Document]:
+    # the default 128 KiB field limit is too small for exported document bodies
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    with open_text(file_path, newline="") as f:
+        reader = csv.DictReader(f)
+        # fieldnames is None for an empty file
+        if reader.fieldnames is not None and fields.text not in reader.fieldnames:
+            raise ValueError(f"{source}: no {fields.text!r} column (columns: {', '.join(reader.fieldnames)})")
+        for n, row in enumerate(reader, 1):
+            doc = record_document(row, source, n, fields)
+            if doc is not None:
+                yield doc
+
+
+for _suffix in TEXT_EXTENSIONS:
+    register_loader(_suffix, _load_text)
+register_loader(".jsonl", _load_jsonl)
+register_loader(".ndjson", _load_jsonl)
+register_loader(".csv", _load_csv)
+
+
+def iter_documents(
+    file_path: Path,
+    root: Optional[Path] = None,
+    fields: Optional[RecordFields] = None,
+) -> Iterator[Document]:
+    """Documents of one file, one record at a time (a text file is one Document)."""
+    fmt, _ = split_suffix(file_path)
+    if fmt not in LOADERS:
+        raise ValueError(f"No loader for {file_path.name}")
+    return LOADERS[fmt](file_path, source_name(file_path, root), fields or RecordFields())
+
+
+def load_document(file_path: Path) -> Optional[Document]:
+    """Returns None for empty files."""
+    return next(iter_documents(file_path), None)
+
+
+def load_documents_from_folder(folder_path: str, fields: Optional[RecordFields] = None) -> List[Document]:
+    root = Path(folder_path)
+    docs: List[Document] = []
+    for file_path in iter_document_files(folder_path):
+        docs.extend(iter_documents(file_path, root=root, fields=fields))
 
-    return docs
\ No newline at end of file
+    return docs
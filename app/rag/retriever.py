@@ -1,24 +1,221 @@
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
 
 from app.models.documents import Chunk
-from app.rag.embeddings import Embedder, HashingEmbedder
-from app.rag.vector_store import FaissVectorStore, SearchResult
+from app.rag.bm25 import BM25_FILE, BM25Index, top_k
+from app.rag.embeddings import Embedder, HashingEmbedder, SparseRows
+from app.rag.snapshot import (
+    DocState,
+    SnapshotManifest,
+    read_documents,
+    read_manifest,
+    write_documents,
+    write_manifest,
+)
+from app.rag.vector_store import (
+    FaissVectorStore,
+    FilterKey,
+    IndexSpec,
+    MetadataFilter,
+    SearchResult,
+    normalize_filters,
+    store_class,
+)
+
+# Share of the BM25 score in hybrid results (0 = vector only)
+DEFAULT_HYBRID_WEIGHT = 0.3
+# Each side of a hybrid search contributes this many candidates per result
+_HYBRID_CANDIDATES = 4
+
 
 class Retriever:
-    def __init__(self, embedder: Embedder, store: FaissVectorStore):
+    """
+    Vector search over the FAISS store, optionally fused with BM25 over the
+    same chunks: score = (1 - w) * cosine + w * normalized BM25, for the top
+    candidates of either side. Chunks found only by BM25 get their cosine
+    computed from a fresh embedding.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        store: FaissVectorStore,
+        documents: Optional[Dict[str, DocState]] = None,
+        bm25: Optional[BM25Index] = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+    ):
         self.embedder = embedder
         self.store = store
+        # per-source-document content hash + chunk ids (used for incremental reindexing)
+        self.documents: Dict[str, DocState] = documents or {}
+        self.bm25 = bm25
+        self.hybrid_weight = hybrid_weight
 
     @classmethod
-    def from_chunks(cls, chunks: List[Chunk], dim: int = 256) -> "Retriever":
-        embedder = HashingEmbedder(dim=dim)
-        store = FaissVectorStore(dim=dim)
-        
-        vectors = embedder.embed_texts([c.text for c in chunks])
-        store.add(vectors, chunks)
-        return cls(embedder=embedder, store=store)
+    def from_chunks(
+        cls,
+        chunks: List[Chunk],
+        dim: int = 256,
+        spec: Optional[IndexSpec] = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        embedder: Optional[Embedder] = None,
+    ) -> "Retriever":
+        """embedder defaults to a HashingEmbedder of dim; a ParallelEmbedder spreads the chunks over a pool."""
+        embedder = embedder or HashingEmbedder(dim=dim)
+        store = store_class(spec)(dim=embedder.dim, spec=spec)
+        retriever = cls(embedder=embedder, store=store, hybrid_weight=hybrid_weight)
+
+        ids = store.add(retriever.embed([c.text for c in chunks]), chunks)
+        retriever.bm25 = BM25Index.from_chunks(ids, chunks) if hybrid_weight > 0 else None
+        return retriever
+
+    def embed(self, texts: List[str], queries: bool = False) -> Union[np.ndarray, SparseRows]:
+        """Embeddings in the form the store takes: dense rows, or sparse rows for a sparse index."""
+        if self.store.spec.is_sparse:
+            return self.embedder.embed_sparse(texts)
+        return self.embedder.embed_queries(texts) if queries else self.embedder.embed_texts(texts)
+
+    def _hybrid(self, hybrid_weight: Optional[float]) -> float:
+        weight = self.hybrid_weight if hybrid_weight is None else hybrid_weight
+        return weight if self.bm25 is not None else 0.0
     
-    def retrieve(self, query: str, k: int = 5) -> List[SearchResult]:
-        qv = self.embedder.embed_query(query)
-        return self.store.search(qv, k=k)
-    
\ No newline at end of file
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        hybrid_weight: Optional[float] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[SearchResult]:
+        return self.retrieve_batch(
+            [query], k=k, nprobe=nprobe, ef_search=ef_search, hybrid_weight=hybrid_weight, filters=filters
+        )[0]
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        hybrid_weight: Optional[float] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[List[SearchResult]]:
+        """
+        Embed all queries as one matrix and run a single multi-row search.
+        filters (e.g. {"source_file": ["a.txt", "b.txt"]}) restrict every query
+        to the matching chunks.
+        """
+        qv = self.embed(queries, queries=True)
+        filters = normalize_filters(filters)
+        weight = self._hybrid(hybrid_weight)
+        if weight <= 0:
+            return self.store.search_batch(qv, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+
+        candidates = k * _HYBRID_CANDIDATES
+        batch = self.store.search_batch(qv, k=candidates, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        allowed = self.store.select(filters) if filters is not None else None
+        return [
+            self._fuse(query, qv[row], results, k, candidates, weight, allowed)
+            for row, (query, results) in enumerate(zip(queries, batch))
+        ]
+
+    def _fuse(
+        self,
+        query: str,
+        query_vector: Union[np.ndarray, SparseRows],
+        vector_results: List[SearchResult],
+        k: int,
+        candidates: int,
+        weight: float,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[SearchResult]:
+        lex_ids, lex_scores = self.bm25.scores(query)
+        if allowed is not None and len(lex_ids):
+            keep = np.isin(lex_ids, allowed, assume_unique=True)
+            lex_ids, lex_scores = lex_ids[keep], lex_scores[keep]
+        if not len(lex_ids):
+            # nothing to fuse: plain cosine scores, as with hybrid search off
+            return vector_results[:k]
+
+        cosine = {r.id: r.score for r in vector_results}
+        lexical_only = [
+            int(i) for i in lex_ids[top_k(lex_scores, candidates)]
+            if int(i) not in cosine and int(i) in self.store
+        ]
+        if lexical_only:
+            vectors = self.embed([self.store.text(i) for i in lexical_only])
+            cosine.update(zip(lexical_only, _cosines(vectors, query_vector).tolist()))
+
+        ids = np.fromiter(cosine, dtype=np.int64, count=len(cosine))
+        # BM25 score of every candidate (0 when it shares no term with the query)
+        pos = np.minimum(np.searchsorted(lex_ids, ids), len(lex_ids) - 1)
+        lexical = np.where(lex_ids[pos] == ids, lex_scores[pos], 0.0)
+        fused = (1 - weight) * np.fromiter(cosine.values(), dtype=np.float64, count=len(ids)) + weight * lexical
+
+        return [
+            SearchResult(chunk=self.store.get(int(ids[i])), score=float(fused[i]), id=int(ids[i]))
+            for i in top_k(fused, k)
+        ]
+
+    def save(self, path: str | Path, manifest: SnapshotManifest) -> None:
+        """
+        Write a snapshot directory: FAISS index, chunk table and manifest.
+        The manifest goes last so a half-written directory never looks valid.
+        """
+        self.store.save(path)
+        if self.bm25 is not None:
+            self.bm25.save(path)
+        write_documents(path, self.documents)
+        write_manifest(path, manifest)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        mmap: bool = True,
+        spec: Optional[IndexSpec] = None,
+        hybrid_weight: float = DEFAULT_HYBRID_WEIGHT,
+        embedder: Optional[Embedder] = None,
+    ) -> "Retriever":
+        """
+        spec overrides the search-time knobs (nprobe / ef_search); by default
+        the spec recorded in the manifest is used. Snapshots written without a
+        BM25 index get one built from their chunks when hybrid search is on.
+        embedder defaults to a HashingEmbedder of the snapshot's dim and must
+        be the one the snapshot was built with (same identity).
+        """
+        manifest = read_manifest(path)
+        embedder = embedder or HashingEmbedder(dim=manifest.dim)
+        if embedder.dim != manifest.dim:
+            raise ValueError(f"Embedder dim {embedder.dim} does not match manifest dim {manifest.dim}")
+        if embedder.identity != manifest.embedder:
+            raise ValueError(f"Embedder {embedder.identity} does not match manifest embedder {manifest.embedder}")
+        spec = spec or manifest.index_spec()
+        store = store_class(spec).load(path, mmap=mmap, spec=spec)
+        if store.dim != manifest.dim:
+            raise ValueError(f"Snapshot index dim {store.dim} does not match manifest dim {manifest.dim}")
+        bm25 = None
+        if hybrid_weight > 0:
+            if (Path(path) / BM25_FILE).exists():
+                bm25 = BM25Index.load(path, mmap=mmap)
+            else:
+                ids = store.ids()
+                bm25 = BM25Index()
+                bm25.add(ids, [store.text(i) for i in ids.tolist()])
+        return cls(
+            embedder=embedder,
+            store=store,
+            documents=read_documents(path),
+            bm25=bm25,
+            hybrid_weight=hybrid_weight,
+        )
+
+
+def _cosines(vectors: Union[np.ndarray, SparseRows], query: Union[np.ndarray, SparseRows]) -> np.ndarray:
+    """Cosine of each (normalized) row against the query."""
+    if isinstance(query, SparseRows):
+        return vectors.dot(query) / (float(np.linalg.norm(query.values)) or 1.0)
+    return vectors @ (query / (float(np.linalg.norm(query)) or 1.0))
@@ -0,0 +1,276 @@
+import heapq
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import SparseRows
+from app.rag.vector_store import (
+    FaissVectorStore,
+    FilterKey,
+    IndexSpec,
+    MetadataFilter,
+    SearchResult,
+    normalize_filters,
+    store_class,
+)
+
+SHARDS_DIR = "shards"
+_SHARDS_FILE = "shards.json"
+
+# one pool for every sharded store in the process, grown to the largest shard count seen
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _submit_all(calls: List[Callable[[], Tuple[np.ndarray, np.ndarray]]]) -> list:
+    """Run calls on the shared shard pool; a pool outgrown is shut down (its running searches finish)."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if len(calls) > _POOL_SIZE:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL, _POOL_SIZE = ThreadPoolExecutor(len(calls), thread_name_prefix="shard"), len(calls)
+        return [_POOL.submit(call) for call in calls]
+
+
+def _take(vectors: Union[np.ndarray, SparseRows], rows: np.ndarray) -> Union[np.ndarray, SparseRows]:
+    return vectors.take(rows) if isinstance(vectors, SparseRows) else vectors[rows]
+
+
+class ShardedVectorStore:
+    """
+    The FaissVectorStore API over spec.shards independent stores of the same
+    index kind. Store id g lives in shard g % shards under local id
+    g // shards, so every shard keeps dense ids of its own and the owner of
+    an id needs no lookup table.
+    - shard_by="chunk": new ids are handed out in sequence (round robin, balanced)
+    - shard_by="doc": a chunk goes to the shard crc32(doc_id) picks, keeping
+      a document's chunks (and their removal on reindex) in one shard
+    A search fans out to every shard on one thread pool shared by all stores
+    (FAISS releases the GIL while scanning) and merges the per-shard top k
+    into the global top k.
+    Each shard is saved to its own directory and loads as a plain store.
+    """
+
+    def __init__(self, dim: int, spec: Optional[IndexSpec] = None):
+        self.dim = dim
+        self.spec = spec or IndexSpec()
+        shard_spec = replace(self.spec, shards=1)
+        self.shards: List[FaissVectorStore] = [
+            store_class(shard_spec)(dim=dim, spec=shard_spec) for _ in range(self.spec.shards)
+        ]
+        self._next_id = 0
+
+    @classmethod
+    def from_shards(cls, shards: List[FaissVectorStore], spec: IndexSpec, next_id: int) -> "ShardedVectorStore":
+        """A store over existing shards (loaded or copied); no empty ones are built first."""
+        store = cls.__new__(cls)
+        store.dim = shards[0].dim
+        store.spec = spec
+        store.shards = shards
+        store._next_id = next_id
+        return store
+
+    @property
+    def n_shards(self) -> int:
+        return len(self.shards)
+
+    def _split(self, ids: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(positions in ids, local ids) per shard."""
+        owner = ids % self.n_shards
+        return [((pos := np.flatnonzero(owner == s)), ids[pos] // self.n_shards) for s in range(self.n_shards)]
+
+    def _global(self, shard: int, local: np.ndarray) -> np.ndarray:
+        return local * self.n_shards + shard
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.shards)
+
+    def __contains__(self, id: int) -> bool:
+        return id >= 0 and (id // self.n_shards) in self.shards[id % self.n_shards]
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Boolean mask: which of ids are stored."""
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.zeros(len(ids), dtype=bool)
+        for shard, (pos, local) in zip(self.shards, self._split(ids)):
+            out[pos] = shard.contains(local)
+        return out
+
+    def get(self, id: int) -> Optional[Chunk]:
+        return self.shards[id % self.n_shards].get(id // self.n_shards) if id >= 0 else None
+
+    def text(self, id: int) -> str:
+        return self.shards[id % self.n_shards].text(id // self.n_shards)
+
+    def ids(self) -> np.ndarray:
+        return np.sort(np.concatenate([self._global(s, shard.ids()) for s, shard in enumerate(self.shards)]))
+
+    def items(self) -> Iterable[Tuple[int, Chunk]]:
+        """(id, chunk) pairs, ids ascending."""
+        return heapq.merge(*(self._shard_items(s) for s in range(self.n_shards)), key=lambda item: item[0])
+
+    def _shard_items(self, s: int) -> Iterable[Tuple[int, Chunk]]:
+        for local, chunk in self.shards[s].items():
+            yield local * self.n_shards + s, chunk
+
+    @property
+    def supports_remove(self) -> bool:
+        return self.shards[0].supports_remove
+
+    @property
+    def is_trained(self) -> bool:
+        return all(s.is_trained for s in self.shards)
+
+    def _new_ids(self, chunks: List[Chunk]) -> np.ndarray:
+        if self.spec.shard_by == "chunk":
+            return np.arange(self._next_id, self._next_id + len(chunks), dtype=np.int64)
+        n = self.n_shards
+        owner = np.fromiter(
+            (zlib.crc32(c.doc_id.encode("utf-8")) % n for c in chunks), dtype=np.int64, count=len(chunks)
+        )
+        ids = np.empty(len(chunks), dtype=np.int64)
+        for s, shard in enumerate(self.shards):
+            pos = np.flatnonzero(owner == s)
+            ids[pos] = self._global(s, np.arange(shard._next_id, shard._next_id + len(pos), dtype=np.int64))
+        return ids
+
+    def add(self, vectors, chunks: List[Chunk], ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add vectors with their chunks. Returns the int64 ids assigned (or the given ids)."""
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"vectors must be shape (n, {self.dim})")
+        if len(chunks) != vectors.shape[0]:
+            raise ValueError("chunks length must match vectors rows")
+        if ids is None:
+            ids = self._new_ids(chunks)
+        else:
+            ids = np.asarray(ids, dtype=np.int64)
+            if ids.shape != (len(chunks),):
+                raise ValueError("ids length must match chunks")
+            if self.contains(ids).any():
+                raise ValueError("ids already present in the store")
+
+        for shard, (pos, local) in zip(self.shards, self._split(ids)):
+            if len(pos):
+                shard.add(_take(vectors, pos), [chunks[i] for i in pos.tolist()], ids=local)
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+        return ids
+
+    def remove(self, ids: Sequence[int]) -> int:
+        """Remove chunks by id. Returns how many were removed."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        ids = ids[ids >= 0]
+        if len(ids) and not self.supports_remove:
+            if self.contains(ids).any():
+                raise ValueError(f"Index kind {self.spec.kind!r} does not support removal; rebuild instead")
+            return 0
+        return sum(shard.remove(local) for shard, (_, local) in zip(self.shards, self._split(ids)) if len(local))
+
+    def copy(self) -> "ShardedVectorStore":
+        """Independent copy (every shard copied); see FaissVectorStore.copy."""
+        return self.from_shards([s.copy() for s in self.shards], self.spec, self._next_id)
+
+    def select(self, filters: Union[MetadataFilter, FilterKey]) -> np.ndarray:
+        """Sorted ids of the chunks matching a metadata filter."""
+        filters = normalize_filters(filters)
+        if filters is None:
+            return self.ids()
+        return np.sort(np.concatenate([self._global(s, shard.select(filters)) for s, shard in enumerate(self.shards)]))
+
+    def search(
+        self,
+        query_vector,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[SearchResult]:
+        query = query_vector.reshape(1, -1) if isinstance(query_vector, np.ndarray) else query_vector
+        return self.search_batch(query, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)[0]
+
+    def _search_shard(self, s: int, query_vectors, k: int, filters: Optional[FilterKey], nprobe, ef_search):
+        shard = self.shards[s]
+        n = query_vectors.shape[0]
+        allowed = shard.select(filters) if filters is not None else None
+        if not len(shard) or (allowed is not None and not len(allowed)):
+            return np.full((n, 0), -np.inf, dtype=np.float32), np.zeros((n, 0), dtype=np.int64)
+        scores, local = shard._search(query_vectors, k, allowed, nprobe, ef_search)
+        return scores, np.where(local >= 0, self._global(s, local), -1)
+
+    def search_batch(
+        self,
+        query_vectors,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[List[SearchResult]]:
+        """
+        Every shard searched at once, then one merge: the global top k is
+        among the per-shard top k lists, so ranking them all together is
+        exact for exact index kinds.
+        """
+        n = query_vectors.shape[0]
+        if k <= 0 or n == 0:
+            return [[] for _ in range(n)]
+        filters = normalize_filters(filters)
+
+        args = (query_vectors, k, filters, nprobe, ef_search)
+        futures = _submit_all([partial(self._search_shard, s, *args) for s in range(1, self.n_shards)])
+        # the calling thread takes the first shard instead of waiting idle
+        parts = [self._search_shard(0, *args)] + [f.result() for f in futures]
+        scores = np.concatenate([p[0] for p in parts], axis=1)
+        ids = np.concatenate([p[1] for p in parts], axis=1)
+        # a missing hit (-1) scores -inf / -FLT_MAX and sorts last
+        scores = np.where(ids >= 0, scores, -np.inf)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+        batch: List[List[SearchResult]] = []
+        for row_scores, row_ids in zip(
+            np.take_along_axis(scores, order, axis=1).tolist(), np.take_along_axis(ids, order, axis=1).tolist()
+        ):
+            batch.append([
+                SearchResult(chunk=self.get(idx), score=float(score), id=idx)
+                for score, idx in zip(row_scores, row_ids)
+                if idx != -1
+            ])
+        return batch
+
+    @staticmethod
+    def shard_dir(path: str | Path, shard: int) -> Path:
+        """Where shard i of a saved store lives; loadable on its own with FaissVectorStore.load."""
+        return Path(path) / SHARDS_DIR / str(shard)
+
+    def save(self, path: str | Path) -> None:
+        out = Path(path)
+        for s, shard in enumerate(self.shards):
+            shard.save(self.shard_dir(out, s))
+        (out / SHARDS_DIR / _SHARDS_FILE).write_text(
+            json.dumps({"shards": self.n_shards, "shard_by": self.spec.shard_by, "next_id": self._next_id}),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True, spec: Optional[IndexSpec] = None) -> "ShardedVectorStore":
+        src = Path(path)
+        header_file = src / SHARDS_DIR / _SHARDS_FILE
+        if not header_file.exists():
+            raise ValueError(f"Sharded store not found: {src / SHARDS_DIR}")
+        header = json.loads(header_file.read_text(encoding="utf-8"))
+        spec = spec or IndexSpec(shards=header["shards"], shard_by=header["shard_by"])
+        if (spec.shards, spec.shard_by) != (header["shards"], header["shard_by"]):
+            raise ValueError(f"Snapshot has {header['shards']} shards by {header['shard_by']}, not {spec.shards} by {spec.shard_by}")
+
+        shard_spec = replace(spec, shards=1)
+        shards = [store_class(shard_spec).load(cls.shard_dir(src, s), mmap=mmap, spec=shard_spec) for s in range(spec.shards)]
+        return cls.from_shards(shards, spec, header["next_id"])
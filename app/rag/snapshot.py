@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.rag.embeddings import HashingEmbedder
+from app.rag.loaders import RecordFields, iter_document_files, source_name
+from app.rag.vector_store import IndexSpec
+
+# Bump whenever the on-disk layout of a snapshot (or how chunks are cut) changes.
+SNAPSHOT_VERSION = 6
+MANIFEST_FILE = "manifest.json"
+DOCUMENTS_FILE = "documents.json"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+_GENERATION_DIR = re.compile(r"gen-(\d+)")
+
+
+@dataclass
+class DocState:
+    """What the index currently holds for one source file (keyed by source_file, suffix included)."""
+    source_file: str
+    content_hash: str
+    mtime_ns: int
+    size: int
+    chunk_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class SnapshotManifest:
+    """
+    Describes how a snapshot directory was built.
+    Loaders compare it with the running config before trusting the index.
+    """
+    chunk_size: int
+    overlap: int
+    dim: int
+    corpus_hash: str
+    num_chunks: int
+    chunk_unit: str = "chars"
+    # RecordFields.to_dict(): how JSONL / CSV records map to documents
+    record_fields: Dict[str, Any] = field(default_factory=lambda: RecordFields().to_dict())
+    # Embedder.identity of the vectors; queries embedded by another model score against nonsense
+    embedder: str = field(default_factory=lambda: HashingEmbedder().identity)
+    # IndexSpec.build_params(); older snapshots without it are flat indexes
+    index: Dict[str, Any] = field(default_factory=lambda: IndexSpec().build_params())
+    version: int = SNAPSHOT_VERSION
+    created_at: float = field(default_factory=time.time)
+
+    def matches(
+            self,
+            chunk_size: int,
+            overlap: int,
+            dim: int,
+            spec: IndexSpec | None = None,
+            chunk_unit: str = "chars",
+            fields: RecordFields | None = None,
+            embedder: str | None = None,
+    ) -> bool:
+        """embedder: Embedder.identity of the running embedder (default: the hashing one)."""
+        return (
+            self.version == SNAPSHOT_VERSION
+            and self.chunk_size == chunk_size
+            and self.overlap == overlap
+            and self.chunk_unit == chunk_unit
+            and self.record_fields == (fields or RecordFields()).to_dict()
+            and self.dim == dim
+            and self.embedder == (embedder or HashingEmbedder().identity)
+            # through IndexSpec: parameters added later take their defaults
+            and self.index_spec().build_params() == (spec or IndexSpec()).build_params()
+        )
+
+    def index_spec(self) -> IndexSpec:
+        return IndexSpec(**self.index)
+
+
+def corpus_hash(folder_path: str) -> str:
+    """
+    sha256 over (relative path, file bytes) of every indexable file, in path order.
+    """
+    h = hashlib.sha256()
+    root = Path(folder_path)
+    for file_path in iter_document_files(folder_path):
+        h.update(source_name(file_path, root).encode("utf-8"))
+        h.update(b"\0")
+        with file_path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def write_manifest(path: str | Path, manifest: SnapshotManifest) -> None:
+    target = Path(path) / MANIFEST_FILE
+    target.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+
+
+def read_manifest(path: str | Path) -> SnapshotManifest:
+    target = Path(path) / MANIFEST_FILE
+    if not target.exists():
+        raise ValueError(f"Snapshot manifest not found: {target}")
+    data = json.loads(target.read_text(encoding="utf-8"))
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot version {data.get('version')} (expected {SNAPSHOT_VERSION})"
+        )
+    return SnapshotManifest(**data)
+
+
+def write_documents(path: str | Path, documents: Dict[str, DocState]) -> None:
+    target = Path(path) / DOCUMENTS_FILE
+    data = {doc_id: asdict(state) for doc_id, state in documents.items()}
+    target.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+
+def read_documents(path: str | Path) -> Dict[str, DocState]:
+    target = Path(path) / DOCUMENTS_FILE
+    if not target.exists():
+        return {}
+    data = json.loads(target.read_text(encoding="utf-8"))
+    return {doc_id: DocState(**state) for doc_id, state in data.items()}
+
+
+class SnapshotGenerations:
+    """
+    Numbered snapshots under one root, for processes that share an index
+    through mmap (uvicorn --workers N):
+    - root/gen-000042/: an ordinary snapshot directory, never modified once published
+    - root/CURRENT: the live generation number, replaced atomically by publish()
+    - root/LOCK: flock held by the one process building or publishing at a time
+    Every reader maps the same files read-only, so the OS page cache holds one
+    copy of the vectors, chunk columns and BM25 postings. Generations older
+    than the newest `keep` are deleted on publish; a process still serving
+    one keeps its mapped pages until it swaps (unlinked files stay readable).
+    """
+
+    def __init__(self, root: str | Path, keep: int = 2):
+        if keep < 1:
+            raise ValueError("keep must be >= 1")
+        self.root = Path(root)
+        self.keep = keep
+
+    def path(self, generation: int) -> Path:
+        return self.root / f"gen-{generation:06d}"
+
+    def generations(self) -> List[int]:
+        """Published generations on disk, ascending."""
+        if not self.root.exists():
+            return []
+        return sorted(int(m.group(1)) for p in self.root.iterdir() if (m := _GENERATION_DIR.fullmatch(p.name)))
+
+    def current(self) -> Optional[int]:
+        try:
+            return int((self.root / CURRENT_FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Exclusive across processes (and across threads opening it separately). POSIX only."""
+        import fcntl
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def publish(self, write: Callable[[Path], Any]) -> int:
+        """
+        write(dir) a new snapshot, then make it the current generation.
+        Call under lock(). Returns the new generation number.
+        """
+        generation = max(self.generations() + [self.current() or 0]) + 1
+        tmp = self.root / f".gen-{generation:06d}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        write(tmp)
+        tmp.rename(self.path(generation))
+
+        pointer = self.root / f".{CURRENT_FILE}.tmp"
+        pointer.write_text(str(generation), encoding="utf-8")
+        os.replace(pointer, self.root / CURRENT_FILE)
+        for old in self.generations():
+            if old <= generation - self.keep:
+                shutil.rmtree(self.path(old), ignore_errors=True)
+        return generation
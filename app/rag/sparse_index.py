@@ -0,0 +1,184 @@
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.rag.bm25 import Segment, top_k
+from app.rag.embeddings import SparseRows
+
+SPARSE_DIR = "sparse"
+_HEADER_FILE = "index.json"
+_MAX_ID = np.iinfo(np.int32).max
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    out = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    out[: len(array)] = array
+    return out
+
+
+class SparseIndex:
+    """
+    Inverted index over sparse embedding rows, scored by dot product.
+    Postings (bucket -> ids / weights) live in a few immutable CSR segments:
+    add() appends one and merges neighbours of similar size, so each posting
+    is rewritten O(log n) times however the adds are batched. remove() only
+    marks ids; their postings are dropped when a merge next touches them.
+    A query reads just the postings of its own nonzero buckets.
+    Exposes the bits of the FAISS index interface FaissVectorStore uses.
+    """
+
+    is_trained = True
+
+    def __init__(self, dim: int):
+        self.d = dim
+        self.segments: List[Segment] = []
+        # indexed by id: currently in the index / postings count / removed but postings not yet dropped
+        self.present = np.zeros(0, dtype=bool)
+        self.nnz_by_id = np.zeros(0, dtype=np.int32)
+        self.stale = np.zeros(0, dtype=bool)
+        self.ntotal = 0
+        self._dead_nnz = 0
+
+    @property
+    def nnz(self) -> int:
+        return sum(s.nnz for s in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [a for s in self.segments for a in (s.buckets, s.offsets, s.ids, s.weights)]
+        return sum(a.nbytes for a in arrays) + self.present.nbytes + self.nnz_by_id.nbytes + self.stale.nbytes
+
+    def add_with_ids(self, rows: SparseRows, ids: np.ndarray) -> None:
+        if not isinstance(rows, SparseRows):
+            raise ValueError("the sparse index takes SparseRows (Embedder.embed_sparse)")
+        if not len(ids):
+            return
+        if int(ids.max()) > _MAX_ID or int(ids.min()) < 0:
+            raise ValueError("sparse index ids must be in [0, 2**31)")
+        size = int(ids.max()) + 1
+        self.present = _grow(self.present, size)
+        self.nnz_by_id = _grow(self.nnz_by_id, size)
+        self.stale = _grow(self.stale, size)
+        if self.stale[ids].any():
+            # old postings of a re-added id must go before the new ones arrive
+            self._compact()
+
+        counts = np.diff(rows.indptr)
+        self.present[ids] = True
+        self.nnz_by_id[ids] = counts
+        self.ntotal += len(ids)
+        if len(rows.indices):
+            owners = np.repeat(ids.astype(np.int32), counts)
+            self.segments.append(Segment.build(rows.indices, owners, rows.values.astype(np.float32)))
+            while len(self.segments) > 1 and self.segments[-2].nnz <= 2 * self.segments[-1].nnz:
+                last = self.segments.pop()
+                self.segments[-1] = self._merge([self.segments[-1], last])
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        ids = ids[(ids >= 0) & (ids < len(self.present))]
+        ids = ids[self.present[ids]]
+        self.present[ids] = False
+        self.stale[ids] = True
+        self.ntotal -= len(ids)
+        self._dead_nnz += int(self.nnz_by_id[ids].sum())
+        if self._dead_nnz * 2 > self.nnz:
+            self._compact()
+        return len(ids)
+
+    def _merge(self, segments: Sequence[Segment]) -> Segment:
+        terms = np.concatenate([s.terms() for s in segments])
+        ids = np.concatenate([s.ids for s in segments])
+        weights = np.concatenate([s.weights for s in segments])
+        live = self.present[ids]
+        self._dead_nnz -= int(len(ids) - np.count_nonzero(live))
+        return Segment.build(terms[live], ids[live], weights[live])
+
+    def _compact(self) -> None:
+        """Merge everything into one segment, dropping all removed postings."""
+        self.segments = [self._merge(self.segments)] if self.segments else []
+        self.stale[:] = False
+        self._dead_nnz = 0
+
+    def copy(self) -> "SparseIndex":
+        other = SparseIndex(self.d)
+        # segments are immutable: shared
+        other.segments = list(self.segments)
+        other.present = self.present.copy()
+        other.nnz_by_id = self.nnz_by_id.copy()
+        other.stale = self.stale.copy()
+        other.ntotal = self.ntotal
+        other._dead_nnz = self._dead_nnz
+        return other
+
+    def search(self, queries: SparseRows, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (scores, ids) of shape (n, k) like faiss Index.search, -1 ids past the
+        last match. Only rows sharing a bucket with the query are candidates;
+        allowed (sorted ids) restricts them further.
+        """
+        n = len(queries)
+        scores = np.full((n, k), -np.inf, dtype=np.float32)
+        found = np.full((n, k), -1, dtype=np.int64)
+        mask = None
+        if allowed is not None:
+            mask = np.zeros(len(self.present), dtype=bool)
+            mask[allowed[allowed < len(mask)]] = True
+
+        for row in range(n):
+            lo, hi = queries.indptr[row], queries.indptr[row + 1]
+            buckets, qvalues = queries.indices[lo:hi], queries.values[lo:hi]
+            ids, weights = [], []
+            for seg in self.segments:
+                hit, starts, ends = seg.ranges(buckets)
+                q = qvalues[hit]
+                ids.extend(seg.ids[s:e] for s, e in zip(starts.tolist(), ends.tolist()))
+                weights.extend(seg.weights[s:e] * w for s, e, w in zip(starts.tolist(), ends.tolist(), q.tolist()))
+            if not ids:
+                continue
+            ids = np.concatenate(ids)
+            # dense accumulator over the id range: one bincount, no per-id Python work
+            acc = np.bincount(ids, weights=np.concatenate(weights), minlength=len(self.present))
+            keep = (acc > 0) & self.present
+            if mask is not None:
+                keep &= mask
+            candidates = np.flatnonzero(keep)
+            best = candidates[top_k(acc[candidates], k)]
+            scores[row, : len(best)] = acc[best]
+            found[row, : len(best)] = best
+        return scores, found
+
+    def save(self, path: str | Path) -> None:
+        out = Path(path) / SPARSE_DIR
+        out.mkdir(parents=True, exist_ok=True)
+        seg = self._merge(self.segments) if self.segments else Segment.build(
+            np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        )
+        arrays = {
+            "buckets": seg.buckets, "offsets": seg.offsets, "ids": seg.ids, "weights": seg.weights,
+            "present": self.present, "nnz_by_id": self.nnz_by_id,
+        }
+        for name, array in arrays.items():
+            np.save(out / f"{name}.npy", array)
+        (out / _HEADER_FILE).write_text(json.dumps({"dim": self.d, "ntotal": self.ntotal}), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "SparseIndex":
+        """With mmap=True the postings stay in the page cache; the per-id arrays are read into memory."""
+        src = Path(path) / SPARSE_DIR
+        if not (src / _HEADER_FILE).exists():
+            raise ValueError(f"Sparse index not found: {src}")
+        header = json.loads((src / _HEADER_FILE).read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        index = cls(header["dim"])
+        postings = [np.load(src / f"{name}.npy", mmap_mode=mode) for name in ("buckets", "offsets", "ids", "weights")]
+        if len(postings[2]):
+            index.segments = [Segment(*postings)]
+        index.present = np.load(src / "present.npy")
+        index.nnz_by_id = np.load(src / "nnz_by_id.npy")
+        index.stale = np.zeros(len(index.present), dtype=bool)
+        index.ntotal = header["ntotal"]
+        return index
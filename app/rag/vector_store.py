@@ -1,55 +1,536 @@
-from dataclasses import dataclass
-from typing import List, Tuple
+import math
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import faiss # type: ignore
 
 from app.models.documents import Chunk
+from app.rag.chunk_store import ChunkStore
+from app.rag.sparse_index import SparseIndex
+
+INDEX_FILE = "index.faiss"
+
+def set_blas_threshold(rows: int) -> int:
+    """
+    Query rows at which flat search switches from a per-query scan to one BLAS
+    matrix product (FAISS default 20). Process-wide FAISS state, so only the
+    app sets it (FAISS_BLAS_THRESHOLD). Measured at 100k x 256: 8 rows take
+    43ms via BLAS vs 88ms scanned, a single row 11ms scanned vs 24ms via BLAS.
+    Returns the previous value.
+    """
+    previous = faiss.cvar.distance_compute_blas_threshold
+    faiss.cvar.distance_compute_blas_threshold = rows
+    return previous
 
 @dataclass
 class SearchResult:
     chunk: Chunk
     score: float # higer = more similar
+    id: int = -1  # store id of the chunk
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sparse")
+# how flat / ivf_flat / hnsw store each vector component: 4, 2 or 1 byte(s)
+QUANTIZATIONS = ("float32", "fp16", "int8")
+# how a sharded store spreads chunks: round robin by id, or all chunks of a doc_id together
+SHARD_KEYS = ("chunk", "doc")
+_SQ_CODES = {"fp16": "SQfp16", "int8": "SQ8"}
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Which FAISS index backs the store.
+    - flat: exact brute force (default)
+    - ivf_flat / ivf_pq: inverted file over nlist k-means clusters (PQ compresses vectors); needs training
+    - hnsw: graph index; fast and accurate but cannot remove vectors
+    - sparse: inverted index over sparse embeddings (no FAISS), exact; for
+      large hashing dims where dense vectors would not fit in memory
+    quantization stores vectors of flat / ivf_flat / hnsw as fp16 (half the
+    memory) or int8 (a quarter; per-dimension ranges learned from the first
+    vectors added, like IVF training).
+    nprobe / ef_search are search-time knobs and can be overridden per query.
+    shards > 1 splits the chunks over that many indexes of this kind, searched
+    in parallel (ShardedVectorStore); shard_by is one of SHARD_KEYS.
+    """
+    kind: str = "flat"
+    nlist: int = 1024
+    nprobe: int = 16
+    pq_m: int = 16
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 40
+    ef_search: int = 64
+    quantization: str = "float32"
+    shards: int = 1
+    shard_by: str = "chunk"
+
+    def __post_init__(self):
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {self.kind!r} (expected one of {INDEX_KINDS})")
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {self.quantization!r} (expected one of {QUANTIZATIONS})")
+        if self.kind in ("ivf_pq", "sparse") and self.quantization != "float32":
+            raise ValueError(f"{self.kind} does not take quantization; it applies to flat, ivf_flat and hnsw")
+        if self.shards < 1:
+            raise ValueError("shards must be >= 1")
+        if self.shard_by not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard_by {self.shard_by!r} (expected one of {SHARD_KEYS})")
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.kind.startswith("ivf")
+
+    @property
+    def is_sparse(self) -> bool:
+        return self.kind == "sparse"
+
+    @property
+    def needs_training(self) -> bool:
+        return self.is_ivf or self.quantization == "int8"
+
+    def build_params(self) -> Dict[str, Any]:
+        """Parameters baked into the index at build time (search knobs excluded)."""
+        params = asdict(self)
+        params.pop("nprobe")
+        params.pop("ef_search")
+        return params
+
+    def factory_string(self, dim: int, n_train: int = 0) -> str:
+        codes = _SQ_CODES.get(self.quantization, "Flat")
+        if self.kind == "flat":
+            return f"IDMap,{codes}"
+        if self.kind == "hnsw":
+            return f"IDMap,HNSW{self.hnsw_m}" + (f"_{codes}" if codes != "Flat" else "")
+        # IVF keeps the caller's ids natively; IDMap on top would break remove_ids
+        # (IndexIDMap assumes the inner index renumbers rows after a removal).
+        nlist = max(1, min(self.nlist, n_train)) if n_train else self.nlist
+        if self.kind == "ivf_flat":
+            return f"IVF{nlist},{codes}"
+        if dim % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} must divide dim={dim}")
+        # PQ codebooks need >= 2**bits training points; shrink codes for tiny corpora
+        bits = min(self.pq_bits, int(math.log2(n_train))) if n_train else self.pq_bits
+        return f"IVF{nlist},PQ{self.pq_m}x{max(1, bits)}"
+
+
+# {"source_file": "a.txt"} or {"source_file": ["a.txt", "b.txt"], "doc_id": "c"}:
+# a chunk matches when, for every field, its value is one of the listed ones
+MetadataFilter = Dict[str, Union[str, Sequence[str]]]
+# normalize_filters() output: hashable, so equal filters can share a search
+FilterKey = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+_NO_IDS = np.zeros(0, dtype=np.int64)
+
+
+def normalize_filters(filters: Union[MetadataFilter, FilterKey, None]) -> Optional[FilterKey]:
+    """Canonical form of a filter; None when there is nothing to filter on."""
+    if not filters:
+        return None
+    if isinstance(filters, tuple):
+        return filters
+    return tuple(sorted(
+        (field, tuple(sorted({values} if isinstance(values, str) else set(values))))
+        for field, values in filters.items()
+    ))
+
+
+class MetadataIndex:
+    """
+    (field, value) -> sorted int64 array of the chunk ids carrying that value,
+    for doc_id and every metadata field. Arrays are replaced, never modified
+    in place, so copies can share them.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, Dict[str, np.ndarray]] = defaultdict(dict)
+
+    @staticmethod
+    def _group(ids: Iterable[int], chunks: Iterable[Chunk]) -> Dict[Tuple[str, str], np.ndarray]:
+        grouped: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for i, chunk in zip(ids, chunks):
+            grouped[("doc_id", chunk.doc_id)].append(i)
+            for field, value in chunk.metadata.items():
+                grouped[(field, value)].append(i)
+        return {key: np.asarray(group, dtype=np.int64) for key, group in grouped.items()}
+
+    @classmethod
+    def from_columns(cls, chunks: ChunkStore) -> "MetadataIndex":
+        """Build straight from the dictionary-encoded columns, without materializing chunks."""
+        index = cls()
+        for field, codes, values in chunks.columns():
+            ids = np.flatnonzero(chunks.alive & (codes >= 0))
+            # stable sort keeps ids ascending within each value
+            ids = ids[np.argsort(codes[ids], kind="stable")]
+            present, starts = np.unique(codes[ids], return_index=True)
+            for code, group in zip(present.tolist(), np.split(ids, starts[1:])):
+                index._ids[field][values[code]] = group.astype(np.int64)
+        return index
+
+    def add(self, ids: Iterable[int], chunks: Iterable[Chunk]) -> None:
+        for (field, value), new in self._group(ids, chunks).items():
+            old = self._ids[field].get(value)
+            self._ids[field][value] = np.unique(new) if old is None else np.union1d(old, new)
+
+    def remove(self, ids: Iterable[int], chunks: Iterable[Chunk]) -> None:
+        for (field, value), gone in self._group(ids, chunks).items():
+            left = np.setdiff1d(self._ids[field].get(value, _NO_IDS), gone, assume_unique=True)
+            if len(left):
+                self._ids[field][value] = left
+            else:
+                self._ids[field].pop(value, None)
+
+    def copy(self) -> "MetadataIndex":
+        other = MetadataIndex()
+        other._ids.update((field, dict(values)) for field, values in self._ids.items())
+        return other
+
+    def select(self, filters: FilterKey) -> np.ndarray:
+        """Sorted ids of the chunks matching every field of the filter."""
+        selected: Optional[np.ndarray] = None
+        for field, values in filters:
+            arrays = [a for a in map(self._ids.get(field, {}).get, values) if a is not None]
+            # a chunk has one value per field, so the arrays are disjoint
+            ids = np.sort(np.concatenate(arrays)) if len(arrays) > 1 else (arrays[0] if arrays else _NO_IDS)
+            selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+            if not len(selected):
+                break
+        return _NO_IDS if selected is None else selected
+
 
 class FaissVectorStore:
-    """In-memory FAISS index (cosine similarity via product on normalized vectors)"""
+    """
+    In-memory FAISS index (cosine similarity via product on normalized vectors).
+    Every chunk gets a stable int64 id, so chunks can be removed and re-added
+    without renumbering the rest of the index. The index type comes from an
+    IndexSpec; IVF indexes are trained on the first batch added.
+    """
 
-    def __init__(self, dim: int):
+    def __init__(self, dim: int, spec: Optional[IndexSpec] = None):
         self.dim = dim
-        self.index = faiss.IndexFlatIP(dim)
-        self._chunks: List[Chunk] = []
+        self.spec = spec or IndexSpec()
+        self.index = self._new_index()
+        self._chunks = ChunkStore()
+        self._next_id = 0
+        # set while self.index is a read-only view over this mmapped file
+        self._mmap_path: Path | None = None
+        # built on the first filtered search, then kept up to date
+        self._metadata: Optional[MetadataIndex] = None
+        self._metadata_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._chunks
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Boolean mask: which of ids are stored."""
+        return self._chunks.contains(ids)
+
+    def get(self, id: int) -> Optional[Chunk]:
+        return self._chunks.get(id)
+
+    def items(self) -> Iterable[Tuple[int, Chunk]]:
+        """(id, chunk) pairs, ids ascending."""
+        return iter(self._chunks)
+
+    def ids(self) -> np.ndarray:
+        return self._chunks.ids()
+
+    def text(self, id: int) -> str:
+        """Chunk text without building the Chunk."""
+        return self._chunks.text(id)
+
+    @property
+    def supports_remove(self) -> bool:
+        return self.spec.kind != "hnsw"
+
+    @property
+    def is_trained(self) -> bool:
+        return self.index.is_trained
+
+    def _new_index(self, n_train: int = 0):
+        index = faiss.index_factory(self.dim, self.spec.factory_string(self.dim, n_train), faiss.METRIC_INNER_PRODUCT)
+        if self.spec.kind == "hnsw":
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.spec.ef_construction
+        elif self.spec.kind == "ivf_pq":
+            # the factory turns on polysemous training (~10s per train) that only
+            # Hamming-threshold search uses; we never enable that search mode
+            faiss.downcast_index(index).do_polysemous_training = False
+        return index
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Train IVF centroids / PQ codebooks / int8 ranges. nlist is capped at the number of training vectors."""
+        vectors = self._normalize(vectors.astype(np.float32))
+        self.index = self._new_index(n_train=len(vectors))
+        self.index.train(vectors)
+
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int], sel=None):
+        extra = {"sel": sel} if sel is not None else {}
+        if self.spec.is_ivf:
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.spec.nprobe, **extra)
+        if self.spec.kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.spec.ef_search, **extra)
+        return faiss.SearchParameters(**extra) if extra else None
+
+    def _metadata_index(self) -> MetadataIndex:
+        if self._metadata is None:
+            with self._metadata_lock:
+                if self._metadata is None:
+                    self._metadata = MetadataIndex.from_columns(self._chunks)
+        return self._metadata
+
+    def select(self, filters: Union[MetadataFilter, FilterKey]) -> np.ndarray:
+        """Sorted ids of the chunks matching a metadata filter."""
+        filters = normalize_filters(filters)
+        if filters is None:
+            return self._chunks.ids()
+        return self._metadata_index().select(filters)
+
+    def _id_selector(self, ids: np.ndarray):
+        """
+        FAISS IDSelector over sorted ids: a bitmap over the id range for broad
+        filters (one bit test per scanned vector), a hash set for narrow ones.
+        Returns (selector, buffer); the buffer must outlive the search.
+        """
+        if len(ids) * 32 >= self._next_id:
+            mask = np.zeros(self._next_id, dtype=bool)
+            mask[ids] = True
+            bitmap = np.packbits(mask, bitorder="little")
+            return faiss.IDSelectorBitmap(self._next_id, faiss.swig_ptr(bitmap)), bitmap
+        return faiss.IDSelectorBatch(ids), ids
 
     @staticmethod
     def _normalize(vectors: np.ndarray) -> np.ndarray:
         norms = np.linalg.norm(vectors, axis=1, keepdims=True)
         norms[norms == 0] =1.0
         return vectors / norms
-    
-    def add(self, vectors: np.ndarray, chunks: List[Chunk]) -> None:
+
+    def _ensure_writable(self) -> None:
+        # FAISS aborts the process when resizing a mmapped code buffer (clones
+        # still share the view), so re-read the file into owned memory first.
+        if self._mmap_path is not None:
+            self.index = faiss.read_index(str(self._mmap_path))
+            self._mmap_path = None
+
+    def add(self, vectors: np.ndarray, chunks: List[Chunk], ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Add vectors with their chunks. Returns the int64 ids assigned (or the given ids).
+        """
         if vectors.ndim != 2 or vectors.shape[1] != self.dim:
             raise ValueError(f"vectors must be shape (n, {self.dim})")
         if len(chunks) != vectors.shape[0]:
             raise ValueError("chunks length must match vectors rows")
-        
+
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + len(chunks), dtype=np.int64)
+        else:
+            ids = np.asarray(ids, dtype=np.int64)
+            if ids.shape != (len(chunks),):
+                raise ValueError("ids length must match chunks")
+            if self._chunks.contains(ids).any():
+                raise ValueError("ids already present in the store")
+
+        self._add_vectors(vectors, ids)
+        self._chunks.add(ids, chunks)
+        if self._metadata is not None:
+            self._metadata.add(ids.tolist(), chunks)
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+        return ids
+
+    def _add_vectors(self, vectors: np.ndarray, ids: np.ndarray) -> None:
         vectors = vectors.astype(np.float32)
         vectors = self._normalize(vectors)
 
-        self.index.add(vectors)
-        self._chunks.extend(chunks)
+        self._ensure_writable()
+        if not self.index.is_trained:
+            self.train(vectors)
+        self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: Sequence[int]) -> int:
+        """Remove chunks by id. Returns how many were removed."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        ids = ids[self._chunks.contains(ids)]
+        if not len(ids):
+            return 0
+        if not self.supports_remove:
+            raise ValueError(f"Index kind {self.spec.kind!r} does not support removal; rebuild instead")
+        self._ensure_writable()
+        removed = self.index.remove_ids(ids)
+        if self._metadata is not None:
+            self._metadata.remove(ids.tolist(), [self._chunks.get(i) for i in ids.tolist()])
+        self._chunks.remove(ids)
+        return int(removed)
+
+    def copy(self) -> "FaissVectorStore":
+        """
+        Independent in-memory copy, used to apply index updates off to the side
+        while the original keeps serving queries.
+        """
+        other = type(self)(dim=self.dim, spec=self.spec)
+        other.index = self._copy_index()
+        other._chunks = self._chunks.copy()
+        other._next_id = self._next_id
+        other._metadata = self._metadata.copy() if self._metadata is not None else None
+        return other
+
+    def _copy_index(self):
+        if self._mmap_path is not None:
+            return faiss.read_index(str(self._mmap_path))
+        return faiss.clone_index(self.index)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[SearchResult]:
+        query = query_vector.reshape(1, -1) if isinstance(query_vector, np.ndarray) else query_vector
+        return self.search_batch(query, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)[0]
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Union[MetadataFilter, FilterKey, None] = None,
+    ) -> List[List[SearchResult]]:
+        """
+        One multi-row FAISS search (a single BLAS matrix product for flat indexes).
+        Returns one result list per query row. With filters, only matching
+        chunks are considered: the ids go to FAISS as an IDSelector, so the
+        filter is applied while scanning rather than to the top k.
+        """
+        n = query_vectors.shape[0]
+        if k <= 0 or n == 0:
+            return [[] for _ in range(n)]
+
+        allowed = None
+        filters = normalize_filters(filters)
+        if filters is not None:
+            allowed = self.select(filters)
+            if not len(allowed):
+                return [[] for _ in range(n)]
+
+        scores, idxs = self._search(query_vectors, k, allowed, nprobe, ef_search)
+        batch: List[List[SearchResult]] = []
+
+        for row_scores, row_idxs in zip(scores.tolist(), idxs.tolist()):
+            results: List[SearchResult] = []
+            for score, idx in zip(row_scores, row_idxs):
+                if idx == -1:
+                    continue
+
+                results.append(SearchResult(chunk=self._chunks.get(idx), score = float(score), id=idx))
+            batch.append(results)
 
-    def search(self, query_vector: np.ndarray, k: int = 5) -> List[SearchResult]:
-        if k <= 0:
-            return []
-        q = query_vector.astype(np.float32).reshape(1, -1)
+        return batch
+
+    def _search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed: Optional[np.ndarray],
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        n = query_vectors.shape[0]
+        q = query_vectors.astype(np.float32).reshape(n, -1)
         q = self._normalize(q)
+        sel = None
+        if allowed is not None:
+            sel, _buffer = self._id_selector(allowed)
+        return self.index.search(q, k, params=self._search_params(nprobe, ef_search, sel))
+
+    def save(self, path: str | Path) -> None:
+        """
+        Write the FAISS index and the chunk table into `path` (created if needed).
+        """
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        self._write_index(out)
+        self._chunks.save(out)
+
+    def _write_index(self, out: Path) -> None:
+        faiss.write_index(self.index, str(out / INDEX_FILE))
+
+    @classmethod
+    def _read_index(cls, src: Path, mmap: bool):
+        """(index, file to re-read it from when detaching a mmap, or None)."""
+        flags = (faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY) if mmap else 0
+        return faiss.read_index(str(src / INDEX_FILE), flags), (src / INDEX_FILE) if mmap else None
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True, spec: Optional[IndexSpec] = None) -> "FaissVectorStore":
+        """
+        Load a store written by save().
+        With mmap=True the vectors and the chunk columns stay in the OS page
+        cache instead of being copied into process memory; the first
+        add() / remove() detaches them.
+        """
+        src = Path(path)
+        index, mmap_path = cls._read_index(src, mmap)
+
+        chunks = ChunkStore.load(src, mmap=mmap)
+
+        if index.ntotal != len(chunks):
+            raise ValueError(f"Snapshot is inconsistent: {index.ntotal} vectors vs {len(chunks)} chunks")
+
+        store = cls(dim=index.d, spec=spec)
+        store.index = index
+        store._chunks = chunks
+        store._next_id = chunks.n_rows
+        store._mmap_path = mmap_path
+        return store
+
+
+class SparseVectorStore(FaissVectorStore):
+    """
+    FaissVectorStore with a SparseIndex in place of the FAISS index: takes
+    SparseRows (Embedder.embed_sparse) instead of dense vectors, so memory
+    follows the number of nonzeros rather than dim. Search is exact, and
+    chunk / metadata / filter handling is shared with the dense store.
+    """
+
+    def _new_index(self, n_train: int = 0) -> SparseIndex:
+        return SparseIndex(self.dim)
+
+    def train(self, vectors) -> None:
+        pass
+
+    def _ensure_writable(self) -> None:
+        # mmapped postings are never written: merges build new arrays
+        pass
+
+    def _add_vectors(self, vectors, ids: np.ndarray) -> None:
+        # rows come normalized from the embedder (cosine = dot product)
+        self.index.add_with_ids(vectors, ids)
+
+    def _copy_index(self) -> SparseIndex:
+        return self.index.copy()
+
+    def _search(self, query_vectors, k, allowed, nprobe, ef_search) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.search(query_vectors, k, allowed)
+
+    def _write_index(self, out: Path) -> None:
+        self.index.save(out)
+
+    @classmethod
+    def _read_index(cls, src: Path, mmap: bool):
+        return SparseIndex.load(src, mmap=mmap), None
 
-        scores, idxs = self.index.search(q, k)
-        results: List[SearchResult] = []
-        
-        for score, idx in zip(scores[0].tolist(), idxs[0].tolist()):
-            if idx == -1:
-                continue
 
-            results.append(SearchResult(chunk=self._chunks[idx], score = float(score)))
+def store_class(spec: Optional[IndexSpec]) -> type:
+    """The vector store implementation for an IndexSpec."""
+    if spec is not None and spec.shards > 1:
+        from app.rag.sharded_store import ShardedVectorStore  # imports this module
 
-        return results
+        return ShardedVectorStore
+    return SparseVectorStore if spec is not None and spec.is_sparse else FaissVectorStore
@@ -0,0 +1,217 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag.embeddings import HashingEmbedder
+from app.services.retriever_provider import RETRIEVER_PROVIDER, RetrieverProvider
+
+if TYPE_CHECKING:
+    from app.services.ask_service import AskResult
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+# questions are embedded at this dim when the index is sparse: its dim can be
+# far too large for a dense (max_entries, dim) matrix
+_SPARSE_INDEX_CACHE_DIM = 256
+
+
+def normalize_question(question: str) -> str:
+    """Exact-hit key: lowercase, punctuation dropped, whitespace collapsed."""
+    return " ".join(_NON_WORD.sub(" ", question.lower()).split())
+
+
+@dataclass
+class _Entry:
+    result: "AskResult"
+    slot: int
+    nbytes: int
+    expires_at: float
+
+
+class AnswerCache:
+    """
+    Answers keyed on the question, in front of the retrieval + LLM pipeline.
+    - exact hits: normalize_question() key
+    - near-duplicates (only with min_similarity set): cosine similarity of the
+      query embedding against the embeddings of cached questions (one
+      matrix-vector product) >= min_similarity. Off by default: bag-of-words
+      embeddings score "allowed" and "not allowed" questions near 0.99
+    - LRU eviction under max_entries and a max_bytes budget, plus a TTL
+    - everything is dropped when the index version changes (hot reload, reindex)
+    """
+
+    def __init__(
+        self,
+        provider: RetrieverProvider,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 << 20,
+        ttl_s: float = 3600.0,
+        min_similarity: Optional[float] = None,
+    ):
+        self.provider = provider
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys: List[Optional[str]] = []  # slot -> key
+        self._free: List[int] = []
+        self._vecs: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first put
+        self._live: np.ndarray = np.zeros(max_entries, dtype=bool)
+        self._bytes = 0
+        self._version: Optional[int] = None
+        self._dense_embedder = HashingEmbedder(dim=_SPARSE_INDEX_CACHE_DIM)
+
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        """
+        Embedding of the normalized question (None while the index is loading,
+        or when only exact matches are served).
+        The bag-of-words embedder treats "policy?" and "policy" as different tokens.
+        """
+        retriever = self.provider.current()
+        if retriever is None or self.min_similarity is None:
+            return None
+        embedder = retriever.embedder
+        if retriever.store.spec.is_sparse:
+            embedder = self._dense_embedder
+        return embedder.embed_query(normalize_question(question))
+
+    def get(self, question: str, vec: Optional[np.ndarray] = None) -> Tuple[Optional["AskResult"], Optional[str]]:
+        """Returns (cached result, "exact" | "semantic") or (None, None)."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            kind = "exact"
+            semantic = self.min_similarity is not None and vec is not None
+            if entry is None and semantic and self._vecs is not None and self._entries:
+                sims = self._vecs @ vec.astype(np.float32)
+                sims[~self._live] = -np.inf
+                best = int(np.argmax(sims))
+                if sims[best] >= self.min_similarity:
+                    key, entry, kind = self._keys[best], self._entries[self._keys[best]], "semantic"
+
+            if entry is not None and entry.expires_at <= now:
+                self._evict(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, None
+
+            self._entries.move_to_end(key)
+            if kind == "exact":
+                self.hits_exact += 1
+            else:
+                self.hits_semantic += 1
+            self.tokens_saved += entry.result.tokens_used or 0
+            return entry.result, kind
+
+    def put(self, question: str, vec: Optional[np.ndarray], result: "AskResult", version: int) -> None:
+        """
+        Cache `result`, computed against index `version`; results from an index
+        that has been swapped out in the meantime are not stored.
+        """
+        key = normalize_question(question)
+        nbytes = len(key) + len(json.dumps(asdict(result), default=_jsonable))
+        if vec is not None:
+            vec = vec.astype(np.float32)
+            nbytes += vec.nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version()
+            if version != self._version:
+                return
+            if key in self._entries:
+                self._evict(key)
+            while self._entries and (len(self._entries) >= self.max_entries or self._bytes + nbytes > self.max_bytes):
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+
+            slot = self._free.pop() if self._free else len(self._keys)
+            if slot == len(self._keys):
+                self._keys.append(None)
+            self._keys[slot] = key
+            if vec is not None:
+                if self._vecs is None or self._vecs.shape[1] != vec.shape[0]:
+                    self._vecs = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+                self._vecs[slot] = vec
+                self._live[slot] = True
+            self._entries[key] = _Entry(result=result, slot=slot, nbytes=nbytes, expires_at=time.time() + self.ttl_s)
+            self._bytes += nbytes
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._live[entry.slot] = False
+        self._keys[entry.slot] = None
+        self._free.append(entry.slot)
+        self._bytes -= entry.nbytes
+
+    def _check_version(self) -> None:
+        version = self.provider.version
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._keys.clear()
+            self._free.clear()
+            self._live[:] = False
+            self._bytes = 0
+            self._version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._check_version()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits_exact + self.hits_semantic + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits_exact": self.hits_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses": self.misses,
+                "hit_rate": (self.hits_exact + self.hits_semantic) / lookups if lookups else None,
+                "tokens_saved": self.tokens_saved,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "index_version": self._version,
+            }
+
+
+def _jsonable(obj: Any) -> Any:
+    # SourceItem (pydantic) inside AskResult.sources
+    return obj.model_dump() if hasattr(obj, "model_dump") else str(obj)
+
+
+def cached_copy(result: "AskResult", kind: str, start: float) -> "AskResult":
+    """A cache hit as returned to the caller: own latency, no tokens spent."""
+    return replace(result, latency_ms=(time.perf_counter() - start) * 1000, tokens_used=0, cached=kind)
+
+
+# Global singleton cache (answers for /ask and /ask/batch)
+ANSWER_CACHE = AnswerCache(
+    provider=RETRIEVER_PROVIDER,
+    max_entries=settings.answer_cache_max_entries,
+    max_bytes=int(settings.answer_cache_max_mb * (1 << 20)),
+    ttl_s=settings.answer_cache_ttl_s,
+    min_similarity=settings.answer_cache_min_similarity,
+)
@@ -1,22 +1,29 @@
+import asyncio
+import logging
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from tracemalloc import start
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from app.core.config import settings
 
 
 from app import llm
 from app.models.ask import SourceItem
-from app.rag.index_builder import build_retriever_from_folder
-from app.rag.vector_store import SearchResult
+from app.rag.vector_store import FilterKey, MetadataFilter, SearchResult, normalize_filters
+from app.services.answer_cache import ANSWER_CACHE, cached_copy, normalize_question
+from app.services.retrieval_batcher import RETRIEVAL_BATCHER
+from app.services.retriever_provider import RETRIEVER_PROVIDER
+from app.services.singleflight import ASK_SINGLEFLIGHT
 
-from app.llm.client import get_llm_client
+from app.llm.cache import LLM_CACHE_BYPASS
+from app.llm.client import get_async_llm_client
 from app.rag.prompting import build_prompt
 
 from app.llm.schemas import GroundedAnswer
 
 from app.core.input_guard import detect_prompt_injection
 
+logger = logging.getLogger("app.ask")
 
 @dataclass
 class AskResult:
@@ -27,6 +34,8 @@ class AskResult:
     latency_ms: float | None = None
     model: str | None = None
     tokens_used: int | None= None
+    error: str | None = None
+    cached: str | None = None  # "exact" / "semantic" when served from ANSWER_CACHE
 
 def _preview(text: str, max_len: int = 180) -> str:
     text = text.replace("\n", " ").strip()
@@ -46,22 +55,238 @@ def _confidence_from_score(score: List[float]) -> Optional[float]:
         return 0.0
     return float(min(1.0, top))
 
-_RETRIEVER = build_retriever_from_folder(
-    folder_path="data/docs",
-    chunk_size=300,
-    overlap=50,
-    dim=256,
-)
+def _failed(e: Exception, start: float) -> AskResult:
+    # the exception text (URLs, provider messages, paths) goes to the log only, as in /ask/stream
+    return AskResult(
+        answer="",
+        latency_ms=(time.perf_counter() - start) * 1000,
+        error=type(e).__name__,
+    )
+
+def _no_sources(start: float) -> AskResult:
+    return AskResult(
+        answer="I don't know.",
+        confidence=None,
+        sources=[],
+        latency_ms=(time.perf_counter() - start) * 1000,
+        model="rag-retrieval-only",
+        tokens_used=0,
+    )
 
 import os
 
 _MIN_SCORE = settings.rag_min_score
+_DEFAULT_K = 3
+
+
+def _use_cache(k: int, nprobe: Optional[int], ef_search: Optional[int], filters: Optional[FilterKey]) -> bool:
+    # X-LLM-Cache: bypass wants a fresh answer
+    if LLM_CACHE_BYPASS.get():
+        return False
+    # cached answers were retrieved with the defaults; tuned or filtered requests bypass the cache
+    return (
+        settings.answer_cache_enabled
+        and k == _DEFAULT_K
+        and nprobe is None
+        and ef_search is None
+        and filters is None
+    )
+
+async def _wait_for_index() -> None:
+    # the answer cache needs the embedder; wait off the event loop while the index loads
+    if RETRIEVER_PROVIDER.current() is None:
+        await asyncio.to_thread(RETRIEVER_PROVIDER.get)
 
 class AskService:
 
-    async def answer(self, question: str, k: int = 3) -> AskResult:
+    async def answer(
+        self,
+        question: str,
+        k: int = _DEFAULT_K,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> AskResult:
         start = time.perf_counter()
         
+        blocked = self._guard(question, start)
+        if blocked:
+            return blocked
+
+        filters = normalize_filters(filters)
+        if not settings.ask_coalesce_enabled:
+            return await self._answer(question, k, nprobe, ef_search, filters, start)
+
+        # identical questions already in flight share that computation
+        key = (normalize_question(question), k, nprobe, ef_search, filters, LLM_CACHE_BYPASS.get())
+        result, shared = await ASK_SINGLEFLIGHT.do(
+            key, lambda: self._answer(question, k, nprobe, ef_search, filters, start)
+        )
+        if shared:
+            # the tokens were spent (and counted) by the request that ran the call
+            return replace(result, latency_ms=(time.perf_counter() - start) * 1000, tokens_used=0)
+        return result
+
+    async def _answer(
+        self,
+        question: str,
+        k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        filters: Optional[FilterKey],
+        start: float,
+    ) -> AskResult:
+        use_cache = _use_cache(k, nprobe, ef_search, filters)
+        if use_cache:
+            await _wait_for_index()
+            version = RETRIEVER_PROVIDER.version
+            vec = ANSWER_CACHE.embed(question)
+            cached, kind = ANSWER_CACHE.get(question, vec)
+            if cached:
+                return cached_copy(cached, kind, start)
+
+        results: List[SearchResult] = await RETRIEVAL_BATCHER.retrieve(
+            question, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters
+        )
+        result = await self._generate(question, results, start)
+        if use_cache:
+            ANSWER_CACHE.put(question, vec, result, version)
+        return result
+
+    async def answer_batch(
+        self,
+        questions: List[str],
+        k: int = _DEFAULT_K,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        llm_concurrency: int = 8,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[AskResult]:
+        """
+        Answer many questions: one guard pass, one embed + multi-row search for
+        everything that passed it, then at most llm_concurrency LLM calls at a time.
+        Results come back in input order; a failing item gets AskResult.error
+        instead of failing the whole batch.
+        """
+        start = time.perf_counter()
+        out: List[Optional[AskResult]] = [self._guard(q, start) for q in questions]
+        pending = [i for i, r in enumerate(out) if r is None]
+
+        filters = normalize_filters(filters)
+        use_cache = _use_cache(k, nprobe, ef_search, filters)
+        vecs: Dict[int, Any] = {}
+        if use_cache and pending:
+            await _wait_for_index()
+            version = RETRIEVER_PROVIDER.version
+            for i in pending:
+                vecs[i] = ANSWER_CACHE.embed(questions[i])
+                cached, kind = ANSWER_CACHE.get(questions[i], vecs[i])
+                if cached:
+                    out[i] = cached_copy(cached, kind, start)
+            pending = [i for i in pending if out[i] is None]
+        if not pending:
+            return out
+
+        try:
+            retriever = RETRIEVER_PROVIDER.current() or await asyncio.to_thread(RETRIEVER_PROVIDER.get)
+            retrieved = await asyncio.to_thread(
+                retriever.retrieve_batch,
+                [questions[i] for i in pending],
+                k=k,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                filters=filters,
+            )
+        except Exception as e:
+            # retrieval is shared, so every remaining item fails with it
+            logger.exception(f"batch retrieval failed for {len(pending)} questions")
+            return [r or _failed(e, start) for r in out]
+
+        semaphore = asyncio.Semaphore(llm_concurrency)
+
+        async def generate(i: int, results: List[SearchResult]) -> None:
+            async with semaphore:
+                try:
+                    out[i] = await self._generate(questions[i], results, start)
+                except Exception as e:
+                    logger.exception(f"batch item {i} failed")
+                    out[i] = _failed(e, start)
+                    return
+            if use_cache:
+                ANSWER_CACHE.put(questions[i], vecs[i], out[i], version)
+
+        await asyncio.gather(*(generate(i, r) for i, r in zip(pending, retrieved)))
+        return out
+
+    async def answer_stream(
+        self,
+        question: str,
+        k: int = _DEFAULT_K,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter] = None,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields (event, data) pairs:
+        - sources: the retrieved SourceItems, as soon as retrieval is done
+        - token: answer text as the LLM generates it
+        - done: answer, used_sources, confidence and timings after the guardrails ran
+        The done answer is authoritative: a streamed answer that fails the
+        citation guardrails is replaced there with "I don't know.".
+        """
+        start = time.perf_counter()
+        result = self._guard(question, start)
+        sources: List[SourceItem] = []
+        confidence: Optional[float] = None
+        if result is None:
+            results: List[SearchResult] = await RETRIEVAL_BATCHER.retrieve(
+                question, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters
+            )
+            sources, confidence = self._sources(results)
+            if not sources:
+                result = _no_sources(start)
+        yield "sources", {"sources": [s.model_dump() for s in sources]}
+
+        ttft_ms: Optional[float] = None
+        if result is None:
+            llm = get_async_llm_client()
+            parsed, llm_raw = None, None
+            async for chunk in llm.stream_structured(build_prompt(question, sources), GroundedAnswer):
+                if chunk.delta:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                    yield "token", {"text": chunk.delta}
+                if chunk.parsed is not None:
+                    parsed, llm_raw = chunk.parsed, chunk.raw
+            if parsed is None:
+                raise RuntimeError("LLM stream ended without a final answer")
+
+            answer, used_sources = self._apply_guardrails(parsed, sources)
+            result = AskResult(
+                answer=answer,
+                confidence=confidence,
+                sources=sources,
+                used_sources=used_sources,
+                latency_ms=(time.perf_counter() - start) * 1000,
+                model=llm_raw.model,
+                tokens_used=llm_raw.tokens_used or 0,
+            )
+        else:
+            # fixed answers (guard, no sources) go out as a single token
+            ttft_ms = (time.perf_counter() - start) * 1000
+            yield "token", {"text": result.answer}
+
+        yield "done", {
+            "answer": result.answer,
+            "used_sources": result.used_sources or [],
+            "confidence": result.confidence,
+            "latency_ms": result.latency_ms,
+            "ttft_ms": ttft_ms,
+            "model": result.model,
+            "tokens_used": result.tokens_used,
+        }
+
+    def _guard(self, question: str, start: float) -> Optional[AskResult]:
         hit = detect_prompt_injection(question)
         if hit:
             latency_ms = (time.perf_counter() - start) * 1000
@@ -74,9 +299,9 @@ class AskService:
                 model="security-guard",
                 tokens_used=0,
             )
-        
-        results: List[SearchResult] = _RETRIEVER.retrieve(question, k=k)
+        return None
 
+    def _sources(self, results: List[SearchResult]) -> Tuple[List[SourceItem], Optional[float]]:
         sources: List[SourceItem] = []
         scores: List[float] = []
 
@@ -93,26 +318,9 @@ class AskService:
                 )
             )
 
+        return sources, _confidence_from_score(scores)
 
-        confidence = _confidence_from_score(scores)
-
-        # EARLY EXIT: no grounded sources -> do NOT call LLM
-        if not sources:
-            latency_ms = (time.perf_counter() - start) * 1000
-            return AskResult(
-                answer="I don't know.",
-                confidence=None,
-                sources=[],
-                latency_ms=latency_ms,
-                model="rag-retrieval-only",
-                tokens_used=0,
-            )
-
-        llm = get_llm_client()
-        prompt = build_prompt(question, sources)
-        
-        parsed, llm_raw = llm.generate_structured(prompt, GroundedAnswer)
-
+    def _apply_guardrails(self, parsed: GroundedAnswer, sources: List[SourceItem]) -> Tuple[str, List[str]]:
         answer = (parsed.answer or "").strip()
         used_sources = parsed.used_sources or []
 
@@ -128,6 +336,21 @@ class AskService:
         if answer == "I don't know.":
             used_sources = []
 
+        return answer, used_sources
+
+    async def _generate(self, question: str, results: List[SearchResult], start: float) -> AskResult:
+        sources, confidence = self._sources(results)
+
+        # EARLY EXIT: no grounded sources -> do NOT call LLM
+        if not sources:
+            return _no_sources(start)
+
+        llm = get_async_llm_client()
+        prompt = build_prompt(question, sources)
+        
+        parsed, llm_raw = await llm.generate_structured(prompt, GroundedAnswer)
+        answer, used_sources = self._apply_guardrails(parsed, sources)
+
         latency_ms = (time.perf_counter() - start) * 1000
         
         return AskResult(
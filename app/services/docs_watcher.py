@@ -0,0 +1,64 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.rag.loaders import iter_document_files
+
+logger = logging.getLogger("app.watcher")
+
+
+class DocsWatcher:
+    """
+    Polls the docs folder for added/removed/modified files and calls on_change().
+    Compares (mtime_ns, size) per file instead of relying on inotify & co,
+    so it behaves the same on bind mounts, network shares and in containers.
+    The first poll always fires, which also catches a snapshot that is older
+    than the docs it was built from.
+    """
+
+    def __init__(
+        self, folder_path: str, on_change: Callable[[], Any], interval_s: float = 5.0, name: str = "docs-watcher"
+    ):
+        self.folder_path = folder_path
+        self.on_change = on_change
+        self.interval_s = interval_s
+        self.name = name
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def signature(self) -> Dict[str, Tuple[int, int]]:
+        sig = {}
+        for file_path in iter_document_files(self.folder_path):
+            try:
+                st = file_path.stat()
+            except FileNotFoundError:
+                continue  # deleted between listing and stat
+            sig[str(file_path)] = (st.st_mtime_ns, st.st_size)
+        return sig
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        last: Any = None
+        while True:
+            try:
+                current = self.signature()
+                if current != last:
+                    self.on_change()
+                    last = current
+            except Exception:
+                # keep watching; the next poll retries
+                logger.exception(f"{self.name} failed folder={self.folder_path}")
+            if self._stop.wait(self.interval_s):
+                return
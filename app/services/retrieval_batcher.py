@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.rag.vector_store import FilterKey, MetadataFilter, SearchResult, normalize_filters
+from app.services.retriever_provider import RETRIEVER_PROVIDER, RetrieverProvider
+
+logger = logging.getLogger("app.batcher")
+
+
+@dataclass
+class _Pending:
+    query: str
+    k: int
+    nprobe: Optional[int]
+    ef_search: Optional[int]
+    filters: Optional[FilterKey]
+    future: asyncio.Future
+
+
+class RetrievalBatcher:
+    """
+    Coalesces concurrent retrievals into one embed_texts() + one multi-row FAISS search.
+    - batches run one at a time in a worker thread (FAISS releases the GIL);
+      queries arriving meanwhile queue up and form the next batch, so batch
+      size grows with load and a lone query is searched right away
+    - max_wait_ms > 0 additionally holds the first query of a batch that long
+      for others to join; a batch is cut at max_batch queries
+    max_batch <= 1 disables batching: each query is searched on its own.
+    """
+
+    def __init__(
+        self,
+        provider: RetrieverProvider,
+        max_batch: int = 32,
+        max_wait_ms: float = 0.0,
+    ):
+        self.provider = provider
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.queries = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch > 1
+
+    async def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter | FilterKey] = None,
+    ) -> List[SearchResult]:
+        filters = normalize_filters(filters)
+        if not self.enabled:
+            retriever = self.provider.current()
+            if retriever is None:
+                # still loading (or never started): wait off the event loop
+                retriever = await asyncio.to_thread(self.provider.get)
+            return retriever.retrieve(query, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait(_Pending(query, k, nprobe, ef_search, filters, future))
+        return await future
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # Started lazily on the running loop. Tests spin up a new loop per
+        # TestClient, so a worker bound to a previous loop is replaced.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue), name="retrieval-batcher")
+        return self._queue
+
+    async def stop(self) -> None:
+        worker, queue = self._worker, self._queue
+        self._worker = self._queue = self._loop = None
+        if worker is None:
+            return
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        while not queue.empty():
+            pending = queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Retrieval batcher stopped"))
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # callers that gave up (client disconnect) don't need a search
+            batch = [p for p in batch if not p.future.done()]
+            if not batch:
+                continue
+            try:
+                results = await asyncio.to_thread(self._search, batch)
+            except Exception as e:
+                logger.exception(f"batched retrieval failed size={len(batch)}")
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for p, r in zip(batch, results):
+                if not p.future.done():
+                    p.future.set_result(r)
+
+    def _search(self, batch: List[_Pending]) -> List[List[SearchResult]]:
+        # one retriever for the whole batch, even if a hot reload swaps it meanwhile
+        retriever = self.provider.get()
+
+        # queries with different search knobs or filters can't share a FAISS call
+        groups: Dict[Tuple[Optional[int], Optional[int], Optional[FilterKey]], List[int]] = defaultdict(list)
+        for i, p in enumerate(batch):
+            groups[(p.nprobe, p.ef_search, p.filters)].append(i)
+
+        out: List[List[SearchResult]] = [[] for _ in batch]
+        for (nprobe, ef_search, filters), rows in groups.items():
+            k = max(batch[i].k for i in rows)
+            results = retriever.retrieve_batch(
+                [batch[i].query for i in rows], k=k, nprobe=nprobe, ef_search=ef_search, filters=filters
+            )
+            for i, r in zip(rows, results):
+                out[i] = r[: batch[i].k]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else None,
+        }
+
+
+# Global singleton batcher (retrievals for /ask)
+RETRIEVAL_BATCHER = RetrievalBatcher(
+    provider=RETRIEVER_PROVIDER,
+    max_batch=settings.retrieval_batch_max,
+    max_wait_ms=settings.retrieval_batch_wait_ms,
+)
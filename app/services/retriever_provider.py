@@ -0,0 +1,280 @@
+import gc
+import logging
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.rag.incremental import IncrementalIndexer, ReindexStats
+from app.rag.index_builder import (
+    build_snapshot,
+    embedder_from_settings,
+    index_spec_from_settings,
+    load_or_build_retriever,
+    load_snapshot,
+    record_fields_from_settings,
+    snapshot_problem,
+)
+from app.rag.retriever import Retriever
+from app.rag.snapshot import SnapshotGenerations
+from app.services.shared_index import SharedIndex
+
+logger = logging.getLogger("app.retriever")
+
+T = TypeVar("T")
+
+
+class RetrieverProvider:
+    """
+    Owns the process-wide Retriever.
+    - start(): kicks off the build (the app lifespan calls this, optionally in a background thread)
+    - get(): returns the retriever, building it lazily when nothing started it (tests, scripts)
+    - update(): build a new retriever from the current one and swap it in
+    - status(): readiness + cold start timings for /ready
+    """
+
+    def __init__(self, factory: Callable[[], Retriever]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._done = threading.Event()
+        self._retriever: Optional[Retriever] = None
+        self._error: Optional[BaseException] = None
+        self._started = False
+
+        self._created_at = time.perf_counter()
+        self._started_at: Optional[float] = None
+        self._ready_at: Optional[float] = None
+        self._build_ms: Optional[float] = None
+        self._warmup_ms: Optional[float] = None
+
+        # bumped on every swap; caches keyed on the index compare against it
+        self.version = 0
+        self._built_at: Optional[float] = None
+        self._reloads = 0
+        self._last_reload_ms: Optional[float] = None
+        self._last_reload_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._retriever is not None
+
+    def current(self) -> Optional[Retriever]:
+        """Non-blocking: the loaded retriever, or None while loading."""
+        return self._retriever
+
+    def start(self, background: bool = False, warmup_queries: Iterable[str] = ()) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._error = None
+            self._done.clear()
+            self._started_at = time.perf_counter()
+
+        queries = list(warmup_queries)
+        if background:
+            threading.Thread(target=self._load, args=(queries,), name="retriever-init", daemon=True).start()
+        else:
+            self._load(queries)
+
+    def get(self) -> Retriever:
+        """Blocking: start the build if needed and wait for it."""
+        retriever = self._retriever
+        if retriever is not None:
+            return retriever
+
+        self.start(background=False)
+        self._done.wait()
+        if self._retriever is None:
+            raise RuntimeError("Retriever failed to load") from self._error
+        return self._retriever
+
+    def update(self, fn: Callable[[Retriever], Tuple[Retriever, T]]) -> T:
+        """
+        Run fn(current) -> (new retriever, result) and swap the new retriever in.
+        Updates are serialized; queries keep using whichever retriever they
+        already hold, so nothing blocks on the update.
+        """
+        with self._update_lock:
+            current = self.get()
+            t0 = time.perf_counter()
+            retriever, result = fn(current)
+            if retriever is not current:
+                # only a swap is a reload; no-op polls keep the last one on record
+                self._last_reload_ms = (time.perf_counter() - t0) * 1000
+                self._last_reload_at = time.time()
+                self._swap(retriever)
+                self._reloads += 1
+            return result
+
+    def _swap(self, retriever: Retriever) -> None:
+        # a single attribute store: readers see either the old or the new retriever
+        self._retriever = retriever
+        self.version += 1
+        self._built_at = time.time()
+
+    def _load(self, warmup_queries: list[str]) -> None:
+        try:
+            t0 = time.perf_counter()
+            retriever = self._factory()
+            self._build_ms = (time.perf_counter() - t0) * 1000
+
+            if warmup_queries:
+                # fault in mmapped index pages and embedder caches before serving traffic
+                t0 = time.perf_counter()
+                for q in warmup_queries:
+                    retriever.retrieve(q, k=3)
+                self._warmup_ms = (time.perf_counter() - t0) * 1000
+
+            self._swap(retriever)
+            self._ready_at = time.perf_counter()
+            # Move the (large, long-lived, acyclic) startup index out of the cyclic GC's
+            # view, so full collections triggered by a rebuild do not rescan it and stall
+            # query threads for 100ms+. Once only: frozen objects are never collected,
+            # so freezing on every hot swap would pin whatever was alive at each one.
+            gc.collect()
+            gc.freeze()
+            status = self.status()
+            logger.info(
+                f"retriever ready build_ms={status['build_ms']:.2f} warmup_ms={status['warmup_ms'] or 0:.2f} "
+                f"time_to_ready_ms={status['time_to_ready_ms']:.2f} cold_start_ms={status['cold_start_ms']:.2f}"
+            )
+        except Exception as e:
+            logger.exception("retriever failed to load")
+            self._error = e
+            with self._lock:
+                self._started = False  # allow a later start()/get() to retry
+        finally:
+            self._done.set()
+
+    def index_info(self) -> Dict[str, Any]:
+        retriever = self._retriever
+        return {
+            "version": self.version,
+            "built_at": self._built_at,
+            "chunks": len(retriever.store) if retriever else None,
+            "reloads": self._reloads,
+            "last_reload_ms": self._last_reload_ms,
+            "last_reload_at": self._last_reload_at,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        def ms_since(a: Optional[float], b: Optional[float]) -> Optional[float]:
+            return (b - a) * 1000 if a is not None and b is not None else None
+
+        if self.ready:
+            state = "ready"
+        elif self._error is not None:
+            state = "error"
+        elif self._started:
+            state = "loading"
+        else:
+            state = "not_started"
+
+        return {
+            "status": state,
+            "error": str(self._error) if self._error else None,
+            "chunks": len(self._retriever.store) if self._retriever else None,
+            "build_ms": self._build_ms,
+            "warmup_ms": self._warmup_ms,
+            # start() -> ready
+            "time_to_ready_ms": ms_since(self._started_at, self._ready_at),
+            # provider creation (module import, early in process start) -> ready
+            "cold_start_ms": ms_since(self._created_at, self._ready_at),
+        }
+
+
+_SHARED_INDEX: Optional[SharedIndex] = None
+
+
+def shared_index() -> SharedIndex:
+    """INDEX_SHARED: the generations under INDEX_SNAPSHOT_DIR, built and loaded with the current settings."""
+    global _SHARED_INDEX
+    if _SHARED_INDEX is None:
+        if not settings.index_snapshot_dir:
+            raise ValueError("INDEX_SHARED requires INDEX_SNAPSHOT_DIR")
+        spec = index_spec_from_settings()
+        fields = record_fields_from_settings()
+        embedder = embedder_from_settings(settings.embedding_dim)
+        chunking = dict(
+            chunk_size=settings.rag_chunk_size,
+            overlap=settings.rag_chunk_overlap,
+            dim=settings.embedding_dim,
+            spec=spec,
+            chunk_unit=settings.rag_chunk_unit,
+            fields=fields,
+        )
+
+        def problem(path: Path) -> Optional[str]:
+            return snapshot_problem(
+                path, settings.docs_dir, verify_corpus=settings.index_verify_corpus, embedder=embedder.identity,
+                **chunking,
+            )
+
+        _SHARED_INDEX = SharedIndex(
+            SnapshotGenerations(settings.index_snapshot_dir, keep=settings.index_generations_keep),
+            build=lambda out: build_snapshot(settings.docs_dir, str(out), embedder=embedder, **chunking),
+            load=lambda path: load_snapshot(
+                path, spec=spec, hybrid_weight=settings.rag_hybrid_weight, embedder=embedder
+            ),
+            problem=problem,
+        )
+    return _SHARED_INDEX
+
+
+def index_generation() -> Optional[int]:
+    """The shared generation this worker serves (None without INDEX_SHARED)."""
+    return _SHARED_INDEX.generation if _SHARED_INDEX is not None else None
+
+
+def build_default_retriever() -> Retriever:
+    if settings.index_shared:
+        return shared_index().open()
+    return load_or_build_retriever(
+        folder_path=settings.docs_dir,
+        snapshot_dir=settings.index_snapshot_dir,
+        chunk_size=settings.rag_chunk_size,
+        overlap=settings.rag_chunk_overlap,
+        chunk_unit=settings.rag_chunk_unit,
+        fields=record_fields_from_settings(),
+        dim=settings.embedding_dim,
+        embedder=embedder_from_settings(settings.embedding_dim),
+        verify_corpus=settings.index_verify_corpus,
+        spec=index_spec_from_settings(),
+        hybrid_weight=settings.rag_hybrid_weight,
+    )
+
+
+def reindex() -> ReindexStats:
+    """Delta reindex of DOCS_DIR into the live retriever."""
+    indexer = IncrementalIndexer(
+        settings.docs_dir,
+        chunk_size=settings.rag_chunk_size,
+        overlap=settings.rag_chunk_overlap,
+        chunk_unit=settings.rag_chunk_unit,
+        fields=record_fields_from_settings(),
+    )
+    if settings.index_shared:
+        stats = RETRIEVER_PROVIDER.update(partial(shared_index().reindex, indexer))
+    else:
+        stats = RETRIEVER_PROVIDER.update(indexer.reindex)
+    logger.info(
+        f"reindex added={stats.added} removed={stats.removed} kept={stats.kept} "
+        f"duration_ms={stats.duration_ms:.2f}"
+    )
+    return stats
+
+
+def follow_generation() -> Optional[int]:
+    """INDEX_SHARED: swap in the generation another worker published; returns it (None when unchanged)."""
+    generation = RETRIEVER_PROVIDER.update(shared_index().follow)
+    if generation is not None:
+        logger.info(f"generation={generation} loaded (published by another worker)")
+    return generation
+
+
+# Global singleton provider
+RETRIEVER_PROVIDER = RetrieverProvider(factory=build_default_retriever)
@@ -0,0 +1,96 @@
+import logging
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from app.rag.incremental import IncrementalIndexer, ReindexStats
+from app.rag.retriever import Retriever
+from app.rag.snapshot import SnapshotGenerations, corpus_hash, read_manifest
+from app.services.docs_watcher import DocsWatcher
+
+logger = logging.getLogger("app.retriever")
+
+
+class SharedIndex:
+    """
+    One index for every worker process, served from published snapshot
+    generations (SnapshotGenerations) instead of a private in-memory copy each.
+    - open(): the provider factory; the first worker to find no usable
+      generation builds and publishes one while the others wait on the lock
+    - reindex(): delta reindex published as a new generation (one worker at a time)
+    - follow(): swap to the generation another worker published
+    build(dir) writes a snapshot, problem(dir) says why one cannot be served
+    (None when it can) and load(dir) opens one memory-mapped.
+    """
+
+    def __init__(
+        self,
+        generations: SnapshotGenerations,
+        build: Callable[[Path], Any],
+        load: Callable[[Path], Retriever],
+        problem: Callable[[Path], Optional[str]] = lambda path: None,
+    ):
+        self.generations = generations
+        self._build = build
+        self._load = load
+        self._problem = problem
+        # the generation this process serves
+        self.generation: Optional[int] = None
+
+    def _open(self, generation: int) -> Retriever:
+        retriever = self._load(self.generations.path(generation))
+        self.generation = generation
+        return retriever
+
+    def open(self) -> Retriever:
+        with self.generations.lock():
+            generation = self.generations.current()
+            problem = self._problem(self.generations.path(generation)) if generation is not None else "missing"
+            if problem is not None:
+                start = time.perf_counter()
+                generation = self.generations.publish(self._build)
+                logger.info(
+                    f"generation={generation} published ({problem} before) "
+                    f"build_ms={(time.perf_counter() - start) * 1000:.2f}"
+                )
+        return self._open(generation)
+
+    def follow(self, current: Retriever) -> Tuple[Retriever, Optional[int]]:
+        """provider.update fn: (retriever of the current generation, its number or None when unchanged)."""
+        generation = self.generations.current()
+        if generation is None or generation == self.generation:
+            return current, None
+        return self._open(generation), generation
+
+    def reindex(self, indexer: IncrementalIndexer, current: Retriever) -> Tuple[Retriever, ReindexStats]:
+        """
+        provider.update fn. Starts from the newest generation, so a change
+        another worker already published is found unchanged, not redone.
+        """
+        with self.generations.lock():
+            current, _ = self.follow(current)
+            updated, stats = indexer.reindex(current)
+            if updated is current:
+                return current, stats
+            manifest = replace(
+                read_manifest(self.generations.path(self.generation)),
+                corpus_hash=corpus_hash(indexer.folder_path),
+                num_chunks=len(updated.store),
+                created_at=time.time(),
+            )
+            generation = self.generations.publish(lambda out: updated.save(out, manifest))
+        logger.info(f"generation={generation} published (reindex)")
+        # serve the mapped files like every other worker, not the private copy just written
+        return self._open(generation), stats
+
+
+class GenerationWatcher(DocsWatcher):
+    """Polls CURRENT of the generations root and calls on_change() when it moves."""
+
+    def __init__(self, generations: SnapshotGenerations, on_change: Callable[[], Any], interval_s: float = 1.0):
+        super().__init__(str(generations.root), on_change, interval_s=interval_s, name="generation-watcher")
+        self.generations = generations
+
+    def signature(self) -> Optional[int]:
+        return self.generations.current()
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time: callers arriving while a call for
+    the same key is in flight wait for that call and get its result (or its
+    exception). The shared call runs as its own task, so a waiter that is
+    cancelled (client disconnect) leaves it running for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Returns (result, shared): shared is True for callers that joined another call."""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        # tasks left behind by a previous event loop (tests) can't be awaited here
+        shared = task is not None and task.get_loop() is loop
+        if shared:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.calls += 1
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / total if total else None,
+        }
+
+
+# Global singleton (identical in-flight /ask questions)
+ASK_SINGLEFLIGHT = SingleFlight()
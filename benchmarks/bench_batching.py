@@ -0,0 +1,72 @@
+"""
+/ask retrieval throughput and latency with and without micro-batching,
+at several concurrency levels (closed loop: each client waits for its answer).
+
+    python -m benchmarks.bench_batching --chunks 100000 --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.retriever import Retriever
+from app.rag.vector_store import set_blas_threshold
+from app.services.retrieval_batcher import RetrievalBatcher
+from app.services.retriever_provider import RetrieverProvider
+from benchmarks.common import synthetic_chunks
+
+
+async def load(batcher: RetrievalBatcher, queries: list[str], concurrency: int, seconds: float):
+    lat: list[float] = []
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            # yield like a real request would (socket read), so time spent queued
+            # behind other clients' searches on the event loop counts as latency
+            await asyncio.sleep(0)
+            await batcher.retrieve(queries[i % len(queries)], k=5)
+            lat.append((time.perf_counter() - t0) * 1000)
+            i += concurrency
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    await batcher.stop()
+    return len(lat) / elapsed, np.percentile(lat, [50, 99])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=0.0)
+    parser.add_argument("--blas-threshold", type=int, default=3, help="FAISS_BLAS_THRESHOLD as the app applies it")
+    args = parser.parse_args()
+    set_blas_threshold(args.blas_threshold)
+
+    texts = synthetic_chunks(args.chunks)
+    chunks = [Chunk(doc_id="bench", chunk_id=str(i), text=t) for i, t in enumerate(texts)]
+    retriever = Retriever.from_chunks(chunks, dim=256)
+    provider = RetrieverProvider(factory=lambda: retriever)
+    provider.get()
+    queries = synthetic_chunks(1000, tokens_per_chunk=8, seed=1)
+
+    print(f"chunks={args.chunks} max_batch={args.max_batch} wait_ms={args.wait_ms}")
+    print(f"{'mode':>8} {'clients':>8} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+    for concurrency in args.concurrency:
+        for mode, max_batch in (("direct", 1), ("batched", args.max_batch)):
+            batcher = RetrievalBatcher(provider, max_batch=max_batch, max_wait_ms=args.wait_ms)
+            qps, (p50, p99) = asyncio.run(load(batcher, queries, concurrency, args.seconds))
+            size = batcher.stats()["mean_batch_size"] or 1
+            print(f"{mode:>8} {concurrency:>8} {qps:>8.0f} {p50:>8.2f} {p99:>8.2f} {size:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
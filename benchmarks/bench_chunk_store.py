@@ -0,0 +1,90 @@
+"""
+Chunk table memory and load time: a dict of Chunk models (with the JSON-lines
+file snapshots used to write) vs the columnar ChunkStore.
+
+    python -m benchmarks.bench_chunk_store --chunks 100000 1000000
+"""
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.chunk_store import ChunkStore
+from benchmarks.common import synthetic_chunks
+
+
+def make_chunks(n: int, chunks_per_doc: int = 10) -> list[Chunk]:
+    # the same shape chunk_documents() produces: ~300 chars, doc metadata plus chunk_index
+    texts = synthetic_chunks(n, tokens_per_chunk=40)
+    return [
+        Chunk(
+            doc_id=f"doc_{i // chunks_per_doc:06d}",
+            chunk_id=f"doc_{i // chunks_per_doc:06d}::chunk_{i % chunks_per_doc}",
+            text=text,
+            metadata={"source_file": f"doc_{i // chunks_per_doc:06d}.txt", "chunk_index": str(i % chunks_per_doc)},
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+def measure(build) -> tuple[object, int, float]:
+    """(result, heap bytes it holds, seconds); timed separately since tracing slows allocation."""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size, seconds
+
+
+def load_jsonl(path: Path) -> dict[int, Chunk]:
+    chunks = {}
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            i, doc_id, chunk_id, text, metadata = json.loads(line)
+            chunks[i] = Chunk(doc_id=doc_id, chunk_id=chunk_id, text=text, metadata=metadata)
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100000])
+    args = parser.parse_args()
+
+    print(f"{'chunks':>9} {'layout':>8} {'bytes/chunk':>12} {'load s':>8}")
+    for n in args.chunks:
+        source = make_chunks(n)
+        ids = np.arange(n, dtype=np.int64)
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "chunks.jsonl"
+            with jsonl.open("w", encoding="utf-8") as f:
+                for i, c in enumerate(source):
+                    f.write(json.dumps([i, c.doc_id, c.chunk_id, c.text, c.metadata], ensure_ascii=False) + "\n")
+            store = ChunkStore()
+            store.add(ids, source)
+            store.save(tmp)
+            del source, store
+
+            chunks, size, seconds = measure(lambda: load_jsonl(jsonl))
+            print(f"{n:>9} {'objects':>8} {size / n:>12.0f} {seconds:>8.3f}")
+            del chunks
+
+            for mode, mmap in (("columns", False), ("mmap", True)):
+                store, size, seconds = measure(lambda: ChunkStore.load(tmp, mmap=mmap))
+                # mmapped columns live in the page cache, not the heap: report their size too
+                print(f"{n:>9} {mode:>8} {max(size, store.nbytes()) / n:>12.0f} {seconds:>8.3f}")
+                del store
+
+
+if __name__ == "__main__":
+    main()
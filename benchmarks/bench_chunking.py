@@ -0,0 +1,86 @@
+"""
+Chunking a large export: the previous whole-file chunker (read everything,
+clean_text, fixed character windows) vs the streaming boundary-aware one.
+
+    python -m benchmarks.bench_chunking --mb 10 100
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.rag.chunking import clean_text, iter_chunks
+from app.rag.loaders import read_blocks
+from benchmarks.common import synthetic_chunks
+
+
+def legacy_chunks(path: Path, chunk_size: int, overlap: int):
+    text = clean_text(path.read_text(encoding="utf-8"))
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        piece = text[start:end].strip()
+        if piece:
+            yield piece
+        if end == len(text):
+            break
+        start = max(0, end - overlap)
+
+
+def write_export(path: Path, mb: int) -> None:
+    # sentences of 8-20 words, paragraphs of 3-8 sentences
+    words = " ".join(synthetic_chunks(20000, tokens_per_chunk=50)).split()
+    with path.open("w", encoding="utf-8") as f:
+        written, i = 0, 0
+        while written < mb << 20:
+            paragraph = []
+            for s in range(3 + i % 6):
+                n = 8 + (i + s) % 13
+                j = (i * 7) % (len(words) - n)
+                sentence = words[j:j + n]
+                paragraph.append(" ".join(sentence).capitalize() + ".")
+                i += 1
+            block = " ".join(paragraph) + "\n\n"
+            written += f.write(block)
+
+
+def run(chunker) -> tuple[float, int, int, int]:
+    """(seconds, peak traced bytes, chunks, chunks ending on a sentence)."""
+    start = time.perf_counter()
+    count = sum(1 for _ in chunker())
+    seconds = time.perf_counter() - start
+    # traced separately: tracing slows allocation down
+    tracemalloc.start()
+    sentences = sum(piece.endswith(".") for piece in chunker())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, count, sentences
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'chunker':>10} {'MB/s':>8} {'peak MB':>8} {'chunks':>9} {'ends on sentence':>17}")
+    for mb in args.mb:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "export.txt"
+            write_export(path, mb)
+            chunkers = {
+                "legacy": lambda: legacy_chunks(path, args.chunk_size, args.overlap),
+                "streaming": lambda: iter_chunks(read_blocks(path), args.chunk_size, args.overlap),
+            }
+            for name, chunker in chunkers.items():
+                seconds, peak, count, sentences = run(chunker)
+                print(
+                    f"{mb:>6} {name:>10} {mb / seconds:>8.1f} {peak / 2**20:>8.1f} {count:>9} "
+                    f"{sentences / count:>17.1%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold start of the API process: time until /health answers vs until /ready reports the index loaded.
+
+    python -m benchmarks.bench_cold_start --docs 10000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.rag.index_builder import build_snapshot
+from benchmarks.common import write_synthetic_docs
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(env: dict, timeout: float = 300.0) -> tuple[float, float]:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    health = ready = None
+    try:
+        while time.perf_counter() - start < timeout and ready is None:
+            try:
+                if health is None and httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                    health = time.perf_counter() - start
+                if health is not None and httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                    ready = time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return health, ready
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs, snap = Path(tmp) / "docs", Path(tmp) / "index"
+        write_synthetic_docs(docs, args.docs)
+        build_snapshot(str(docs), str(snap), chunk_size=300, overlap=50, dim=256)
+
+        base = {"DOCS_DIR": str(docs), "LLM_PROVIDER": "stub", "TRUSTED_HOSTS": "127.0.0.1"}
+        scenarios = {
+            "rebuild, blocking init": {"RETRIEVER_BACKGROUND_INIT": "false"},
+            "rebuild, background init": {"RETRIEVER_BACKGROUND_INIT": "true"},
+            "snapshot, background init": {"RETRIEVER_BACKGROUND_INIT": "true", "INDEX_SNAPSHOT_DIR": str(snap)},
+            "snapshot, background + warmup": {
+                "RETRIEVER_BACKGROUND_INIT": "true", "INDEX_SNAPSHOT_DIR": str(snap), "RETRIEVER_WARMUP": "true",
+            },
+        }
+        print(f"{'scenario':<32} {'/health s':>10} {'/ready s':>10}")
+        for name, extra in scenarios.items():
+            health, ready = measure({**base, **extra})
+            print(f"{name:<32} {health:>10.2f} {ready:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Re-embedding cost of a rebuild with and without the on-disk embedding cache.
+A model-backed embedder is simulated by HashingEmbedder plus a fixed cost per
+text (--cost-us); with --cost-us 0 it measures the cache's own overhead
+against the hashing embedder. Passes: cold cache, unchanged corpus, and a
+corpus with --changed of its chunks edited.
+
+    python -m benchmarks.bench_embedding_cache --chunks 100000 --cost-us 0 200 --changed 0.1
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.rag.embedding_cache import CachedEmbedder, EmbeddingCache
+from app.rag.embeddings import HashingEmbedder
+from benchmarks.common import synthetic_chunks
+
+
+class SlowEmbedder(HashingEmbedder):
+    """HashingEmbedder that also waits cost_us per text, like a remote model call."""
+
+    def __init__(self, dim: int, cost_us: float):
+        super().__init__(dim=dim)
+        self.cost_us = cost_us
+
+    @property
+    def identity(self) -> str:
+        return HashingEmbedder(dim=self.dim).identity
+
+    def embed_texts(self, texts):
+        time.sleep(len(texts) * self.cost_us / 1e6)
+        return super().embed_texts(texts)
+
+
+def embed_all(embedder, texts: list[str], batch: int = 1024) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        embedder.embed_texts(texts[i:i + batch])
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--cost-us", type=float, nargs="+", default=[0.0, 200.0], help="simulated cost per text")
+    parser.add_argument("--changed", type=float, default=0.1, help="share of chunks edited before the last pass")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    changed = list(texts)
+    rng = np.random.default_rng(0)
+    for i in rng.choice(len(texts), int(len(texts) * args.changed), replace=False).tolist():
+        changed[i] = texts[i] + " edited"
+
+    print(f"chunks={args.chunks} dim={args.dim} changed={args.changed}")
+    print(f"{'cost us':>8} {'pass':>10} {'uncached s':>11} {'cached s':>9} {'hit rate':>9} {'cache MB':>9}")
+    for cost_us in args.cost_us:
+        inner = SlowEmbedder(args.dim, cost_us)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, corpus in (("cold", texts), ("unchanged", texts), ("edited", changed)):
+                # a fresh cache object per pass, like a new build process
+                cache = EmbeddingCache(tmp)
+                cached_s = embed_all(CachedEmbedder(inner, cache), corpus)
+                uncached_s = embed_all(inner, corpus)
+                stats = cache.stats()
+                print(
+                    f"{cost_us:>8.0f} {name:>10} {uncached_s:>11.2f} {cached_s:>9.2f} "
+                    f"{stats['hit_rate']:>9.3f} {stats['bytes'] / 1e6:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
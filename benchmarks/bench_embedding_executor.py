@@ -0,0 +1,68 @@
+"""
+Scaling of ParallelEmbedder across worker counts, per executor kind, for a
+CPU-bound backend (HashingEmbedder) and an I/O-bound one (HashingEmbedder
+plus a --wait-us pause per text, like a remote model call). Speedup is
+against the same backend embedding inline in one call.
+
+    python -m benchmarks.bench_embedding_executor --texts 200000 --workers 1 2 4 8 --batch-size 1024
+"""
+import argparse
+import os
+import time
+
+from app.rag.embedding_executor import ParallelEmbedder
+from app.rag.embeddings import HashingEmbedder
+from benchmarks.common import synthetic_chunks
+
+
+class WaitingEmbedder(HashingEmbedder):
+    """HashingEmbedder that also sleeps wait_us per text (the GIL is released while waiting)."""
+
+    def __init__(self, dim: int, wait_us: float):
+        super().__init__(dim=dim)
+        self.wait_us = wait_us
+
+    def embed_texts(self, texts):
+        time.sleep(len(texts) * self.wait_us / 1e6)
+        return super().embed_texts(texts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--executors", nargs="+", default=["thread", "process"], choices=["thread", "process"])
+    parser.add_argument("--wait-us", type=float, default=100.0, help="simulated remote latency per text")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.texts)
+    backends = {
+        "hashing": HashingEmbedder(dim=args.dim),
+        "io": WaitingEmbedder(args.dim, args.wait_us),
+    }
+    print(f"texts={args.texts} dim={args.dim} batch_size={args.batch_size} cpus={os.cpu_count()}")
+    print(f"{'backend':>8} {'executor':>9} {'workers':>8} {'texts/s':>10} {'speedup':>8}")
+    for name, inner in backends.items():
+        start = time.perf_counter()
+        inner.embed_texts(texts)
+        inline_s = time.perf_counter() - start
+        print(f"{name:>8} {'inline':>9} {1:>8} {len(texts) / inline_s:>10.0f} {1.0:>8.2f}")
+        for kind in args.executors:
+            for workers in args.workers:
+                embedder = ParallelEmbedder(inner, workers=workers, batch_size=args.batch_size, kind=kind)
+                # start the pool (process workers import numpy) outside the timing
+                embedder.embed_texts(texts[: 2 * args.batch_size])
+                start = time.perf_counter()
+                embedder.embed_texts(texts)
+                seconds = time.perf_counter() - start
+                embedder.close()
+                print(
+                    f"{name:>8} {kind:>9} {workers:>8} {len(texts) / seconds:>10.0f} "
+                    f"{inline_s / seconds:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
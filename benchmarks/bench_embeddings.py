@@ -0,0 +1,62 @@
+"""
+Throughput of HashingEmbedder.embed_texts (batched) vs the original per-text loop.
+
+    python -m benchmarks.bench_embeddings --sizes 10000 100000 1000000
+"""
+import argparse
+import hashlib
+import time
+
+import numpy as np
+
+from app.rag.embeddings import HashingEmbedder
+from benchmarks.common import synthetic_chunks
+
+
+def legacy_embed(texts: list[str], dim: int) -> np.ndarray:
+    def hash_to_vec(text: str) -> np.ndarray:
+        vec = np.zeros(dim, dtype=np.float32)
+        for tok in text.lower().split():
+            h = hashlib.md5(tok.encode("utf-8")).hexdigest()
+            vec[int(h, 16) % dim] += 1.0
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+    return np.stack([hash_to_vec(t) for t in texts], axis=0).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="skip the slow legacy loop above this size")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>10} {'batched s':>10} {'chunks/s':>12} {'legacy s':>10} {'speedup':>8} {'equal':>6}")
+    for n in args.sizes:
+        texts = synthetic_chunks(n)
+        embedder = HashingEmbedder(dim=args.dim)  # cold token cache
+
+        t0 = time.perf_counter()
+        fast = embedder.embed_texts(texts)
+        t_fast = time.perf_counter() - t0
+
+        t_legacy, equal = None, None
+        if n <= args.legacy_max:
+            t0 = time.perf_counter()
+            slow = legacy_embed(texts, args.dim)
+            t_legacy = time.perf_counter() - t0
+            equal = bool(np.array_equal(fast, slow))
+
+        print(
+            f"{n:>10} {t_fast:>10.2f} {n / t_fast:>12,.0f} "
+            f"{(f'{t_legacy:.2f}' if t_legacy else '-'):>10} "
+            f"{(f'{t_legacy / t_fast:.1f}x' if t_legacy else '-'):>8} "
+            f"{('-' if equal is None else str(equal)):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
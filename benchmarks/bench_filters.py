@@ -0,0 +1,75 @@
+"""
+Metadata-filtered search latency at varying selectivity: filter pushed into
+the FAISS scan (IDSelector) vs. searching a wider top-k and filtering after.
+Recall@k is measured against exact filtered results (flat pushdown).
+
+    python -m benchmarks.bench_filters --chunks 100000 --index-type flat ivf_flat hnsw
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.vector_store import INDEX_KINDS, FaissVectorStore, IndexSpec
+from benchmarks.common import synthetic_chunks
+
+DOCS = 1000
+
+
+def timed_search(store, queries, k, **kwargs):
+    lat, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(store.search(q, k=k, **kwargs))
+        lat.append((time.perf_counter() - t0) * 1000)
+    return results, np.percentile(lat, 50)
+
+
+def recall(results, truth):
+    found = sum(len({r.id for r in got} & {r.id for r in exp}) for got, exp in zip(results, truth))
+    return found / max(1, sum(len(exp) for exp in truth))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--post-k", type=int, default=100, help="top-k fetched before post-filtering")
+    parser.add_argument("--selectivity", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5])
+    parser.add_argument("--index-type", choices=INDEX_KINDS, nargs="+", default=["flat", "ivf_flat", "hnsw"])
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    chunks = [Chunk(doc_id=f"doc{i % DOCS}", chunk_id=str(i), text=t) for i, t in enumerate(texts)]
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.embed_texts(texts)
+    queries = embedder.embed_texts(synthetic_chunks(args.queries, tokens_per_chunk=8, seed=1))
+
+    exact = FaissVectorStore(dim=256)
+    exact.add(vectors, chunks)
+
+    print(f"chunks={args.chunks} k={args.k} post_k={args.post_k}")
+    print(f"{'index':>9} {'select':>7} {'push ms':>8} {'recall':>7} {'post ms':>8} {'recall':>7}")
+    for kind in args.index_type:
+        store = FaissVectorStore(dim=256, spec=IndexSpec(kind=kind, nlist=256))
+        store.add(vectors, chunks)
+        for selectivity in args.selectivity:
+            docs = [f"doc{d}" for d in range(max(1, int(DOCS * selectivity)))]
+            filters = {"doc_id": docs}
+            allowed = set(docs)
+            truth = [exact.search(q, k=args.k, filters=filters) for q in queries]
+
+            pushed, push_ms = timed_search(store, queries, args.k, filters=filters)
+            wide, post_ms = timed_search(store, queries, args.post_k)
+            post = [[r for r in rs if r.chunk.doc_id in allowed][: args.k] for rs in wide]
+            print(
+                f"{kind:>9} {selectivity:>7.3f} {push_ms:>8.2f} {recall(pushed, truth):>7.3f} "
+                f"{post_ms:>8.2f} {recall(post, truth):>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
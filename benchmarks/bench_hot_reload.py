@@ -0,0 +1,86 @@
+"""
+Query latency while the index is being rebuilt in the background and swapped in.
+
+    python -m benchmarks.bench_hot_reload --docs 10000 --changed 500
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder
+from app.services.retriever_provider import RetrieverProvider
+from benchmarks.common import synthetic_chunks, write_synthetic_docs
+
+
+def query_latencies(provider: RetrieverProvider, queries: list[str], stop: threading.Event) -> list[float]:
+    out = []
+    i = 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        provider.get().retrieve(queries[i % len(queries)], k=5)
+        out.append((time.perf_counter() - t0) * 1000)
+        i += 1
+    return out
+
+
+def run_phase(provider: RetrieverProvider, queries: list[str], work) -> tuple[list[float], float]:
+    stop = threading.Event()
+    lat: list[float] = []
+    t = threading.Thread(target=lambda: lat.extend(query_latencies(provider, queries, stop)))
+    t.start()
+    t0 = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    t.join()
+    return lat, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--changed", type=int, default=500)
+    args = parser.parse_args()
+
+    queries = synthetic_chunks(200, tokens_per_chunk=6, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "docs"
+        write_synthetic_docs(folder, args.docs)
+        provider = RetrieverProvider(
+            factory=lambda: build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+        )
+        provider.get()
+        indexer = IncrementalIndexer(str(folder), chunk_size=300, overlap=50)
+
+        def edit(start: int):
+            for d in range(start, start + args.changed):
+                p = folder / f"doc_{d:06d}.txt"
+                p.write_text(p.read_text() + "\n\nrevised")
+
+        def full_rebuild():
+            provider.update(lambda current: (
+                build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256), None
+            ))
+
+        phases = {
+            "idle": (None, lambda: time.sleep(2.0)),
+            f"delta reload ({args.changed} docs)": (lambda: edit(0), lambda: provider.update(indexer.reindex)),
+            "full rebuild": (None, full_rebuild),
+        }
+        print(f"{'phase':<28} {'wall s':>7} {'queries':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+        for name, (prepare, work) in phases.items():
+            if prepare:
+                prepare()
+            lat, elapsed = run_phase(provider, queries, work)
+            p50, p99 = np.percentile(lat, [50, 99])
+            print(f"{name:<28} {elapsed:>7.2f} {len(lat):>8} {p50:>7.2f} {p99:>7.2f} {max(lat):>7.2f}")
+        print(f"index version={provider.version} chunks={len(provider.get().store)}")
+
+
+if __name__ == "__main__":
+    main()
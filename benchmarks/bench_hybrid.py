@@ -0,0 +1,69 @@
+"""
+Hybrid (BM25 + vector) vs vector-only retrieval: latency and recall.
+Each query is a few words drawn from one chunk (rarest words first, like an
+identifier or policy term a user types); recall@k is how often that chunk
+comes back in the top k.
+
+    python -m benchmarks.bench_hybrid --chunks 100000 --queries 500
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.bm25 import tokenize
+from app.rag.retriever import Retriever
+from benchmarks.common import synthetic_chunks
+
+
+def make_queries(texts: list[str], n: int, words: int, seed: int = 1) -> tuple[list[str], list[int]]:
+    df = Counter(t for text in texts for t in set(tokenize(text)))
+    rng = np.random.default_rng(seed)
+    targets = rng.choice(len(texts), size=n, replace=False).tolist()
+    queries = []
+    for i in targets:
+        terms = sorted(set(tokenize(texts[i])), key=df.__getitem__)
+        queries.append(" ".join(terms[:words]))
+    return queries, targets
+
+
+def run(retriever: Retriever, queries: list[str], targets: list[int], k: int, weight: float):
+    lat = []
+    hits = 0
+    for q, target in zip(queries, targets):
+        t0 = time.perf_counter()
+        results = retriever.retrieve(q, k=k, hybrid_weight=weight)
+        lat.append((time.perf_counter() - t0) * 1000)
+        hits += any(r.id == target for r in results)
+    return hits / len(queries), np.percentile(lat, [50, 99])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--words", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.0, 0.3, 0.5])
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    chunks = [Chunk(doc_id="bench", chunk_id=str(i), text=t) for i, t in enumerate(texts)]
+    t0 = time.perf_counter()
+    retriever = Retriever.from_chunks(chunks, dim=256)
+    build_s = time.perf_counter() - t0
+    bm25 = retriever.bm25
+    postings_mb = sum(s.nbytes for s in bm25.segments) / 1e6
+
+    queries, targets = make_queries(texts, args.queries, args.words)
+    print(f"chunks={args.chunks} build_s={build_s:.1f} terms={len(bm25.vocab)} postings_mb={postings_mb:.1f}")
+    print(f"{'bm25 w':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for weight in args.weights:
+        recall, (p50, p99) = run(retriever, queries, targets, args.k, weight)
+        print(f"{weight:>8.2f} {recall:>10.3f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
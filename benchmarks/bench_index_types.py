@@ -0,0 +1,78 @@
+"""
+Recall@k vs the exact flat index, per-query latency and index size for each
+FAISS index type, sweeping the search-time knob (nprobe / ef_search).
+
+    python -m benchmarks.bench_index_types --chunks 200000 --queries 500
+"""
+import argparse
+import time
+
+import faiss  # type: ignore
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.vector_store import FaissVectorStore, IndexSpec
+from benchmarks.common import synthetic_chunks
+
+
+def build(spec: IndexSpec, vectors: np.ndarray, chunks: list[Chunk]) -> tuple[FaissVectorStore, float]:
+    store = FaissVectorStore(dim=vectors.shape[1], spec=spec)
+    t0 = time.perf_counter()
+    store.add(vectors, chunks)
+    return store, time.perf_counter() - t0
+
+
+def run_queries(store: FaissVectorStore, queries: np.ndarray, k: int, **knobs) -> tuple[list[set], np.ndarray]:
+    hits, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results = store.search(q, k=k, **knobs)
+        lat.append(time.perf_counter() - t0)
+        hits.append({r.chunk.chunk_id for r in results})
+    return hits, np.asarray(lat) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dim=args.dim)
+    vectors = embedder.embed_texts(synthetic_chunks(args.chunks))
+    # held-out chunks from the same distribution stand in for user questions
+    queries = embedder.embed_texts(synthetic_chunks(args.queries, tokens_per_chunk=12, seed=1))
+    chunks = [Chunk(doc_id="bench", chunk_id=str(i), text="") for i in range(args.chunks)]
+
+    configs = [
+        (IndexSpec(kind="flat"), "", [None]),
+        (IndexSpec(kind="ivf_flat", nlist=args.nlist), "nprobe", args.nprobe),
+        (IndexSpec(kind="ivf_pq", nlist=args.nlist, pq_m=32), "nprobe", args.nprobe),
+        (IndexSpec(kind="hnsw"), "ef_search", args.ef_search),
+    ]
+
+    truth = None
+    print(f"chunks={args.chunks} dim={args.dim} k={args.k} queries={args.queries} threads={faiss.omp_get_max_threads()}")
+    print(f"{'index':>9} {'knob':>14} {'build s':>8} {'MB':>8} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7}")
+    for spec, knob, values in configs:
+        store, build_s = build(spec, vectors, chunks)
+        size_mb = len(faiss.serialize_index(store.index)) / 1e6
+        for value in values:
+            hits, lat = run_queries(store, queries, args.k, **({knob: value} if knob else {}))
+            if truth is None:
+                truth = hits
+            recall = np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t])
+            print(
+                f"{spec.kind:>9} {(f'{knob}={value}' if knob else '-'):>14} {build_s:>8.2f} {size_mb:>8.1f} "
+                f"{recall:>7.3f} {np.percentile(lat, 50):>7.3f} {np.percentile(lat, 99):>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Index build time: the sequential builder vs the staged ingestion pipeline
+at several chunking-worker counts.
+
+    python -m benchmarks.bench_ingest --docs 10000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.rag.index_builder import build_retriever_from_folder
+from app.rag.ingest import IngestPipeline
+from benchmarks.common import write_synthetic_docs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()}")
+    print(f"{'builder':>12} {'workers':>8} {'total s':>8} {'docs/s':>8} {'chunks/s':>9}  per stage chunks/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "docs"
+        write_synthetic_docs(folder, args.docs)
+
+        start = time.perf_counter()
+        retriever = build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+        seconds = time.perf_counter() - start
+        chunks = len(retriever.store)
+        print(f"{'sequential':>12} {1:>8} {seconds:>8.2f} {args.docs / seconds:>8.0f} {chunks / seconds:>9.0f}")
+
+        for workers in args.workers:
+            pipeline = IngestPipeline(
+                str(folder),
+                chunk_size=300,
+                overlap=50,
+                workers=workers,
+                embed_workers=args.embed_workers,
+                batch_size=args.batch_size,
+            )
+            _, stats = pipeline.run()
+            stages = " ".join(f"{name}={stage.to_dict()['chunks_per_s']:.0f}" for name, stage in stats.stages()[1:])
+            print(
+                f"{'pipeline':>12} {workers:>8} {stats.duration_s:>8.2f} {args.docs / stats.duration_s:>8.0f} "
+                f"{stats.write.chunks / stats.duration_s:>9.0f}  {stages}"
+            )
+
+
+if __name__ == "__main__":
+    main()
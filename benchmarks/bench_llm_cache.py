@@ -0,0 +1,66 @@
+"""
+Lookup cost of the persistent LLM response cache (hits and misses), with a
+cache of --entries responses, plus the cost of storing a new response.
+
+    python -m benchmarks.bench_llm_cache --entries 50000 --lookups 20000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.llm.cache import LLMResponseCache, prompt_key
+from app.llm.client import LLMResult
+from app.llm.schemas import GroundedAnswer
+from benchmarks.common import synthetic_chunks
+
+RESPONSE = GroundedAnswer(answer="Passwords expire every 90 days.", used_sources=["policy.txt::0"]).model_dump_json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    prompts = synthetic_chunks(args.entries + args.lookups, tokens_per_chunk=300)
+    raw = LLMResult(text=RESPONSE, model="gpt-4o-mini", tokens_used=450)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(Path(tmp) / "llm.sqlite", max_entries=args.entries)
+
+        t0 = time.perf_counter()
+        keys = [prompt_key(p, "gpt-4o-mini", GroundedAnswer) for p in prompts]
+        key_us = (time.perf_counter() - t0) / len(prompts) * 1e6
+
+        t0 = time.perf_counter()
+        for key in keys[:args.entries]:
+            cache.put(key, RESPONSE, raw)
+        put_us = (time.perf_counter() - t0) / args.entries * 1e6
+
+        hit_keys = keys[:args.entries][-args.lookups:]
+        t0 = time.perf_counter()
+        for key in hit_keys:
+            cache.get(key)
+        hit_us = (time.perf_counter() - t0) / len(hit_keys) * 1e6
+
+        t0 = time.perf_counter()
+        for key in keys[args.entries:]:
+            cache.get(key)
+        miss_us = (time.perf_counter() - t0) / args.lookups * 1e6
+
+        cache.close()
+        t0 = time.perf_counter()
+        LLMResponseCache(Path(tmp) / "llm.sqlite", max_entries=args.entries).close()
+        reopen_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"entries={args.entries} lookups={args.lookups}")
+    print(f"prompt key  {key_us:8.1f} us")
+    print(f"hit         {hit_us:8.1f} us")
+    print(f"miss        {miss_us:8.1f} us")
+    print(f"put         {put_us:8.1f} us")
+    print(f"reopen      {reopen_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Loading a large record export: materializing every record as a Document
+first vs streaming records one at a time into the chunker. Throughput is
+in uncompressed MB/s; peak is traced Python memory.
+
+    python -m benchmarks.bench_loaders --mb 100 2000 --formats jsonl.gz csv
+"""
+import argparse
+import csv
+import gzip
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.rag.chunking import chunk_documents, chunk_file
+from app.rag.loaders import iter_documents, open_text
+from benchmarks.common import synthetic_chunks
+
+
+def write_export(path: Path, mb: int) -> int:
+    """Records of 2-6 synthetic paragraphs until mb uncompressed MB are written; returns the record count."""
+    paragraphs = synthetic_chunks(5000, tokens_per_chunk=50)
+    opener = gzip.open if path.suffix == ".gz" else open
+    kwargs = {"compresslevel": 1} if path.suffix == ".gz" else {}
+    with opener(path, "wt", encoding="utf-8", newline="", **kwargs) as f:
+        writer = csv.writer(f) if ".csv" in path.suffixes else None
+        if writer:
+            writer.writerow(["id", "text", "team", "updated"])
+        written, n = 0, 0
+        while written < mb << 20:
+            j = (n * 7) % len(paragraphs)
+            text = "\n\n".join(paragraphs[j:j + 2 + n % 5])
+            record = {"id": f"rec-{n:09d}", "text": text, "team": f"team{n % 13}", "updated": "2024-01-01"}
+            if writer:
+                writer.writerow(record.values())
+                written += len(text) + 40
+            else:
+                written += f.write(json.dumps(record) + "\n")
+            n += 1
+    return n
+
+
+def materialized(path: Path, root: Path, chunk_size: int, overlap: int):
+    docs = list(iter_documents(path, root=root))
+    return iter(chunk_documents(docs, chunk_size=chunk_size, overlap=overlap))
+
+
+def run(chunker) -> tuple[float, int, int]:
+    """(seconds, peak traced bytes, chunks)."""
+    start = time.perf_counter()
+    count = sum(1 for _ in chunker())
+    seconds = time.perf_counter() - start
+    # traced separately: tracing slows allocation down
+    tracemalloc.start()
+    for _ in chunker():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--formats", nargs="+", default=["jsonl.gz", "csv"], choices=["jsonl", "jsonl.gz", "csv", "csv.gz"])
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--materialize-max-mb", type=int, default=200, help="skip the materializing loader above this")
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'format':>9} {'loader':>13} {'MB/s':>7} {'peak MB':>8} {'records':>9} {'chunks':>10}")
+    for mb in args.mb:
+        for fmt in args.formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                root = Path(tmp)
+                path = root / f"export.{fmt}"
+                records = write_export(path, mb)
+                with open_text(path) as f:
+                    size_mb = sum(len(line) for line in f) / 2**20
+                loaders = {"streaming": lambda: chunk_file(path, args.chunk_size, args.overlap, root=root)}
+                if mb <= args.materialize_max_mb:
+                    loaders["materialized"] = lambda: materialized(path, root, args.chunk_size, args.overlap)
+                for name, chunker in loaders.items():
+                    seconds, peak, count = run(chunker)
+                    print(
+                        f"{mb:>6} {fmt:>9} {name:>13} {size_mb / seconds:>7.1f} {peak / 2**20:>8.1f} "
+                        f"{records:>9} {count:>10}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Index memory, search latency and recall@k of fp16 / int8 vector storage
+against float32, per index type. "int8 (delta)" trains the int8 ranges on the
+first 10% of the corpus only and adds the rest afterwards, like a delta
+reindex into an existing index.
+
+    python -m benchmarks.bench_quantization --chunks 200000 --queries 500 --index-type flat hnsw
+"""
+import argparse
+from dataclasses import replace
+
+import faiss  # type: ignore
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.vector_store import FaissVectorStore, IndexSpec
+from benchmarks.bench_index_types import run_queries
+from benchmarks.common import synthetic_chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--index-type", nargs="+", default=["flat", "hnsw"], choices=["flat", "ivf_flat", "hnsw"])
+    parser.add_argument("--nlist", type=int, default=1024)
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dim=args.dim)
+    vectors = embedder.embed_texts(synthetic_chunks(args.chunks))
+    # held-out chunks from the same distribution stand in for user questions
+    queries = embedder.embed_texts(synthetic_chunks(args.queries, tokens_per_chunk=12, seed=1))
+    chunks = [Chunk(doc_id="bench", chunk_id=str(i), text="") for i in range(args.chunks)]
+    # exact float32 neighbours are the reference for every index type
+    truth, _ = run_queries(_build(IndexSpec(), vectors, chunks, 1.0), queries, args.k)
+
+    print(f"chunks={args.chunks} dim={args.dim} k={args.k} queries={args.queries} threads={faiss.omp_get_max_threads()}")
+    print(f"{'index':>9} {'vectors':>13} {'MB':>8} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7}")
+    for kind in args.index_type:
+        base = IndexSpec(kind=kind, nlist=args.nlist)
+        configs = [("float32", 1.0), ("fp16", 1.0), ("int8", 1.0), ("int8", 0.1)]
+        for quantization, trained_share in configs:
+            store = _build(replace(base, quantization=quantization), vectors, chunks, trained_share)
+            size_mb = len(faiss.serialize_index(store.index)) / 1e6
+            hits, lat = run_queries(store, queries, args.k)
+            recall = np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t])
+            label = quantization + (" (delta)" if trained_share < 1 else "")
+            print(
+                f"{kind:>9} {label:>13} {size_mb:>8.1f} {recall:>7.3f} "
+                f"{np.percentile(lat, 50):>7.3f} {np.percentile(lat, 99):>7.3f}"
+            )
+
+
+def _build(spec: IndexSpec, vectors: np.ndarray, chunks: list[Chunk], trained_share: float) -> FaissVectorStore:
+    store = FaissVectorStore(dim=vectors.shape[1], spec=spec)
+    first = int(len(vectors) * trained_share)
+    store.add(vectors[:first], chunks[:first])
+    if first < len(vectors):
+        store.add(vectors[first:], chunks[first:])
+    return store
+
+
+if __name__ == "__main__":
+    main()
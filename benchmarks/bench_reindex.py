@@ -0,0 +1,45 @@
+"""
+Full rebuild vs delta reindex after editing a single document.
+
+    python -m benchmarks.bench_reindex --docs 1000 10000 30000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder
+from benchmarks.common import write_synthetic_docs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000, 30000])
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'chunks':>8} {'full s':>8} {'delta s':>8} {'added':>6} {'removed':>8} {'kept':>8}")
+    for n in args.docs:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / "docs"
+            write_synthetic_docs(folder, n)
+
+            t0 = time.perf_counter()
+            retriever = build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+            full = time.perf_counter() - t0
+
+            target = folder / "doc_000000.txt"
+            target.write_text(target.read_text() + "\n\nAn appended paragraph.")
+
+            t0 = time.perf_counter()
+            _, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+            delta = time.perf_counter() - t0
+
+            print(
+                f"{n:>8} {len(retriever.store):>8} {full:>8.2f} {delta:>8.3f} "
+                f"{stats.added:>6} {stats.removed:>8} {stats.kept:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Single-query latency of ShardedVectorStore as the shard count grows. FAISS
+scans one query on one core, so one flat index cannot use more than one core
+per question; N shards scan 1/N of the vectors each on N threads. Recall is
+against the unsharded index (flat stays exact; chunks tied at the k-th score
+may differ). Speedup is bounded by the cores available (printed as cpus).
+
+    python -m benchmarks.bench_sharding --chunks 1000000 --queries 200 --shards 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+import faiss  # type: ignore
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.vector_store import IndexSpec, store_class
+from benchmarks.common import synthetic_chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf_flat", "hnsw"])
+    args = parser.parse_args()
+
+    # shard threads are the parallelism being measured; keep FAISS from adding its own
+    faiss.omp_set_num_threads(1)
+    embedder = HashingEmbedder(dim=args.dim)
+    vectors = embedder.embed_texts(synthetic_chunks(args.chunks))
+    queries = embedder.embed_texts(synthetic_chunks(args.queries, tokens_per_chunk=12, seed=1))
+    chunks = [Chunk(doc_id=str(i // 10), chunk_id=str(i), text="") for i in range(args.chunks)]
+
+    truth = None
+    base_p50 = None
+    print(f"chunks={args.chunks} dim={args.dim} k={args.k} index={args.index_type} cpus={os.cpu_count()}")
+    print(f"{'shards':>6} {'build s':>8} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'speedup':>8}")
+    for shards in args.shards:
+        spec = IndexSpec(kind=args.index_type, shards=shards)
+        store = store_class(spec)(dim=args.dim, spec=spec)
+        start = time.perf_counter()
+        store.add(vectors, chunks)
+        build_s = time.perf_counter() - start
+
+        store.search(queries[0], k=args.k)  # start the shard threads
+        hits, lat = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            results = store.search(q, k=args.k)
+            lat.append(time.perf_counter() - t0)
+            hits.append({r.chunk.chunk_id for r in results})
+        lat = np.asarray(lat) * 1000
+        if truth is None:
+            truth = hits
+        recall = np.mean([len(h & t) / len(t) for h, t in zip(hits, truth) if t])
+        p50 = float(np.percentile(lat, 50))
+        base_p50 = base_p50 or p50
+        print(
+            f"{shards:>6} {build_s:>8.2f} {recall:>7.3f} {p50:>7.3f} {np.percentile(lat, 99):>7.3f} "
+            f"{base_p50 / p50:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
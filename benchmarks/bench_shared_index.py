@@ -0,0 +1,116 @@
+"""
+Memory of `uvicorn --workers N` per index mode, measured from outside on
+every worker process once all of them have loaded and warmed up the index
+(phase start), and again after a document was added and every worker
+swapped in the reindexed index (phase reindexed):
+- build: no snapshot, each worker chunks, embeds and indexes in its own heap
+- snapshot: INDEX_SNAPSHOT_DIR, each worker maps the snapshot until its first reindex
+- shared: INDEX_SHARED, each worker maps the same published generation, also after reindexes
+rss counts shared pages once per worker; pss splits them between workers,
+so "total pss" is what the N workers really take together.
+
+    python -m benchmarks.bench_shared_index --docs 10000 --workers 1 4 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import process_memory
+from app.rag.index_builder import build_snapshot
+from app.rag.snapshot import SnapshotGenerations
+from benchmarks.bench_cold_start import _free_port
+from benchmarks.common import write_synthetic_docs
+
+
+def _poll_workers(port: int, workers: int, done, timeout: float) -> set[int]:
+    """Ask /version on fresh connections until done(index info) held for `workers` distinct workers."""
+    seen: set[int] = set()
+    start = time.perf_counter()
+    while len(seen) < workers and time.perf_counter() - start < timeout:
+        try:
+            with httpx.Client() as client:  # a new connection may land on another worker
+                info = client.get(f"http://127.0.0.1:{port}/api/v1/version").json()
+            if done(info["index"]):
+                seen.add(info["worker"]["pid"])
+        except httpx.TransportError:
+            time.sleep(0.05)
+    if len(seen) < workers:
+        raise RuntimeError(f"only {len(seen)} of {workers} workers got there")
+    return seen
+
+
+def measure(env: dict, workers: int, docs: Path, timeout: float = 900.0) -> dict[str, list[dict]]:
+    """process_memory() of each worker per phase."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    added = docs / "bench_added.txt"
+    try:
+        # workers load before accepting (blocking init), so a reply means that worker is ready
+        pids = _poll_workers(port, workers, lambda index: True, timeout)
+        phases = {"start": [process_memory(pid) for pid in sorted(pids)]}
+        added.write_text("A document added while serving. Its token is BENCH-0001.", encoding="utf-8")
+        pids = _poll_workers(port, workers, lambda index: index["reloads"] > 0, timeout)
+        phases["reindexed"] = [process_memory(pid) for pid in sorted(pids)]
+        return phases
+    finally:
+        added.unlink(missing_ok=True)
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=["build", "snapshot", "shared"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs, snap, shared = Path(tmp) / "docs", Path(tmp) / "index", SnapshotGenerations(Path(tmp) / "shared")
+        write_synthetic_docs(docs, args.docs)
+        chunking = dict(chunk_size=settings.rag_chunk_size, overlap=settings.rag_chunk_overlap, dim=settings.embedding_dim)
+        manifest = build_snapshot(str(docs), str(snap), **chunking)
+        with shared.lock():
+            shared.publish(lambda out: build_snapshot(str(docs), str(out), **chunking))
+
+        base = {
+            "DOCS_DIR": str(docs), "LLM_PROVIDER": "stub", "TRUSTED_HOSTS": "127.0.0.1",
+            "RETRIEVER_BACKGROUND_INIT": "false", "RETRIEVER_WARMUP": "true", "DOCS_WATCH_INTERVAL_S": "1",
+        }
+        modes = {
+            "build": {},
+            "snapshot": {"INDEX_SNAPSHOT_DIR": str(snap)},
+            "shared": {"INDEX_SNAPSHOT_DIR": str(shared.root), "INDEX_SHARED": "true"},
+        }
+        print(f"docs={args.docs} chunks={manifest.num_chunks} dim={manifest.dim} cpus={os.cpu_count()}")
+        print(
+            f"{'mode':>9} {'workers':>8} {'phase':>10} {'rss MB/worker':>14} {'pss MB/worker':>14} "
+            f"{'total pss MB':>13}"
+        )
+        for mode in args.modes:
+            for workers in args.workers:
+                for phase, memory in measure({**base, **modes[mode]}, workers, docs).items():
+                    rss = sum(m["rss_mb"] for m in memory) / len(memory)
+                    pss = sum(m["pss_mb"] for m in memory)
+                    print(
+                        f"{mode:>9} {workers:>8} {phase:>10} {rss:>14.1f} {pss / len(memory):>14.1f} {pss:>13.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
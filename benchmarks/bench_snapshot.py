@@ -0,0 +1,58 @@
+"""
+Startup cost: rebuilding the index from the docs folder vs loading a snapshot.
+
+    python -m benchmarks.bench_snapshot --docs 1000 10000
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from app.rag.index_builder import build_snapshot
+from benchmarks.common import write_synthetic_docs
+
+# Each mode runs in a fresh interpreter so RSS and timings are not shared.
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+if sys.argv[1] == "rebuild":
+    from app.rag.index_builder import build_retriever_from_folder
+    r = build_retriever_from_folder(sys.argv[2], chunk_size=300, overlap=50, dim=256)
+else:
+    from app.rag.retriever import Retriever
+    r = Retriever.load(sys.argv[3], mmap=(sys.argv[1] == "mmap"))
+r.retrieve("term1 term2 term3", k=3)
+elapsed = time.perf_counter() - start
+# VmHWM is per address space; ru_maxrss would inherit the parent's peak
+hwm_kb = int(open("/proc/self/status").read().split("VmHWM:")[1].split()[0])
+print(f"{elapsed:.3f} {hwm_kb // 1024}")
+"""
+
+
+def probe(mode: str, docs: Path, snap: Path) -> tuple[float, int]:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, mode, str(docs), str(snap)],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'chunks':>8} {'mode':>8} {'ready s':>8} {'peak RSS MB':>12}")
+    for n in args.docs:
+        with tempfile.TemporaryDirectory() as tmp:
+            docs, snap = Path(tmp) / "docs", Path(tmp) / "index"
+            write_synthetic_docs(docs, n)
+            manifest = build_snapshot(str(docs), str(snap), chunk_size=300, overlap=50, dim=256)
+            for mode in ("rebuild", "load", "mmap"):
+                seconds, rss = probe(mode, docs, snap)
+                print(f"{n:>8} {manifest.num_chunks:>8} {mode:>8} {seconds:>8.3f} {rss:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Index memory, build time and search latency of the sparse inverted index
+against the exact dense flat index as the HashingEmbedder dim grows. Dense
+rows cost chunks * dim * 4 bytes whatever the text length; sparse postings
+grow with the nonzeros only. Dense is skipped above --dense-max-mb.
+
+    python -m benchmarks.bench_sparse --chunks 100000 --dims 256 4096 65536 1048576
+"""
+import argparse
+import time
+
+import faiss  # type: ignore
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.vector_store import FaissVectorStore, IndexSpec, SparseVectorStore
+from benchmarks.common import synthetic_chunks
+
+
+def timed_queries(store, queries, k: int) -> tuple[list[set], np.ndarray]:
+    """(hit id sets, per-query latency in ms)."""
+    hits, lat = [], []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        results = store.search(queries[row:row + 1], k=k)
+        lat.append((time.perf_counter() - start) * 1000)
+        hits.append({r.id for r in results})
+    return hits, np.array(lat)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 4096, 65536, 1 << 20])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dense-max-mb", type=int, default=2000, help="skip the dense index above this size")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    # held-out chunks from the same distribution stand in for user questions
+    questions = synthetic_chunks(args.queries, tokens_per_chunk=12, seed=1)
+    chunks = [Chunk(doc_id="bench", chunk_id=str(i), text="") for i in range(args.chunks)]
+
+    print(f"chunks={args.chunks} k={args.k} queries={args.queries} threads={faiss.omp_get_max_threads()}")
+    print(f"{'dim':>8} {'index':>7} {'MB':>9} {'build s':>8} {'p50 ms':>7} {'p99 ms':>7} {'same top-k':>10}")
+    for dim in args.dims:
+        embedder = HashingEmbedder(dim=dim)
+        start = time.perf_counter()
+        sparse = SparseVectorStore(dim=dim, spec=IndexSpec(kind="sparse"))
+        sparse.add(embedder.embed_sparse(texts), chunks)
+        build_s = time.perf_counter() - start
+        sparse_hits, lat = timed_queries(sparse, embedder.embed_sparse(questions), args.k)
+        dense_mb = args.chunks * dim * 4 / 1e6
+
+        dense_hits = None
+        if dense_mb <= args.dense_max_mb:
+            start = time.perf_counter()
+            dense = FaissVectorStore(dim=dim)
+            dense.add(embedder.embed_texts(texts), chunks)
+            dense_build_s = time.perf_counter() - start
+            dense_hits, dense_lat = timed_queries(dense, embedder.embed_texts(questions), args.k)
+            print(
+                f"{dim:>8} {'flat':>7} {dense.index.ntotal * dim * 4 / 1e6:>9.1f} {dense_build_s:>8.2f} "
+                f"{np.percentile(dense_lat, 50):>7.3f} {np.percentile(dense_lat, 99):>7.3f} {'':>10}"
+            )
+            del dense
+        else:
+            print(f"{dim:>8} {'flat':>7} {dense_mb:>9.1f} {'skipped':>8}")
+
+        # top-k sets differ only between ties / zero-score padding (sparse never returns non-matches)
+        same = np.mean([s <= d for s, d in zip(sparse_hits, dense_hits)]) if dense_hits else float("nan")
+        print(
+            f"{dim:>8} {'sparse':>7} {sparse.index.nbytes / 1e6:>9.1f} {build_s:>8.2f} "
+            f"{np.percentile(lat, 50):>7.3f} {np.percentile(lat, 99):>7.3f} {same:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
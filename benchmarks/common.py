@@ -0,0 +1,30 @@
+"""Shared helpers for the benchmark scripts (synthetic corpora, timing)."""
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+def synthetic_chunks(n: int, vocab_size: int = 20000, tokens_per_chunk: int = 60, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    # zipf-ish word frequencies, like real prose
+    ids = np.minimum(rng.zipf(1.2, size=(n, tokens_per_chunk)) - 1, vocab_size - 1)
+    return [" ".join(vocab[j] for j in row) for row in ids]
+
+
+def write_synthetic_docs(folder: Path, n_docs: int, chunks_per_doc: int = 10, seed: int = 0) -> None:
+    """Write n_docs .txt files of roughly chunks_per_doc * 300 characters each."""
+    folder.mkdir(parents=True, exist_ok=True)
+    texts = synthetic_chunks(n_docs * chunks_per_doc, tokens_per_chunk=40, seed=seed)
+    for d in range(n_docs):
+        body = "\n\n".join(texts[d * chunks_per_doc:(d + 1) * chunks_per_doc])
+        (folder / f"doc_{d:06d}.txt").write_text(body, encoding="utf-8")
+
+
+@contextmanager
+def timed(results: dict, key: str):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
@@ -0,0 +1,122 @@
+"""
+Minimal local stand-in for the OpenAI chat completions API.
+Answers like StubLLMClient, after an optional delay, and records which TCP
+connections served requests and how many were in flight at once.
+stream=True requests get the content as SSE chunks, token_delay_s apart.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.llm.client import StubLLMClient
+from app.llm.schemas import GroundedAnswer
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay_s: float = 0.0, token_delay_s: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.delay_s = delay_s
+        self.token_delay_s = token_delay_s
+        self.connections: set = set()
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server: FakeOpenAIServer = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server._lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(server.delay_s)
+            parsed, _ = StubLLMClient().generate_structured(body["messages"][-1]["content"], GroundedAnswer)
+        finally:
+            with server._lock:
+                server.active -= 1
+
+        content = parsed.model_dump_json()
+        if body.get("stream"):
+            self._stream(body["model"], content)
+            return
+
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout tests)
+
+    def _stream(self, model: str, content: str) -> None:
+        def chunk(delta: dict, finish_reason=None, usage=None) -> dict:
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": content[i:i + 8]}) for i in range(0, len(content), 8)]
+        events.append(chunk({}, finish_reason="stop"))
+        events.append(chunk({}, usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                self._write_chunk(f"data: {json.dumps(event)}\n\n")
+                time.sleep(self.server.token_delay_s)
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
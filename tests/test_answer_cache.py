@@ -0,0 +1,146 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.llm.client import AsyncStubLLMClient
+from app.main import app
+from app.rag.index_builder import build_retriever_from_folder
+from app.services import ask_service
+from app.services.answer_cache import ANSWER_CACHE, AnswerCache, normalize_question
+from app.services.ask_service import AskResult
+from app.services.retriever_provider import RetrieverProvider
+
+client = TestClient(app)
+
+QUESTION = "What is the password expiry policy?"
+
+
+def _cache(**kwargs):
+    provider = RetrieverProvider(
+        factory=lambda: build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    )
+    provider.get()
+    return AnswerCache(provider, **kwargs)
+
+
+def _put(cache, question, answer="Passwords expire every 90 days.", tokens=40):
+    cache.put(question, cache.embed(question), AskResult(answer=answer, tokens_used=tokens), cache.provider.version)
+
+
+def _get(cache, question):
+    return cache.get(question, cache.embed(question))
+
+
+def test_normalize_question():
+    assert normalize_question("  What's the  Password-Expiry policy?? ") == "what s the password expiry policy"
+
+
+def test_exact_and_semantic_hits():
+    cache = _cache(min_similarity=0.95)
+    _put(cache, QUESTION)
+
+    hit, kind = _get(cache, "what is the password expiry policy")
+    assert (hit.answer, kind) == ("Passwords expire every 90 days.", "exact")
+
+    # same words, different order: not the same key, but the same embedding
+    hit, kind = _get(cache, "The password expiry policy is what?")
+    assert kind == "semantic"
+
+    assert _get(cache, "What is the remote work policy?") == (None, None)
+    assert _get(cache, "What is the password policy?") == (None, None)  # 0.91 < 0.95
+
+    stats = cache.stats()
+    assert (stats["hits_exact"], stats["hits_semantic"], stats["misses"]) == (1, 1, 2)
+    assert stats["tokens_saved"] == 80
+
+
+def test_negated_or_reordered_questions_miss_by_default():
+    cache = _cache()
+    question = "Are contractors allowed to keep customer data after the contract ends?"
+    _put(cache, question, answer="No.")
+    negated = "Are contractors not allowed to keep customer data after the contract ends?"
+    # bag-of-words embeddings cannot tell these apart
+    embedder = cache.provider.get().embedder
+    assert float(embedder.embed_query(normalize_question(question)) @ embedder.embed_query(normalize_question(negated))) > 0.95
+
+    assert _get(cache, negated) == (None, None)
+    assert _get(cache, "After the contract ends, are contractors allowed to keep customer data?") == (None, None)
+    assert _get(cache, question)[1] == "exact"
+
+
+def test_ttl_expiry():
+    cache = _cache(ttl_s=0.05)
+    _put(cache, QUESTION)
+    assert _get(cache, QUESTION)[0] is not None
+    time.sleep(0.06)
+    assert _get(cache, QUESTION)[0] is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = _cache(max_entries=2)
+    for q in ("q one alpha", "q two beta", "q three gamma"):
+        _put(cache, q)
+        if q == "q two beta":
+            _get(cache, "q one alpha")  # touch: "q two beta" is now least recent
+    assert _get(cache, "q two beta")[0] is None
+    assert _get(cache, "q one alpha")[0] is not None
+    assert cache.stats()["entries"] == 2
+
+    cache = _cache(max_bytes=3000)
+    for i in range(10):
+        _put(cache, f"question number {i}", answer="x" * 500)
+    stats = cache.stats()
+    assert 0 < stats["entries"] < 10 and stats["bytes"] <= 3000
+    assert _get(cache, "question number 9")[0] is not None
+
+
+def test_index_version_change_invalidates():
+    cache = _cache()
+    stale_version = cache.provider.version
+    _put(cache, QUESTION)
+
+    retriever = cache.provider.get()
+    cache.provider.update(lambda current: (current.__class__(current.embedder, current.store.copy()), None))
+
+    assert _get(cache, QUESTION)[0] is None
+    assert cache.stats()["invalidations"] == 1
+
+    # an answer computed against the old index is not stored
+    cache.put(QUESTION, cache.embed(QUESTION), AskResult(answer="old"), stale_version)
+    assert _get(cache, QUESTION)[0] is None
+    assert retriever is not cache.provider.get()
+
+
+class _CountingLLM(AsyncStubLLMClient):
+    calls = 0
+
+    async def generate_structured(self, prompt, schema):
+        _CountingLLM.calls += 1
+        return await super().generate_structured(prompt, schema)
+
+
+def test_ask_serves_repeats_from_cache(monkeypatch):
+    monkeypatch.setattr(ask_service, "get_async_llm_client", lambda: _CountingLLM())
+    ANSWER_CACHE.clear()
+    before = client.get("/api/v1/metrics/summary").json()["answer_cache"]
+
+    first = client.post("/api/v1/ask", json={"question": QUESTION}).json()
+    second = client.post("/api/v1/ask", json={"question": "what is the PASSWORD expiry policy"}).json()
+    tuned = client.post("/api/v1/ask", json={"question": QUESTION, "nprobe": 4}).json()
+
+    assert _CountingLLM.calls == 2  # first + tuned (bypasses the cache)
+    assert first["meta"]["cached"] is None
+    assert second["meta"]["cached"] == "exact" and second["meta"]["tokens_used"] == 0
+    assert second["data"] == first["data"]
+    assert tuned["meta"]["cached"] is None
+
+    after = client.get("/api/v1/metrics/summary").json()["answer_cache"]
+    assert after["hits_exact"] == before["hits_exact"] + 1
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    res = client.post("/api/v1/ask", json={"question": QUESTION}).json()
+    assert res["meta"]["cached"] is None
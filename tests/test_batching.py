@@ -0,0 +1,122 @@
+import asyncio
+import subprocess
+import sys
+
+import faiss  # type: ignore
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.rag.index_builder import build_retriever_from_folder
+from app.rag.vector_store import IndexSpec
+from app.services.retrieval_batcher import RetrievalBatcher
+from app.services.retriever_provider import RetrieverProvider
+
+QUESTIONS = [
+    "How often do passwords expire?",
+    "Who approves access requests?",
+    "How do I report a security incident?",
+    "What is the remote work policy?",
+]
+
+
+def _provider(spec=None):
+    return RetrieverProvider(
+        factory=lambda: build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256, spec=spec)
+    )
+
+
+def _ids(results):
+    return [(r.chunk.chunk_id, round(r.score, 6)) for r in results]
+
+
+def test_retrieve_batch_matches_single_queries():
+    retriever = _provider().get()
+    batched = retriever.retrieve_batch(QUESTIONS, k=3)
+    assert [_ids(r) for r in batched] == [_ids(retriever.retrieve(q, k=3)) for q in QUESTIONS]
+    assert retriever.retrieve_batch([], k=3) == []
+
+
+def test_batcher_coalesces_concurrent_queries():
+    provider = _provider()
+    retriever = provider.get()
+    batcher = RetrievalBatcher(provider, max_batch=64, max_wait_ms=50)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.retrieve(q, k=2) for q in QUESTIONS * 5))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert [_ids(r) for r in results] == [_ids(retriever.retrieve(q, k=2)) for q in QUESTIONS * 5]
+    assert batcher.queries == 20
+    assert batcher.batches == 1
+
+
+def test_batcher_cuts_batches_at_max_size():
+    batcher = RetrievalBatcher(_provider(), max_batch=4, max_wait_ms=50)
+
+    async def run():
+        try:
+            await asyncio.gather(*(batcher.retrieve(q) for q in QUESTIONS * 3))
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+    assert batcher.batches == 3
+
+
+def test_batcher_honours_per_query_k_and_knobs():
+    provider = _provider(IndexSpec(kind="ivf_flat", nlist=4, nprobe=1))
+    retriever = provider.get()
+    batcher = RetrievalBatcher(provider, max_batch=64, max_wait_ms=50)
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                batcher.retrieve(QUESTIONS[0], k=1),
+                batcher.retrieve(QUESTIONS[0], k=4, nprobe=4),
+                batcher.retrieve(QUESTIONS[1], k=2, nprobe=4),
+            )
+        finally:
+            await batcher.stop()
+
+    one, four, two = asyncio.run(run())
+    assert _ids(one) == _ids(retriever.retrieve(QUESTIONS[0], k=1))
+    assert _ids(four) == _ids(retriever.retrieve(QUESTIONS[0], k=4, nprobe=4))
+    assert _ids(two) == _ids(retriever.retrieve(QUESTIONS[1], k=2, nprobe=4))
+
+
+def test_batcher_failure_reaches_every_caller():
+    provider = RetrieverProvider(factory=lambda: (_ for _ in ()).throw(ValueError("no index")))
+    batcher = RetrievalBatcher(provider, max_batch=8, max_wait_ms=10)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.retrieve(q) for q in QUESTIONS), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    errors = asyncio.run(run())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_disabled_batcher_searches_directly():
+    provider = _provider()
+    batcher = RetrievalBatcher(provider, max_batch=1)
+    results = asyncio.run(batcher.retrieve(QUESTIONS[0], k=2))
+    assert _ids(results) == _ids(provider.get().retrieve(QUESTIONS[0], k=2))
+    assert batcher.batches == 0
+
+
+def test_blas_threshold_is_applied_by_the_app_not_on_import(monkeypatch):
+    code = "import faiss, app.main; print(faiss.cvar.distance_compute_blas_threshold)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "20"
+
+    before = faiss.cvar.distance_compute_blas_threshold
+    monkeypatch.setattr(settings, "faiss_blas_threshold", 5)
+    with TestClient(app):
+        assert faiss.cvar.distance_compute_blas_threshold == 5
+    assert faiss.cvar.distance_compute_blas_threshold == before
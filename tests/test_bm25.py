@@ -0,0 +1,168 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from app.models.documents import Chunk
+from app.rag.bm25 import BM25Index, tokenize
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder, build_snapshot
+from app.rag.retriever import Retriever
+
+TEXTS = [
+    "Passwords expire every 90 days.",
+    "Access is granted by least privilege; see ticket SEC-2041.",
+    "Report security incidents to the SOC within 1 hour.",
+    "Passwords must not be reused. Password managers are allowed.",
+]
+
+
+def test_tokenize():
+    assert tokenize("See SEC-2041, NOW.") == ["see", "sec", "2041", "now"]
+
+
+def test_search_scores_and_normalization():
+    index = BM25Index()
+    index.add([0, 1, 2, 3], TEXTS)
+    assert len(index) == 4
+
+    hits = index.search("sec-2041", k=3)
+    assert [i for i, _ in hits] == [1]
+    assert 0 < hits[0][1] <= 1
+
+    # a common word alongside unknown ones scores low
+    _, weak = index.search("quantum banana passwords", k=1)[0]
+    _, strong = index.search("passwords", k=1)[0]
+    assert weak < strong / 2
+
+    assert index.search("quantum banana", k=3) == []
+
+
+def test_incremental_updates_match_a_rebuild():
+    index = BM25Index()
+    index.add([0, 1], TEXTS[:2])
+    copy = index.copy()
+    copy.add([5, 6], TEXTS[2:])
+    assert copy.remove([0, 0, 42]) == 1
+
+    rebuilt = BM25Index()
+    rebuilt.add([1, 5, 6], TEXTS[1:])
+    for query in ["passwords reused", "security incidents", "least privilege", "expire"]:
+        assert copy.search(query, k=3) == pytest.approx(rebuilt.search(query, k=3))
+    assert len(index) == 2  # the original is untouched
+
+    with pytest.raises(ValueError):
+        copy.add([5], ["duplicate id"])
+
+
+def test_segments_merge_and_copies_share_them():
+    texts = [f"{TEXTS[i % 4]} item{i}" for i in range(200)]
+    index = BM25Index()
+    for start in range(0, 200, 10):
+        index.add(range(start, start + 10), texts[start:start + 10])
+    # similar-sized neighbours merge: a handful of segments, not one per add
+    assert len(index.segments) <= 8
+
+    # a delta on a copy leaves the big segments shared and only writes its own
+    copy = index.copy()
+    copy.remove(range(0, 40))
+    copy.add([300], ["brand new passwords"])
+    assert copy.segments[0] is index.segments[0]
+    # re-adding a removed id first drops its old postings
+    copy.add([5], ["readded chunk passwords"])
+    assert len(index) == 200 and len(copy) == 162
+
+    rebuilt = BM25Index()
+    ids = [5] + list(range(40, 200)) + [300]
+    rebuilt.add(ids, ["readded chunk passwords"] + texts[40:] + ["brand new passwords"])
+    for query in ["passwords", "item7", "item77 incidents", "least privilege"]:
+        assert copy.search(query, k=5) == pytest.approx(rebuilt.search(query, k=5))
+    # removed postings are dropped once they are the majority
+    copy.remove(range(40, 150))
+    assert copy.nnz < index.nnz / 2
+
+
+def test_save_load_round_trip(tmp_path):
+    index = BM25Index(k1=1.5, b=0.5)
+    index.add([3, 7, 8, 9], TEXTS)
+    index.remove([8])
+    index.save(tmp_path)
+
+    loaded, private = BM25Index.load(tmp_path), BM25Index.load(tmp_path, mmap=False)
+    assert (loaded.k1, loaded.b, len(loaded)) == (1.5, 0.5, 3)
+    for query in ["passwords", "SEC-2041", "incidents"]:
+        assert loaded.search(query, k=4) == private.search(query, k=4) == index.search(query, k=4)
+
+    # mapped postings are read-only; updates go to a copy
+    assert not loaded.segments[0].ids.flags.writeable and private.segments[0].ids.flags.writeable
+    copy = loaded.copy()
+    copy.remove([3])
+    copy.add([10], ["passwords rotate yearly"])
+    assert len(copy) == 3 and len(loaded) == 3
+
+
+def test_hybrid_fuses_cosine_and_bm25():
+    chunks = [Chunk(doc_id="d", chunk_id=f"d::chunk_{i}", text=t) for i, t in enumerate(TEXTS)]
+    hybrid = Retriever.from_chunks(chunks, dim=64, hybrid_weight=0.4)
+    vector = Retriever.from_chunks(chunks, dim=64, hybrid_weight=0.0)
+    assert vector.bm25 is None
+
+    query = "ticket SEC-2041 access"
+    cosine = {r.id: r.score for r in vector.retrieve(query, k=4)}
+    lexical = dict(hybrid.bm25.search(query, k=4))
+    results = hybrid.retrieve(query, k=2)
+
+    assert results[0].chunk.text == TEXTS[1]
+    for r in results:
+        assert r.score == pytest.approx(0.6 * cosine[r.id] + 0.4 * lexical.get(r.id, 0.0))
+    # per-call override
+    assert [r.id for r in hybrid.retrieve(query, k=4, hybrid_weight=0.0)] == list(cosine)
+    assert hybrid.retrieve_batch([query, "passwords"], k=2)[0] == results
+
+
+def test_reindex_keeps_bm25_in_step(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    retriever = build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+
+    (folder / "policy_passwords.txt").write_text("Passwords expire after 30 days. Rotation ticket PWD-7781.")
+    (folder / "policy_incident.txt").unlink()
+    updated, _ = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+
+    assert len(updated.bm25) == len(updated.store)
+    assert updated.bm25 is not retriever.bm25
+    top = updated.retrieve("PWD-7781", k=1)[0]
+    assert "PWD-7781" in top.chunk.text
+    assert all(updated.store.get(i) is not None for i, _ in updated.bm25.search("incident", k=10))
+
+
+def test_snapshot_includes_bm25(tmp_path):
+    out = tmp_path / "index"
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    fresh = build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    loaded = Retriever.load(out)
+
+    assert (out / "bm25.npz").exists()
+    for query in ["passwords expire", "least privilege access"]:
+        a, b = fresh.retrieve(query, k=3), loaded.retrieve(query, k=3)
+        assert [r.chunk for r in a] == [r.chunk for r in b]
+        assert np.allclose([r.score for r in a], [r.score for r in b])
+
+    # older snapshots without postings get them rebuilt from the chunk table
+    (out / "bm25.npz").unlink()
+    rebuilt = Retriever.load(out)
+    expected = [r.chunk for r in fresh.retrieve("passwords expire", k=3)]
+    assert [r.chunk for r in rebuilt.retrieve("passwords expire", k=3)] == expected
+
+
+def test_queries_without_lexical_match_keep_cosine_scores():
+    chunks = [Chunk(doc_id=f"d{i}", chunk_id=f"d{i}_0", text=t) for i, t in enumerate(TEXTS)]
+    hybrid = Retriever.from_chunks(chunks, dim=64, hybrid_weight=0.3)
+    vector = Retriever.from_chunks(chunks, dim=64, hybrid_weight=0.0)
+    # postings without the query's terms (e.g. words only the embedder knows)
+    hybrid.bm25 = BM25Index()
+    query = TEXTS[0]
+    assert hybrid.bm25.scores(query)[0].size == 0
+    got = [(r.id, r.score) for r in hybrid.retrieve(query, k=3)]
+    assert got == [(r.id, r.score) for r in vector.retrieve(query, k=3)]
+    assert got[0][1] == pytest.approx(1.0, abs=1e-5)
@@ -0,0 +1,89 @@
+import numpy as np
+
+from app.models.documents import Chunk
+from app.rag.chunk_store import ChunkStore
+from app.rag.vector_store import FaissVectorStore
+
+
+def _chunks(n, offset=0):
+    return [
+        Chunk(
+            doc_id=f"doc{i % 4}",
+            chunk_id=f"doc{i % 4}::c{i}",
+            text=f"chunk {i} – naïve text",
+            metadata={"source_file": f"doc{i % 4}.txt", **({"team": f"t{i % 2}"} if i % 3 else {})},
+        )
+        for i in range(offset, offset + n)
+    ]
+
+
+def test_round_trip_preserves_chunks():
+    chunks = _chunks(20)
+    store = ChunkStore()
+    store.add(np.arange(20), chunks)
+    assert len(store) == 20
+    assert [store.get(i) for i in range(20)] == chunks
+    assert store.text(7) == chunks[7].text
+    assert store.get(20) is None and 20 not in store
+
+
+def test_remove_then_copy_compacts():
+    chunks = _chunks(10)
+    store = ChunkStore()
+    store.add(np.arange(10), chunks)
+    store.remove([2, 5, 5, 42])
+    assert len(store) == 8 and 5 not in store
+    assert store.ids().tolist() == [0, 1, 3, 4, 6, 7, 8, 9]
+
+    store.add(np.array([5]), _chunks(1, offset=50))
+    other = store.copy()
+    assert other.get(5).chunk_id == "doc2::c50"
+    assert [other.get(i) for i in (0, 9)] == [chunks[0], chunks[9]]
+    # a few removed chunks: copied as they are, no re-gather of every string
+    assert other._text_used == store._text_used
+
+    other.remove([0])
+    assert 0 in store
+
+    # once removed chunks hold most of the bytes, the copy drops them
+    store.remove([0, 1, 3, 4, 6, 7])
+    compacted = store.copy()
+    assert compacted._text_used < store._text_used / 2
+    assert [c for _, c in compacted] == [c for _, c in store]
+
+
+def test_save_load_mmap_detaches_on_write(tmp_path):
+    chunks = _chunks(12)
+    store = ChunkStore()
+    store.add(np.arange(12), chunks)
+    store.remove([3])
+    store.save(tmp_path)
+
+    loaded = ChunkStore.load(tmp_path, mmap=True)
+    assert isinstance(loaded.text_buf, np.memmap)
+    assert len(loaded) == 11 and 3 not in loaded
+    assert [loaded.get(i) for i in loaded.ids().tolist()] == [c for i, c in enumerate(chunks) if i != 3]
+
+    loaded.add(np.array([12]), _chunks(1, offset=12))
+    assert not isinstance(loaded.text_buf, np.memmap)
+    assert loaded.get(12).text == "chunk 12 – naïve text"
+    # the snapshot on disk is untouched
+    assert len(ChunkStore.load(tmp_path)) == 11
+
+
+def test_vector_store_snapshot_keeps_filters(tmp_path):
+    rng = np.random.default_rng(0)
+    store = FaissVectorStore(dim=16)
+    store.add(rng.standard_normal((40, 16)).astype(np.float32), _chunks(40))
+    store.remove([1, 2])
+    store.save(tmp_path)
+
+    loaded = FaissVectorStore.load(tmp_path, mmap=True)
+    assert len(loaded) == 38
+    expected = [i for i in range(40) if i % 4 == 1 and i % 3 and i % 2 and i not in (1, 2)]
+    assert loaded.select({"source_file": "doc1.txt", "team": "t1"}).tolist() == expected
+    results = loaded.search(rng.standard_normal(16).astype(np.float32), k=5, filters={"doc_id": "doc1"})
+    assert results and all(r.chunk.doc_id == "doc1" for r in results)
+
+    # ids keep counting past the highest id ever assigned
+    assert loaded.add(rng.standard_normal((1, 16)).astype(np.float32), _chunks(1)).tolist() == [40]
@@ -0,0 +1,178 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from app.rag import embedding_cache
+from app.rag.embedding_cache import CachedEmbedder, EmbeddingCache, text_key
+from app.rag.embeddings import HashingEmbedder
+from app.rag.index_builder import build_retriever_from_folder, main
+from app.rag.ingest import IngestPipeline
+from benchmarks.common import synthetic_chunks, write_synthetic_docs
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self, dim=64):
+        super().__init__(dim=dim)
+        self.calls = []
+
+    @property
+    def identity(self):
+        # same vectors as HashingEmbedder, so the same cache entries
+        return HashingEmbedder(dim=self.dim).identity
+
+    def embed_texts(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_texts(texts)
+
+
+def test_text_key_covers_identity_and_text():
+    key = text_key("hashing:64", "Passwords expire")
+    assert key == text_key("hashing:64", "Passwords expire")
+    assert key != text_key("hashing:128", "Passwords expire")
+    assert key != text_key("hashing:64", "Passwords expire ")
+    assert len(key) == 16
+
+
+def test_only_misses_are_embedded_in_batches(tmp_path):
+    texts = synthetic_chunks(50, tokens_per_chunk=10)
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(inner, EmbeddingCache(tmp_path), miss_batch=16)
+
+    first = embedder.embed_texts(texts[:30])
+    assert inner.calls == [16, 14]
+    np.testing.assert_array_equal(first, HashingEmbedder(dim=64).embed_texts(texts[:30]))
+
+    inner.calls.clear()
+    second = embedder.embed_texts(texts)
+    assert inner.calls == [16, 4]
+    np.testing.assert_array_equal(second, HashingEmbedder(dim=64).embed_texts(texts))
+    stats = embedder.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (30, 50, 50)
+    assert stats["hit_rate"] == 30 / 80
+
+    # queries never touch the cache
+    embedder.embed_query("a question nobody indexed")
+    embedder.embed_queries(["another question"])
+    assert len(embedder.cache) == 50
+
+
+def test_persists_across_reopen_and_separates_dims(tmp_path):
+    texts = ["alpha beta", "gamma", "alpha beta"]
+    CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache(tmp_path)).embed_texts(texts)
+
+    inner = CountingEmbedder(dim=64)
+    reopened = CachedEmbedder(inner, EmbeddingCache(tmp_path))
+    np.testing.assert_array_equal(reopened.embed_texts(texts), HashingEmbedder(dim=64).embed_texts(texts))
+    assert inner.calls == [] and len(reopened.cache) == 2
+
+    wider = CountingEmbedder(dim=128)
+    CachedEmbedder(wider, reopened.cache).embed_texts(texts)
+    assert wider.calls == [3] and len(reopened.cache) == 4
+
+
+def test_torn_append_is_truncated_on_open(tmp_path):
+    CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache(tmp_path)).embed_texts(["one", "two"])
+    # a crash after the vectors were written but before their keys
+    with open(tmp_path / "vectors-64.f32", "ab") as f:
+        f.write(b"\0" * (64 * 4 + 10))
+
+    inner = CountingEmbedder(dim=64)
+    embedder = CachedEmbedder(inner, EmbeddingCache(tmp_path))
+    embedder.embed_texts(["one", "two", "three"])
+    assert inner.calls == [1]
+    assert os.path.getsize(tmp_path / "vectors-64.f32") == 3 * 64 * 4
+    np.testing.assert_array_equal(embedder.embed_texts(["three"]), HashingEmbedder(dim=64).embed_texts(["three"]))
+
+
+def test_compact_drops_unused_rows(tmp_path):
+    CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache(tmp_path)).embed_texts(["old", "kept"])
+
+    cache = EmbeddingCache(tmp_path)
+    inner = CountingEmbedder(dim=64)
+    embedder = CachedEmbedder(inner, cache)
+    embedder.embed_texts(["kept", "new"])
+    assert cache.compact() == 1
+    assert len(cache) == 2
+    assert os.path.getsize(tmp_path / "keys-64.bin") == 2 * 16
+
+    inner.calls.clear()
+    np.testing.assert_array_equal(
+        embedder.embed_texts(["new", "kept"]), HashingEmbedder(dim=64).embed_texts(["new", "kept"])
+    )
+    assert inner.calls == []
+    embedder.embed_texts(["old"])
+    assert inner.calls == [1]
+
+
+def test_writers_sharing_a_directory_stay_aligned(tmp_path):
+    # two processes' caches on one directory (uvicorn workers each reindexing)
+    first = CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache(tmp_path))
+    inner = CountingEmbedder(dim=64)
+    second = CachedEmbedder(inner, EmbeddingCache(tmp_path))
+    first.embed_texts(["only first"])
+    second.embed_texts(["only second", "shared"])
+    first.embed_texts(["shared", "first again"])
+    assert len(first.cache) == 4
+
+    texts = ["only first", "only second", "shared", "first again"]
+    want = HashingEmbedder(dim=64).embed_texts(texts)
+    inner.calls.clear()
+    np.testing.assert_array_equal(second.embed_texts(texts), want)
+    assert inner.calls == []  # rows the other writer appended are found, at their own row numbers
+
+    # the other writer reloads the rewritten files before its next append
+    assert second.cache.compact() == 0
+    first.embed_texts(["after compact"])
+    np.testing.assert_array_equal(first.embed_texts(texts), want)
+    np.testing.assert_array_equal(second.embed_texts(texts + ["after compact"])[:4], want)
+    assert inner.calls == []
+
+
+def test_concurrent_processes_append_to_one_cache(tmp_path):
+    code = (
+        "import sys; from app.rag.embedding_cache import CachedEmbedder, EmbeddingCache; "
+        "from app.rag.embeddings import HashingEmbedder; "
+        "e = CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache(sys.argv[1])); "
+        "[e.embed_texts([f'{sys.argv[2]} {i}', f'common {i}']) for i in range(100)]"
+    )
+    procs = [subprocess.Popen([sys.executable, "-c", code, str(tmp_path), name]) for name in ("left", "right")]
+    assert [p.wait() for p in procs] == [0, 0]
+
+    texts = [f"{name} {i}" for name in ("left", "right", "common") for i in range(100)]
+    inner = CountingEmbedder(dim=64)
+    embedder = CachedEmbedder(inner, EmbeddingCache(tmp_path))
+    np.testing.assert_array_equal(embedder.embed_texts(texts), HashingEmbedder(dim=64).embed_texts(texts))
+    assert inner.calls == []
+    assert os.path.getsize(tmp_path / "keys-64.bin") // 16 == os.path.getsize(tmp_path / "vectors-64.f32") // (64 * 4)
+
+
+def test_rebuilds_only_embed_changed_chunks(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 6, chunks_per_doc=3)
+    inner = CountingEmbedder(dim=256)
+    embedder = CachedEmbedder(inner, EmbeddingCache(tmp_path / "cache"))
+    build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, embedder=embedder)
+    embedded = sum(inner.calls)
+
+    inner.calls.clear()
+    (folder / "doc_000000.txt").write_text("A brand new document body.")
+    retriever, _ = IngestPipeline(str(folder), chunk_size=300, overlap=50, embedder=embedder, workers=1).run()
+    assert sum(inner.calls) == 1 < embedded
+    assert retriever.retrieve("brand new document", k=1)[0].chunk.doc_id == "doc_000000"
+
+
+def test_builder_cli_reports_and_compacts(tmp_path, capsys):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 4, chunks_per_doc=2)
+    args = ["--docs", str(folder), "--out", str(tmp_path / "index"), "--embedding-cache", str(tmp_path / "cache")]
+    main(args)
+    assert "hit_rate=0.000" in capsys.readouterr().out
+
+    (folder / "doc_000000.txt").unlink()
+    # a new process: nothing used yet
+    embedding_cache._CACHES.clear()
+    main(args + ["--compact-embedding-cache"])
+    out = capsys.readouterr().out
+    assert "compacted=" in out and "compacted=0" not in out
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.models.documents import Chunk
+from app.rag.embedding_executor import EMBEDDERS, ParallelEmbedder, build_embedder, make_embedder, register_embedder
+from app.rag.embeddings import HashingEmbedder
+from app.rag.index_builder import build_snapshot, embedder_from_settings, main
+from app.rag.retriever import Retriever
+from app.rag.vector_store import IndexSpec
+from benchmarks.common import synthetic_chunks, write_synthetic_docs
+
+TEXTS = synthetic_chunks(230, tokens_per_chunk=12)
+
+
+class SlowEmbedder(HashingEmbedder):
+    """Waits per batch like a remote model; records which threads did the work."""
+
+    def __init__(self, dim=64, wait_s=0.05):
+        super().__init__(dim=dim)
+        self.wait_s = wait_s
+        self.threads = set()
+
+    def embed_texts(self, texts):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.wait_s)
+        return super().embed_texts(texts)
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_parallel_output_matches_inline_in_order(kind):
+    embedder = ParallelEmbedder(HashingEmbedder(dim=64), workers=2, batch_size=50, kind=kind)
+    try:
+        np.testing.assert_array_equal(embedder.embed_texts(TEXTS), HashingEmbedder(dim=64).embed_texts(TEXTS))
+        np.testing.assert_allclose(embedder.embed_sparse(TEXTS).toarray(), HashingEmbedder(dim=64).embed_texts(TEXTS))
+        assert embedder.embed_texts([]).shape == (0, 64)
+    finally:
+        embedder.close()
+
+
+def test_thread_pool_overlaps_waiting_batches():
+    inner = SlowEmbedder(wait_s=0.05)
+    embedder = ParallelEmbedder(inner, workers=4, batch_size=10, kind="thread")
+    start = time.perf_counter()
+    embedder.embed_texts(TEXTS[:80])
+    elapsed = time.perf_counter() - start
+    embedder.close()
+    # 8 batches of 50ms on 4 threads: ~0.1s instead of 0.4s
+    assert elapsed < 0.3
+    assert len(inner.threads) > 1
+
+    # a single batch never starts the pool
+    inline = ParallelEmbedder(SlowEmbedder(wait_s=0), workers=4, batch_size=100)
+    inline.embed_texts(TEXTS[:100])
+    assert inline._pool is None
+
+
+def test_registry_and_validation():
+    assert isinstance(make_embedder("hashing", 32), HashingEmbedder)
+    with pytest.raises(ValueError):
+        make_embedder("nope", 32)
+    with pytest.raises(ValueError):
+        ParallelEmbedder(HashingEmbedder(), kind="fiber")
+
+    register_embedder("slow", lambda dim: SlowEmbedder(dim=dim, wait_s=0))
+    try:
+        embedder = build_embedder("slow", 48, workers=2, batch_size=64)
+        assert isinstance(embedder, ParallelEmbedder) and isinstance(embedder.inner, SlowEmbedder)
+        assert embedder.dim == 48 and embedder.identity == embedder.inner.identity
+        assert isinstance(build_embedder("slow", 48), SlowEmbedder)
+    finally:
+        del EMBEDDERS["slow"]
+
+
+def test_settings_select_backend_and_executor(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "embedding_workers", 3)
+    monkeypatch.setattr(settings, "embedding_batch_size", 100)
+    monkeypatch.setattr(settings, "embedding_executor", "process")
+    embedder = embedder_from_settings(128)
+    assert isinstance(embedder, ParallelEmbedder)
+    assert (embedder.workers, embedder.batch_size, embedder.kind, embedder.dim) == (3, 100, "process", 128)
+
+
+def test_from_chunks_and_builds_take_an_embedder(tmp_path):
+    chunks = [Chunk(doc_id="d", chunk_id=f"d_{i}", text=t) for i, t in enumerate(TEXTS)]
+    embedder = ParallelEmbedder(HashingEmbedder(dim=128), workers=2, batch_size=40)
+    retriever = Retriever.from_chunks(chunks, embedder=embedder, spec=IndexSpec())
+    assert retriever.store.dim == 128
+    assert retriever.retrieve(TEXTS[17], k=1)[0].chunk.chunk_id == "d_17"
+
+    sparse = Retriever.from_chunks(chunks, embedder=embedder, spec=IndexSpec(kind="sparse"))
+    assert sparse.retrieve(TEXTS[17], k=1)[0].chunk.chunk_id == "d_17"
+    embedder.close()
+
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 4, chunks_per_doc=3)
+    main([
+        "--docs", str(folder), "--out", str(tmp_path / "index"),
+        "--embedding-workers", "2", "--embedding-batch-size", "2", "--embedding-executor", "thread",
+    ])
+    baseline = tmp_path / "baseline"
+    build_snapshot(str(folder), str(baseline), chunk_size=300, overlap=50)
+    built, expected = Retriever.load(tmp_path / "index"), Retriever.load(baseline)
+    query = built.store.text(0)
+    assert [r.id for r in built.retrieve(query, k=3)] == [r.id for r in expected.retrieve(query, k=3)]
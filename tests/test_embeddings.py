@@ -0,0 +1,48 @@
+import hashlib
+
+import numpy as np
+
+from app.rag.embeddings import HashingEmbedder
+
+
+def _reference_vec(text: str, dim: int) -> np.ndarray:
+    # original per-text implementation, kept here as the bit-exact oracle
+    vec = np.zeros(dim, dtype=np.float32)
+    for tok in text.lower().split():
+        h = hashlib.md5(tok.encode("utf-8")).hexdigest()
+        vec[int(h, 16) % dim] += 1.0
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+TEXTS = [
+    "Passwords must be rotated every 90 days.",
+    "",
+    "   ",
+    "least privilege least privilege LEAST privilege",
+    "Ünïcödé tokens — and\ttabs\nand newlines",
+    "a " * 500,
+]
+
+
+def test_batched_embeddings_match_reference_bit_for_bit():
+    for dim in (7, 256, 4096):
+        embedder = HashingEmbedder(dim=dim)
+        got = embedder.embed_texts(TEXTS)
+        expected = np.stack([_reference_vec(t, dim) for t in TEXTS])
+        assert got.dtype == np.float32
+        assert got.shape == (len(TEXTS), dim)
+        assert np.array_equal(got, expected)
+
+
+def test_embed_query_matches_batch_row():
+    embedder = HashingEmbedder(dim=256)
+    batch = embedder.embed_texts(TEXTS)
+    assert np.array_equal(embedder.embed_query(TEXTS[0]), batch[0])
+
+
+def test_embed_empty_batch():
+    out = HashingEmbedder(dim=32).embed_texts([])
+    assert out.shape == (0, 32)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models.documents import Chunk
+from app.rag.index_builder import build_retriever_from_folder
+from app.rag.vector_store import FaissVectorStore, IndexSpec, normalize_filters
+
+client = TestClient(app)
+
+SPECS = [
+    IndexSpec(kind="flat"),
+    IndexSpec(kind="ivf_flat", nlist=8, nprobe=8),
+    IndexSpec(kind="hnsw", hnsw_m=16),
+]
+
+
+def _store(spec, n=600, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    chunks = [
+        Chunk(doc_id=f"doc{i % 60}", chunk_id=f"c{i}", text=str(i), metadata={"team": f"t{i % 3}"})
+        for i in range(n)
+    ]
+    store = FaissVectorStore(dim=dim, spec=spec)
+    store.add(vectors, chunks)
+    return store, vectors, chunks
+
+
+def _brute_force(vectors, chunks, query, k, match):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    order = np.argsort(-(v @ (query / np.linalg.norm(query))), kind="stable")
+    return [chunks[i].chunk_id for i in order if match(chunks[i])][:k]
+
+
+def test_normalize_filters():
+    assert normalize_filters(None) is None and normalize_filters({}) is None
+    key = normalize_filters({"team": ["t2", "t1", "t1"], "doc_id": "doc3"})
+    assert key == (("doc_id", ("doc3",)), ("team", ("t1", "t2")))
+    assert normalize_filters(key) is key
+
+
+# narrow filters use a hash-set selector, broad ones a bitmap
+@pytest.mark.parametrize("filters,match", [
+    ({"doc_id": ["doc4", "doc7"]}, lambda c: c.doc_id in {"doc4", "doc7"}),
+    ({"team": "t1"}, lambda c: c.metadata["team"] == "t1"),
+    ({"team": ["t0", "t2"], "doc_id": ["doc0", "doc2", "doc5"]},
+     lambda c: c.metadata["team"] in {"t0", "t2"} and c.doc_id in {"doc0", "doc2", "doc5"}),
+], ids=["narrow", "broad", "and"])
+@pytest.mark.parametrize("spec", SPECS, ids=lambda s: s.kind)
+def test_filtered_search_matches_brute_force(spec, filters, match):
+    store, vectors, chunks = _store(spec)
+    found = total = 0
+    for q in range(0, 600, 97):
+        got = [r.chunk.chunk_id for r in store.search(vectors[q], k=5, filters=filters)]
+        expected = _brute_force(vectors, chunks, vectors[q], 5, match)
+        assert all(match(chunks[int(c[1:])]) for c in got)
+        if spec.kind != "hnsw":
+            assert got == expected
+        found += len(set(got) & set(expected))
+        total += len(expected)
+    # the graph walk skips filtered-out nodes, so HNSW recall is approximate
+    assert found / total >= 0.8
+
+
+def test_no_match_returns_nothing():
+    store, vectors, _ = _store(SPECS[0])
+    assert store.search(vectors[0], k=5, filters={"team": "nope"}) == []
+    assert store.search(vectors[0], k=5, filters={"team": []}) == []
+    assert store.search(vectors[0], k=5, filters={"unknown_field": "x"}) == []
+
+
+def test_metadata_index_follows_add_remove_and_copy():
+    store, vectors, chunks = _store(SPECS[0])
+    assert store.select({"doc_id": "doc1"}).tolist() == list(range(1, 600, 60))
+
+    copy = store.copy()
+    copy.remove([1, 61])
+    copy.add(vectors[:1], [Chunk(doc_id="doc1", chunk_id="new", text="new", metadata={"team": "t9"})])
+    assert copy.select({"doc_id": "doc1"}).tolist() == list(range(121, 600, 60)) + [600]
+    assert copy.select({"team": "t9"}).tolist() == [600]
+    # the original is untouched
+    assert store.select({"doc_id": "doc1"}).tolist() == list(range(1, 600, 60))
+    assert len(store.select({"team": "t9"})) == 0
+
+
+def test_hybrid_retrieval_respects_filters():
+    retriever = build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    results = retriever.retrieve("password access incident", k=5, filters={"source_file": "policy_access.txt"})
+    assert results
+    assert {r.chunk.metadata["source_file"] for r in results} == {"policy_access.txt"}
+
+
+def test_ask_with_filters(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    question = {"question": "What is the password expiry policy?"}
+
+    res = client.post("/api/v1/ask", json={**question, "filters": {"source_file": "policy_passwords.txt"}})
+    body = res.json()
+    assert res.status_code == 200
+    assert "90 days" in body["data"]["answer"]
+    assert {s["source_file"] for s in body["data"]["sources"]} == {"policy_passwords.txt"}
+
+    res = client.post("/api/v1/ask", json={**question, "filters": {"source_file": ["policy_access.txt"]}})
+    sources = res.json()["data"]["sources"]
+    assert all(s["source_file"] == "policy_access.txt" for s in sources)
+
+    res = client.post("/api/v1/ask", json={**question, "filters": {"doc_id": "missing"}})
+    assert res.json()["data"]["answer"] == "I don't know."
+
+    res = client.post("/api/v1/ask/batch", json={"questions": [question["question"]], "filters": {"doc_id": "missing"}})
+    assert res.json()["data"]["items"][0]["data"]["answer"] == "I don't know."
+
+
+def test_filters_validation():
+    res = client.post("/api/v1/ask", json={"question": "password policy", "filters": {"source_file": 3}})
+    assert res.status_code == 422
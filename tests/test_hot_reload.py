@@ -0,0 +1,102 @@
+import gc
+import shutil
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder
+from app.services.docs_watcher import DocsWatcher
+from app.services.retriever_provider import RetrieverProvider
+
+client = TestClient(app)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_watcher_fires_on_first_poll_and_on_change(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    calls = []
+    watcher = DocsWatcher(str(folder), on_change=lambda: calls.append(1), interval_s=0.02)
+    watcher.start()
+    try:
+        assert _wait_for(lambda: len(calls) == 1)
+        time.sleep(0.1)
+        assert len(calls) == 1  # no changes, no extra calls
+
+        (folder / "policy_new.txt").write_text("Badges must be worn at all times.")
+        assert _wait_for(lambda: len(calls) == 2)
+    finally:
+        watcher.stop()
+
+
+def test_update_swaps_atomically_and_bumps_version(tmp_path, monkeypatch):
+    freezes = []
+    monkeypatch.setattr(gc, "freeze", lambda: freezes.append(1))
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    provider = RetrieverProvider(
+        factory=lambda: build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+    )
+    indexer = IncrementalIndexer(str(folder), chunk_size=300, overlap=50)
+
+    old = provider.get()
+    assert provider.version == 1
+
+    # no changes: same retriever, same version
+    provider.update(indexer.reindex)
+    assert provider.get() is old and provider.version == 1
+
+    (folder / "policy_new.txt").write_text("Badges must be worn at all times.")
+    stats = provider.update(indexer.reindex)
+    assert stats.added == 1
+    assert provider.version == 2
+    info = provider.index_info()
+    assert info["reloads"] == 1 and info["last_reload_ms"] is not None
+
+    # a request that grabbed the old retriever keeps working on the old index
+    assert all(r.chunk.doc_id != "policy_new" for r in old.retrieve("badges worn", k=10))
+    assert provider.get().retrieve("badges worn", k=1)[0].chunk.doc_id == "policy_new"
+    # the startup load is frozen once; hot swaps never add to the permanent generation
+    assert freezes == [1]
+
+
+def test_queries_do_not_block_during_reload(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    provider = RetrieverProvider(
+        factory=lambda: build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+    )
+    provider.get()
+    release = threading.Event()
+
+    def slow_update(current):
+        release.wait(5)
+        return current, None
+
+    t = threading.Thread(target=provider.update, args=(slow_update,))
+    t.start()
+    try:
+        start = time.perf_counter()
+        provider.get().retrieve("passwords expire", k=3)
+        assert time.perf_counter() - start < 1.0
+    finally:
+        release.set()
+        t.join()
+
+
+def test_version_endpoint_reports_index():
+    client.post("/api/v1/ask", json={"question": "What is the password expiry policy?"})
+    body = client.get("/api/v1/version").json()
+    assert body["index"]["version"] >= 1
+    assert "last_reload_ms" in body["index"]
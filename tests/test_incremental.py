@@ -0,0 +1,157 @@
+import shutil
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.incremental import IncrementalIndexer
+from app.rag.ingest import IngestPipeline
+from app.rag.index_builder import build_retriever_from_folder, build_snapshot
+from app.rag.retriever import Retriever
+
+client = TestClient(app)
+
+
+def _docs(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    return folder
+
+
+def _build(folder):
+    return build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+
+
+def test_unchanged_folder_keeps_everything(tmp_path):
+    folder = _docs(tmp_path)
+    retriever = _build(folder)
+
+    new, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert (stats.added, stats.removed) == (0, 0)
+    assert stats.kept == len(retriever.store)
+    assert new is retriever
+
+
+def test_delta_reindex_adds_removes_and_keeps(tmp_path):
+    folder = _docs(tmp_path)
+    retriever = _build(folder)
+    before = len(retriever.store)
+    access_ids = retriever.documents["policy_access.txt"].chunk_ids
+
+    (folder / "policy_passwords.txt").write_text("Passwords expire after 30 days under the new rules.")
+    (folder / "policy_incident.txt").unlink()
+    (folder / "policy_vpn.md").write_text("VPN access requires multi-factor authentication.")
+
+    new, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert (stats.docs_added, stats.docs_changed, stats.docs_removed) == (1, 1, 1)
+    assert stats.added == 2
+    assert stats.kept == len(access_ids)
+    assert len(new.store) == before - stats.removed + stats.added
+
+    # unchanged documents keep their chunk ids
+    assert new.documents["policy_access.txt"].chunk_ids == access_ids
+    assert "policy_incident.txt" not in new.documents
+
+    texts = " ".join(r.chunk.text for r in new.retrieve("VPN multi-factor", k=5))
+    assert "multi-factor" in texts
+    assert all(r.chunk.doc_id != "policy_incident" for r in new.retrieve("incident", k=5))
+
+    # the old retriever is untouched and still serves the previous corpus
+    assert len(retriever.store) == before
+
+
+def test_touched_but_identical_file_is_not_reembedded(tmp_path):
+    folder = _docs(tmp_path)
+    retriever = _build(folder)
+    path = folder / "policy_access.txt"
+    path.write_text(path.read_text())
+
+    _, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert stats.added == 0
+    assert stats.kept == len(retriever.store)
+
+
+def test_reindex_after_snapshot_load(tmp_path):
+    folder = _docs(tmp_path)
+    build_snapshot(str(folder), str(tmp_path / "index"), chunk_size=300, overlap=50, dim=256)
+    loaded = Retriever.load(tmp_path / "index", mmap=True)
+    (folder / "policy_access.txt").write_text("Access reviews happen quarterly.")
+
+    new, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(loaded)
+    assert stats.docs_changed == 1
+    assert "quarterly" in new.retrieve("access reviews quarterly", k=1)[0].chunk.text
+
+
+def test_admin_reindex_endpoint_reports_counts():
+    res = client.post("/api/v1/admin/reindex")
+    assert res.status_code == 200
+    body = res.json()
+    assert {"added", "removed", "kept", "duration_ms"} <= body.keys()
+    assert body["added"] == 0
+
+
+def test_admin_reindex_requires_api_key_when_enabled(monkeypatch):
+    monkeypatch.setenv("REQUIRE_API_KEY", "true")
+    monkeypatch.setenv("API_KEY", "secret")
+    assert client.post("/api/v1/admin/reindex").status_code == 401
+
+
+def test_nested_files_and_exports_are_tracked_per_file(tmp_path):
+    folder = _docs(tmp_path)
+    (folder / "teams").mkdir()
+    (folder / "teams" / "policy_access.txt").write_text("Team specific access rules.")
+    export = folder / "teams" / "faq.jsonl"
+    export.write_text('{"id": "q1", "text": "VPN needs MFA."}\n{"id": "q2", "text": "Badges expire yearly."}\n')
+    retriever = _build(folder)
+    # same file name in a subfolder is a separate document
+    assert {"policy_access.txt", "teams/policy_access.txt", "teams/faq.jsonl"} <= set(retriever.documents)
+    assert len(retriever.documents["teams/faq.jsonl"].chunk_ids) == 2
+
+    export.write_text('{"id": "q1", "text": "VPN needs MFA."}\n')
+    new, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert (stats.docs_changed, stats.removed, stats.added) == (1, 2, 1)
+    assert [new.store.get(i).chunk_id for i in new.documents["teams/faq.jsonl"].chunk_ids] == ["q1::chunk_0"]
+
+
+def test_same_stem_files_are_tracked_separately(tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "policy.txt").write_text("Badges are checked at the front desk.")
+    (folder / "policy.md").write_text("Laptops must use full disk encryption at all times.")
+    retriever = _build(folder)
+    assert set(retriever.documents) == {"policy.txt", "policy.md"}
+    assert len(retriever.store) == 2
+
+    indexer = IncrementalIndexer(str(folder), chunk_size=300, overlap=50)
+    for _ in range(2):
+        retriever, stats = indexer.reindex(retriever)
+        assert (stats.added, stats.removed, stats.kept) == (0, 0, 2)
+    sources = {retriever.store.get(i).metadata["source_file"] for i in retriever.store.ids().tolist()}
+    assert sources == {"policy.txt", "policy.md"}
+
+
+def test_same_stem_exports_of_mixed_formats(tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "faq.csv").write_text("id,text\nc1,Printers are on floor two.\nc2,Guests sign in at reception.\n")
+    (folder / "faq.jsonl").write_text('{"id": "j1", "text": "VPN needs MFA."}\n')
+    (folder / "faq.txt").write_text("Lost badges are reported to security.")
+    retriever = _build(folder)
+    assert {s: len(d.chunk_ids) for s, d in retriever.documents.items()} == {"faq.csv": 2, "faq.jsonl": 1, "faq.txt": 1}
+
+    indexer = IncrementalIndexer(str(folder), chunk_size=300, overlap=50)
+    retriever, stats = indexer.reindex(retriever)
+    assert (stats.added, stats.removed, stats.kept) == (0, 0, 4)
+
+    (folder / "faq.jsonl").write_text('{"id": "j1", "text": "VPN needs MFA."}\n{"id": "j2", "text": "Wifi is open."}\n')
+    retriever, stats = indexer.reindex(retriever)
+    assert (stats.docs_changed, stats.added, stats.removed, stats.kept) == (1, 2, 1, 3)
+    assert len(retriever.store) == 5
+    assert sorted(retriever.store.get(i).chunk_id for i in retriever.documents["faq.csv"].chunk_ids) == [
+        "c1::chunk_0", "c2::chunk_0"
+    ]
+
+    # the ingest pipeline writes the same states: nothing to redo
+    ingested, _ = IngestPipeline(str(folder), chunk_size=300, overlap=50, workers=1).run()
+    assert set(ingested.documents) == {"faq.csv", "faq.jsonl", "faq.txt"}
+    _, delta = indexer.reindex(ingested)
+    assert (delta.added, delta.removed, delta.kept) == (0, 0, 5)
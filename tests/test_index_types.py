@@ -0,0 +1,159 @@
+import shutil
+
+import faiss  # type: ignore
+import numpy as np
+import pytest
+
+from app.models.documents import Chunk
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder, build_snapshot, load_or_build_retriever
+from app.rag.retriever import Retriever
+from app.rag.snapshot import read_manifest
+from app.rag.vector_store import FaissVectorStore, IndexSpec
+
+SPECS = [
+    IndexSpec(kind="flat"),
+    IndexSpec(kind="ivf_flat", nlist=8, nprobe=8),
+    IndexSpec(kind="ivf_pq", nlist=8, nprobe=8, pq_m=16, pq_bits=6),
+    IndexSpec(kind="hnsw", hnsw_m=16),
+]
+
+
+def _store(spec, n=500, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    chunks = [Chunk(doc_id="d", chunk_id=f"d_{i}", text=str(i)) for i in range(n)]
+    store = FaissVectorStore(dim=dim, spec=spec)
+    store.add(vectors, chunks)
+    return store, vectors
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda s: s.kind)
+def test_index_kinds_find_exact_match(spec):
+    store, vectors = _store(spec)
+    hits = [store.search(vectors[i], k=1)[0].chunk.chunk_id for i in range(0, 500, 25)]
+    expected = [f"d_{i}" for i in range(0, 500, 25)]
+    # PQ is lossy; the others should be exact on self-queries
+    matched = sum(h == e for h, e in zip(hits, expected))
+    assert matched >= (16 if spec.kind == "ivf_pq" else 20)
+
+
+@pytest.mark.parametrize("spec", SPECS[:3], ids=lambda s: s.kind)
+def test_removable_kinds_drop_ids(spec):
+    store, vectors = _store(spec)
+    assert store.remove([3, 4]) == 2
+    assert len(store) == 498
+    assert all(r.chunk.chunk_id not in {"d_3", "d_4"} for r in store.search(vectors[3], k=10))
+
+
+def test_hnsw_refuses_removal():
+    store, _ = _store(IndexSpec(kind="hnsw", hnsw_m=16))
+    assert not store.supports_remove
+    with pytest.raises(ValueError):
+        store.remove([1])
+
+
+def test_nprobe_is_tunable_per_query():
+    store, vectors = _store(IndexSpec(kind="ivf_flat", nlist=32, nprobe=1), n=2000)
+    q = vectors[0] + 0.5 * vectors[1]
+    exact = _store(IndexSpec(), n=2000)[0].search(q, k=10)
+    full = store.search(q, k=10, nprobe=32)
+    assert [r.chunk.chunk_id for r in full] == [r.chunk.chunk_id for r in exact]
+
+
+def test_unknown_kind_and_bad_pq_m_rejected():
+    with pytest.raises(ValueError):
+        IndexSpec(kind="annoy")
+    with pytest.raises(ValueError):
+        FaissVectorStore(dim=100, spec=IndexSpec(kind="ivf_pq", pq_m=16))
+
+
+def test_snapshot_records_spec_and_rebuilds_on_mismatch(tmp_path):
+    out = tmp_path / "index"
+    spec = IndexSpec(kind="ivf_flat", nlist=4, nprobe=4)
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256, spec=spec)
+    assert read_manifest(out).index_spec() == IndexSpec(kind="ivf_flat", nlist=4)
+
+    loaded = load_or_build_retriever("data/docs", str(out), chunk_size=300, overlap=50, dim=256, spec=spec)
+    assert loaded.store.spec == spec
+    assert loaded.store._mmap_path is not None
+    assert loaded.retrieve("passwords expire", k=1)
+
+    # a different nprobe is only a search knob: the snapshot still loads
+    tuned = load_or_build_retriever(
+        "data/docs", str(out), chunk_size=300, overlap=50, dim=256, spec=IndexSpec(kind="ivf_flat", nlist=4, nprobe=1)
+    )
+    assert tuned.store._mmap_path is not None
+
+    flat = load_or_build_retriever("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    assert flat.store.spec.kind == "flat"
+    assert flat.store._mmap_path is None
+
+
+def test_hnsw_delta_reindex_falls_back_to_rebuild(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    spec = IndexSpec(kind="hnsw", hnsw_m=16)
+    retriever = build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256, spec=spec)
+    before = len(retriever.store)
+
+    (folder / "policy_passwords.txt").write_text("Passwords expire after 30 days under the new rules.")
+    new, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert stats.removed == before
+    assert stats.added == len(new.store)
+    assert new.store.spec == spec
+    assert "30 days" in new.retrieve("passwords expire", k=1)[0].chunk.text
+    assert isinstance(new, Retriever)
+
+
+def _code_size(index) -> int:
+    """Bytes stored per vector."""
+    index = faiss.downcast_index(index.index if isinstance(index, faiss.IndexIDMap) else index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return index.code_size
+
+
+QUANTIZED = [
+    IndexSpec(kind="flat", quantization="fp16"),
+    IndexSpec(kind="flat", quantization="int8"),
+    IndexSpec(kind="ivf_flat", nlist=8, nprobe=8, quantization="int8"),
+    IndexSpec(kind="hnsw", hnsw_m=16, quantization="fp16"),
+]
+
+
+@pytest.mark.parametrize("spec", QUANTIZED, ids=lambda s: f"{s.kind}-{s.quantization}")
+def test_quantized_storage_is_smaller_and_finds_matches(spec, tmp_path):
+    store, vectors = _store(spec)
+    full, _ = _store(IndexSpec(kind=spec.kind, nlist=spec.nlist, nprobe=spec.nprobe, hnsw_m=spec.hnsw_m))
+    ratio = {"fp16": 2, "int8": 4}[spec.quantization]
+    assert _code_size(store.index) * ratio == _code_size(full.index) == 64 * 4
+    hits = [store.search(vectors[i], k=1)[0].chunk.chunk_id for i in range(0, 500, 25)]
+    assert hits == [f"d_{i}" for i in range(0, 500, 25)]
+
+    store.save(tmp_path)
+    loaded = FaissVectorStore.load(tmp_path, mmap=True, spec=spec)
+    assert loaded.search(vectors[7], k=1)[0].chunk.chunk_id == "d_7"
+    if store.supports_remove:
+        assert loaded.remove([7]) == 1
+        assert loaded.search(vectors[7], k=1)[0].chunk.chunk_id != "d_7"
+
+
+def test_quantization_is_validated_and_recorded(tmp_path):
+    with pytest.raises(ValueError):
+        IndexSpec(quantization="int4")
+    with pytest.raises(ValueError):
+        IndexSpec(kind="ivf_pq", quantization="fp16")
+
+    out = tmp_path / "index"
+    spec = IndexSpec(quantization="int8")
+    manifest = build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256, spec=spec)
+    assert read_manifest(out).index["quantization"] == "int8"
+    assert not manifest.matches(chunk_size=300, overlap=50, dim=256, spec=IndexSpec())
+    loaded = load_or_build_retriever("data/docs", str(out), chunk_size=300, overlap=50, dim=256, spec=spec)
+    assert loaded.store._mmap_path is not None
+    assert loaded.retrieve("password expiry", k=1)[0].chunk.chunk_id == "policy_passwords::chunk_0"
+
+    # manifests written before quantization existed describe float32 indexes
+    del manifest.index["quantization"]
+    assert manifest.matches(chunk_size=300, overlap=50, dim=256, spec=IndexSpec())
@@ -0,0 +1,75 @@
+import pytest
+
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_retriever_from_folder, load_or_build_retriever
+from app.rag.ingest import IngestPipeline, main
+from app.rag.loaders import doc_key
+from app.rag.vector_store import IndexSpec
+from benchmarks.common import write_synthetic_docs
+
+
+def _chunks(retriever):
+    return sorted((c.chunk_id, c.text, c.metadata["source_file"]) for _, c in retriever.store.items())
+
+
+def test_pipeline_matches_sequential_build(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 12, chunks_per_doc=4)
+    # batch_size 3 splits documents across embedding batches
+    retriever, stats = IngestPipeline(str(folder), chunk_size=300, overlap=50, workers=2, batch_size=3).run()
+    sequential = build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256)
+
+    assert _chunks(retriever) == _chunks(sequential)
+    assert stats.discover.docs == stats.chunk.docs == stats.write.docs == 12
+    assert stats.chunk.chunks == stats.embed.chunks == stats.write.chunks == len(sequential.store)
+    for source, state in retriever.documents.items():
+        assert [retriever.store.get(i).chunk_id for i in state.chunk_ids] == [
+            f"{doc_key(source)}::chunk_{n}" for n in range(len(state.chunk_ids))
+        ]
+    assert retriever.bm25 is not None and len(retriever.bm25) == len(retriever.store)
+
+    # JSONL exports and nested folders give the same index as the sequential build
+    (folder / "exports").mkdir()
+    (folder / "exports" / "faq.jsonl").write_text(
+        "".join(f'{{"id": "q{i}", "text": "Question {i}. " , "team": "t{i % 2}"}}\n' for i in range(7))
+    )
+    retriever, _ = IngestPipeline(str(folder), chunk_size=300, overlap=50, workers=2, batch_size=3).run()
+    assert _chunks(retriever) == _chunks(build_retriever_from_folder(str(folder), chunk_size=300, overlap=50, dim=256))
+    assert [retriever.store.get(i).chunk_id for i in retriever.documents["exports/faq.jsonl"].chunk_ids] == [
+        f"q{i}::chunk_0" for i in range(7)
+    ]
+
+    # the document states are what the incremental indexer expects: nothing to redo
+    _, delta = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert (delta.added, delta.removed, delta.kept) == (0, 0, len(retriever.store))
+
+
+def test_ivf_trains_on_buffered_batches(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 20, chunks_per_doc=4)
+    spec = IndexSpec(kind="ivf_flat", nlist=2, nprobe=2)
+    retriever, stats = IngestPipeline(str(folder), chunk_size=300, overlap=50, spec=spec, workers=1, batch_size=8).run()
+    assert retriever.store.index.is_trained
+    assert retriever.store.index.nlist == 2
+    assert len(retriever.store) == stats.chunk.chunks
+
+
+def test_bad_document_fails_the_build(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 3)
+    (folder / "broken.txt").write_bytes(b"\xff\xfe not utf-8")
+    with pytest.raises(ValueError, match="broken.txt"):
+        IngestPipeline(str(folder), workers=1).run()
+
+
+def test_ingest_cli_writes_loadable_snapshot(tmp_path, capsys):
+    out = tmp_path / "index"
+    main([
+        "--docs", "data/docs", "--out", str(out), "--chunk-size", "300", "--overlap", "50",
+        "--dim", "256", "--index-type", "flat", "--workers", "2", "--batch-size", "2",
+    ])
+    printed = capsys.readouterr().out
+    assert "chunks/s=" in printed and f"snapshot={out}" in printed
+
+    loaded = load_or_build_retriever("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    assert loaded.retrieve("password expiry", k=1)[0].chunk.chunk_id == "policy_passwords::chunk_0"
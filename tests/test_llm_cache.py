@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.llm import cache as llm_cache
+from app.llm.cache import CachingLLMClient, LLMResponseCache, prompt_key
+from app.llm.client import AsyncStubLLMClient, LLMResult
+from app.llm.schemas import GroundedAnswer
+from app.main import app
+
+client = TestClient(app)
+
+PROMPT = "SOURCES:\n[chunk-1] Passwords expire every 90 days.\nQUESTION: When do passwords expire?"
+
+
+class CountingStub(AsyncStubLLMClient):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def generate_structured(self, prompt, schema):
+        self.calls += 1
+        return await super().generate_structured(prompt, schema)
+
+
+def test_prompt_key_covers_prompt_model_and_schema():
+    key = prompt_key(PROMPT, "gpt-4o-mini", GroundedAnswer)
+    assert key == prompt_key(PROMPT, "gpt-4o-mini", GroundedAnswer)
+    assert key != prompt_key(PROMPT + " ", "gpt-4o-mini", GroundedAnswer)
+    assert key != prompt_key(PROMPT, "gpt-4o", GroundedAnswer)
+
+    class OtherAnswer(GroundedAnswer):
+        note: str = ""
+
+    assert key != prompt_key(PROMPT, "gpt-4o-mini", OtherAnswer)
+
+
+def test_hit_after_miss_and_persists_across_reopen(tmp_path):
+    path = tmp_path / "llm.sqlite"
+    inner = CountingStub()
+    llm = CachingLLMClient(inner, LLMResponseCache(path))
+
+    first, raw1 = asyncio.run(llm.generate_structured(PROMPT, GroundedAnswer))
+    second, raw2 = asyncio.run(llm.generate_structured(PROMPT, GroundedAnswer))
+    assert inner.calls == 1
+    assert second == first
+    assert raw2.tokens_used == 0
+    assert llm.cache.stats()["hits"] == 1
+    llm.cache.close()
+
+    reopened = CachingLLMClient(inner, LLMResponseCache(path))
+    third, _ = asyncio.run(reopened.generate_structured(PROMPT, GroundedAnswer))
+    assert inner.calls == 1
+    assert third == first
+
+
+def test_lru_eviction(tmp_path):
+    cache = LLMResponseCache(tmp_path / "llm.sqlite", max_entries=2)
+    raw = LLMResult(text="{}", model="stub-llm", tokens_used=1)
+
+    for key in ("a", "b"):
+        cache.put(key, "{}", raw)
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", "{}", raw)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+    cache.close()
+    assert LLMResponseCache(tmp_path / "llm.sqlite", max_entries=1).stats()["entries"] == 1
+
+
+def test_ttl_expiry(tmp_path):
+    inner = CountingStub()
+    llm = CachingLLMClient(inner, LLMResponseCache(tmp_path / "llm.sqlite", ttl_s=0.05))
+    asyncio.run(llm.generate_structured(PROMPT, GroundedAnswer))
+    time.sleep(0.1)
+    asyncio.run(llm.generate_structured(PROMPT, GroundedAnswer))
+    assert inner.calls == 2
+
+
+def test_stream_served_from_cache(tmp_path):
+    inner = CountingStub()
+    llm = CachingLLMClient(inner, LLMResponseCache(tmp_path / "llm.sqlite"))
+    parsed, _ = asyncio.run(llm.generate_structured(PROMPT, GroundedAnswer))
+
+    async def collect():
+        return [c async for c in llm.stream_structured(PROMPT, GroundedAnswer)]
+
+    chunks = asyncio.run(collect())
+    assert inner.calls == 1
+    assert "".join(c.delta for c in chunks) == parsed.answer
+    assert chunks[-1].parsed == parsed and chunks[-1].raw.tokens_used == 0
+
+
+def test_ask_uses_cache_and_bypass_header(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_cache_path", str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm_cache, "_CACHES", {})
+    body = {"question": "What is the password expiry policy?"}
+
+    first = client.post("/api/v1/ask", json=body).json()
+    second = client.post("/api/v1/ask", json=body).json()
+    assert second["data"]["answer"] == first["data"]["answer"]
+    assert second["meta"]["tokens_used"] == 0
+
+    stats = llm_cache.get_response_cache().stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    bypassed = client.post("/api/v1/ask", json=body, headers={"X-LLM-Cache": "bypass"}).json()
+    assert bypassed["meta"]["tokens_used"] == first["meta"]["tokens_used"]
+    assert llm_cache.get_response_cache().stats()["hits"] == 1
+
+    summary = client.get("/api/v1/metrics/summary").json()
+    assert summary["llm_cache"]["entries"] == 1
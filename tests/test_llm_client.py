@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+from openai import APITimeoutError
+
+from app.core.config import settings
+from app.llm import client as llm_client
+from app.llm.client import AsyncOpenAILLMClient, AsyncStubLLMClient, get_async_llm_client
+from app.llm.schemas import GroundedAnswer
+from app.services.ask_service import AskService
+from tests.fake_openai import FakeOpenAIServer
+
+PROMPT = "CONTEXT:\nCHUNK_ID: c1\nTEXT: Passwords expire every 90 days.\n\nQUESTION:\nWhen do passwords expire?"
+
+
+def _client(server, **kwargs):
+    return AsyncOpenAILLMClient(api_key="test", model="fake-model", base_url=server.base_url, **kwargs)
+
+
+def test_structured_call_against_fake_server():
+    async def run(server):
+        llm = _client(server)
+        try:
+            return await llm.generate_structured(PROMPT, GroundedAnswer)
+        finally:
+            await llm.aclose()
+
+    with FakeOpenAIServer() as server:
+        parsed, raw = asyncio.run(run(server))
+    assert parsed.answer == "Passwords expire every 90 days."
+    assert parsed.used_sources == ["c1"]
+    assert raw.model == "fake-model" and raw.tokens_used == 15
+
+
+def test_sequential_calls_reuse_one_connection():
+    async def run(server):
+        llm = _client(server)
+        try:
+            for _ in range(5):
+                await llm.generate_structured(PROMPT, GroundedAnswer)
+        finally:
+            await llm.aclose()
+
+    with FakeOpenAIServer() as server:
+        asyncio.run(run(server))
+    assert server.requests == 5
+    assert len(server.connections) == 1
+
+
+def test_concurrent_calls_overlap_up_to_max_connections():
+    async def run(server, max_connections):
+        llm = _client(server, max_connections=max_connections)
+        try:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(llm.generate_structured(PROMPT, GroundedAnswer) for _ in range(8)))
+            return time.perf_counter() - t0
+        finally:
+            await llm.aclose()
+
+    with FakeOpenAIServer(delay_s=0.2) as server:
+        elapsed = asyncio.run(run(server, max_connections=8))
+    assert server.peak == 8
+    assert elapsed < 0.8  # serialized would be 1.6s
+
+    with FakeOpenAIServer(delay_s=0.05) as server:
+        asyncio.run(run(server, max_connections=2))
+    assert server.peak <= 2
+
+
+def test_read_timeout_is_enforced():
+    async def run(server):
+        llm = _client(server, read_timeout_s=0.1, max_retries=0)
+        try:
+            await llm.generate_structured(PROMPT, GroundedAnswer)
+        finally:
+            await llm.aclose()
+
+    with FakeOpenAIServer(delay_s=1.0) as server:
+        t0 = time.perf_counter()
+        with pytest.raises(APITimeoutError):
+            asyncio.run(run(server))
+    assert time.perf_counter() - t0 < 0.9
+    assert server.requests == 1  # no JSON-mode fallback after a timeout
+
+
+def test_factory_reuses_client_per_loop(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+
+    async def pair():
+        try:
+            return get_async_llm_client(), get_async_llm_client()
+        finally:
+            await llm_client.aclose_llm_clients()
+
+    a, b = asyncio.run(pair())
+    assert a is b and isinstance(a, AsyncOpenAILLMClient)
+    c, _ = asyncio.run(pair())
+    assert c is not a
+
+    monkeypatch.setenv("LLM_PROVIDER", "stub")
+    assert isinstance(asyncio.run(pair())[0], AsyncStubLLMClient)
+
+
+def test_concurrent_asks_do_not_serialize_on_the_llm(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "ask_coalesce_enabled", False)
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    async def run():
+        try:
+            t0 = time.perf_counter()
+            results = await asyncio.gather(
+                *(AskService().answer("What is the password expiry policy?") for _ in range(6))
+            )
+            return results, time.perf_counter() - t0
+        finally:
+            await llm_client.aclose_llm_clients()
+
+    with FakeOpenAIServer(delay_s=0.2) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        results, elapsed = asyncio.run(run())
+
+    assert all("90 days" in r.answer for r in results)
+    assert all(r.model == "gpt-4o-mini" for r in results)
+    assert server.peak == 6
+    assert elapsed < 0.8  # serialized would be 1.2s
@@ -1,5 +1,11 @@
-from app.rag.loaders import load_documents_from_folder
-from app.rag.chunking import chunk_text, chunk_documents
+import gzip
+import json
+import tracemalloc
+
+import pytest
+
+from app.rag.loaders import RecordFields, iter_document_files, iter_documents, load_documents_from_folder
+from app.rag.chunking import chunk_file, chunk_text, chunk_documents, clean_text, iter_chunks
 from app.models.documents import Document
 
 
@@ -35,4 +41,115 @@ def test_chunk_documents_metadata():
 def test_load_documents_from_folder():
     docs = load_documents_from_folder("data/docs")
     assert len(docs) >= 1
-    assert all(d.text for d in docs)
\ No newline at end of file
+    assert all(d.text for d in docs)
+
+TEXT = (
+    "Passwords must be rotated every 90 days. Users must not reuse the last five passwords!  "
+    "Accounts lock after five failed attempts.\r\n\r\n\r\n"
+    "Access is granted by least privilege. Managers approve access requests (within two days). "
+    "Reviews happen quarterly."
+)
+
+
+def test_chunks_end_on_sentence_boundaries():
+    chunks = chunk_text(TEXT, chunk_size=100, overlap=20)
+    assert chunks[0] == "Passwords must be rotated every 90 days. Users must not reuse the last five passwords!"
+    assert all(len(c) <= 100 for c in chunks)
+    # no chunk starts or ends inside a word
+    words = set(clean_text(TEXT).split())
+    assert all(c.split()[0] in words and c.split()[-1] in words for c in chunks)
+
+
+def test_streaming_matches_whole_text_for_any_block_size():
+    whole = chunk_text(TEXT, chunk_size=60, overlap=15)
+    for size in (1, 2, 7, 64):
+        blocks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+        assert list(iter_chunks(blocks, chunk_size=60, overlap=15)) == whole
+    assert "\r" not in "".join(whole) and "   " not in "".join(whole)
+
+
+def test_token_unit_counts_words():
+    chunks = chunk_text(TEXT, chunk_size=12, overlap=3, unit="tokens")
+    assert len(chunks) > 1
+    assert all(len(c.split()) <= 12 for c in chunks)
+    with pytest.raises(ValueError):
+        chunk_text(TEXT, unit="bytes")
+
+
+def test_chunk_file_streams_with_bounded_memory(tmp_path):
+    path = tmp_path / "export.txt"
+    sentence = "Incident reports are filed within one hour of detection. "
+    with path.open("w", encoding="utf-8") as f:
+        for _ in range(1000):
+            f.write(sentence * 50 + "\n\n")  # ~2.9 MB
+
+    tracemalloc.start()
+    count = 0
+    for chunk in chunk_file(path, chunk_size=300, overlap=50):
+        assert chunk.doc_id == "export" and chunk.metadata == {"source_file": "export.txt", "chunk_index": str(count)}
+        count += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert count > 10000
+    # one block in flight, not the file
+    assert peak < path.stat().st_size / 3
+
+
+def _corpus(folder):
+    (folder / "hr" / "leave").mkdir(parents=True)
+    (folder / ".cache").mkdir()
+    (folder / "top.txt").write_text("Top level policy.")
+    (folder / "hr" / "leave" / "annual.md").write_text("Annual leave is 25 days.")
+    (folder / ".cache" / "stale.txt").write_text("ignored")
+    (folder / "notes.pdf").write_bytes(b"%PDF")
+    with gzip.open(folder / "hr" / "tickets.jsonl.gz", "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "T-1", "text": "Laptop stolen.", "team": "it", "tags": ["x"]}) + "\n\n")
+        f.write(json.dumps({"text": "No id here.", "team": "hr"}) + "\n")
+        f.write(json.dumps({"id": "T-3", "text": "  "}) + "\n")
+    (folder / "faq.csv").write_text('id,body,team\nQ1,"How do I reset, quickly?",it\nQ2,,hr\n')
+
+
+def test_folder_walk_is_recursive_and_format_aware(tmp_path):
+    _corpus(tmp_path)
+    names = [p.relative_to(tmp_path).as_posix() for p in iter_document_files(str(tmp_path))]
+    assert names == ["faq.csv", "hr/leave/annual.md", "hr/tickets.jsonl.gz", "top.txt"]
+
+    docs = {d.doc_id: d for d in load_documents_from_folder(str(tmp_path), RecordFields(text="body"))}
+    # faq.csv maps "body"; tickets has no "body" field, so nothing from it
+    assert sorted(docs) == ["Q1", "hr/leave/annual", "top"]
+    assert docs["Q1"].metadata == {"team": "it", "source_file": "faq.csv"}
+    assert docs["hr/leave/annual"].metadata == {"source_file": "hr/leave/annual.md"}
+
+    tickets = tmp_path / "hr" / "tickets.jsonl.gz"
+    docs = {d.doc_id: d for d in iter_documents(tickets, root=tmp_path, fields=RecordFields(metadata=("team",)))}
+    # records without an id are numbered by line; records without text are skipped
+    assert sorted(docs) == ["T-1", "hr/tickets:3"]
+    assert docs["T-1"].metadata == {"team": "it", "source_file": "hr/tickets.jsonl.gz"}
+    with pytest.raises(ValueError, match="faq.csv: no 'text' column"):
+        load_documents_from_folder(str(tmp_path))
+
+
+def test_bad_record_reports_file_and_line(tmp_path):
+    (tmp_path / "export.jsonl").write_text('{"id": 1, "text": "ok"}\n[1, 2]\n')
+    with pytest.raises(ValueError, match="export.jsonl:2: expected a JSON object"):
+        load_documents_from_folder(str(tmp_path))
+
+
+def test_record_export_streams_with_bounded_memory(tmp_path):
+    path = tmp_path / "export.jsonl.gz"
+    body = "Incident reports are filed within one hour of detection. " * 20
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for i in range(20000):  # ~23 MB uncompressed
+            f.write(json.dumps({"id": f"r{i}", "text": body, "team": f"t{i % 7}"}) + "\n")
+
+    tracemalloc.start()
+    count = 0
+    for chunk in chunk_file(path, chunk_size=300, overlap=50, root=tmp_path):
+        assert chunk.metadata["source_file"] == "export.jsonl.gz"
+        count += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert count == 20000 * len(chunk_text(body, chunk_size=300, overlap=50))
+    assert chunk.chunk_id.startswith("r19999::") and chunk.metadata["team"] == "t0"
+    # one record in flight, not the file
+    assert peak < 2 << 20
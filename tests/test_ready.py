@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.index_builder import build_retriever_from_folder
+from app.services.retriever_provider import RetrieverProvider
+
+
+def _factory(calls: list, delay: float = 0.0):
+    def build():
+        calls.append(1)
+        time.sleep(delay)
+        return build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    return build
+
+
+def test_ready_endpoint_reports_loaded_index():
+    with TestClient(app) as client:
+        for _ in range(100):
+            res = client.get("/ready")
+            if res.status_code == 200:
+                break
+            time.sleep(0.05)
+        assert res.status_code == 200
+        body = res.json()
+        assert body["status"] == "ready"
+        assert body["chunks"] > 0
+        assert body["time_to_ready_ms"] is not None
+
+
+def test_background_start_reports_loading_then_ready():
+    calls = []
+    provider = RetrieverProvider(factory=_factory(calls, delay=0.2))
+    provider.start(background=True, warmup_queries=["passwords expire"])
+
+    assert provider.status()["status"] == "loading"
+    assert provider.current() is None
+
+    retriever = provider.get()  # waits for the background build
+    status = provider.status()
+    assert status["status"] == "ready"
+    assert status["warmup_ms"] is not None
+    assert retriever.retrieve("passwords expire", k=1)
+    assert calls == [1]
+
+
+def test_concurrent_lazy_get_builds_once():
+    calls = []
+    provider = RetrieverProvider(factory=_factory(calls, delay=0.1))
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(provider.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert len({id(r) for r in got}) == 1
+
+
+def test_failed_build_is_reported_and_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("docs folder unavailable")
+        return build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+
+    provider = RetrieverProvider(factory=flaky)
+    with pytest.raises(RuntimeError):
+        provider.get()
+    assert provider.status()["status"] == "error"
+
+    assert provider.get() is not None
+    assert provider.status()["status"] == "ready"
@@ -0,0 +1,170 @@
+import json
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_snapshot, load_or_build_retriever, main
+from app.rag.ingest import IngestPipeline
+from app.rag import sharded_store
+from app.rag.retriever import Retriever
+from app.rag.sharded_store import ShardedVectorStore
+from app.rag.vector_store import FaissVectorStore, IndexSpec, store_class
+from benchmarks.common import synthetic_chunks, write_synthetic_docs
+
+DIM = 64
+TEXTS = synthetic_chunks(300, tokens_per_chunk=12)
+CHUNKS = [
+    Chunk(doc_id=f"doc_{i // 6}", chunk_id=f"doc_{i // 6}_{i % 6}", text=t, metadata={"team": f"t{i % 3}"})
+    for i, t in enumerate(TEXTS)
+]
+VECTORS = HashingEmbedder(dim=DIM).embed_texts(TEXTS)
+
+
+def _pair(spec: IndexSpec):
+    sharded = store_class(spec)(dim=DIM, spec=spec)
+    single = FaissVectorStore(dim=DIM, spec=IndexSpec(kind=spec.kind))
+    sharded.add(VECTORS, CHUNKS)
+    single.add(VECTORS, CHUNKS)
+    return sharded, single
+
+
+def _ranked(results):
+    return [(r.chunk.chunk_id, round(r.score, 5)) for r in results]
+
+
+@pytest.mark.parametrize("shard_by", ["chunk", "doc"])
+def test_flat_shards_match_a_single_index(shard_by):
+    sharded, single = _pair(IndexSpec(shards=4, shard_by=shard_by))
+    assert isinstance(sharded, ShardedVectorStore)
+    assert len(sharded) == len(single) == len(CHUNKS)
+    assert all(len(s) for s in sharded.shards)
+
+    queries = VECTORS[::37]
+    for got, want in zip(sharded.search_batch(queries, k=7), single.search_batch(queries, k=7)):
+        assert [s for _, s in _ranked(got)] == pytest.approx([s for _, s in _ranked(want)], abs=1e-5)
+    top = sharded.search(VECTORS[42], k=1)[0]
+    assert top.chunk.chunk_id == CHUNKS[42].chunk_id and sharded.get(top.id) == CHUNKS[42]
+
+    # more hits asked for than stored: every chunk once, no padding
+    assert len(sharded.search(VECTORS[0], k=1000)) == len(CHUNKS)
+    assert [i for i, _ in sharded.items()] == sharded.ids().tolist()
+
+
+def test_doc_sharding_keeps_a_document_in_one_shard():
+    sharded, _ = _pair(IndexSpec(shards=3, shard_by="doc"))
+    for s, shard in enumerate(sharded.shards):
+        for _, chunk in shard.items():
+            assert zlib.crc32(chunk.doc_id.encode("utf-8")) % 3 == s
+
+
+def test_filters_remove_and_readd():
+    sharded, single = _pair(IndexSpec(shards=4))
+    got = sharded.search(VECTORS[5], k=5, filters={"team": "t2"})
+    assert _ranked(got) == _ranked(single.search(VECTORS[5], k=5, filters={"team": "t2"}))
+    assert all(r.chunk.metadata["team"] == "t2" for r in got)
+    assert sharded.select({"team": "t1"}).tolist() == single.select({"team": "t1"}).tolist()
+
+    ids = sharded.ids()[:10]
+    copy = sharded.copy()
+    assert sharded.remove(ids) == 10 and len(sharded) == len(CHUNKS) - 10
+    assert not sharded.contains(ids).any() and copy.contains(ids).all()
+    assert all(r.id not in set(ids.tolist()) for r in sharded.search(VECTORS[0], k=20))
+
+    new_ids = sharded.add(VECTORS[:10], CHUNKS[:10])
+    assert new_ids.min() >= len(CHUNKS)
+    assert sharded.search(VECTORS[3], k=1)[0].chunk.chunk_id == CHUNKS[3].chunk_id
+    with pytest.raises(ValueError, match="already present"):
+        sharded.add(VECTORS[:1], CHUNKS[:1], ids=new_ids[:1])
+
+
+def test_hnsw_shards_refuse_removal():
+    sharded, _ = _pair(IndexSpec(kind="hnsw", shards=2))
+    assert not sharded.supports_remove
+    with pytest.raises(ValueError, match="does not support removal"):
+        sharded.remove([0])
+    assert sharded.remove([10_000]) == 0
+
+
+def test_sparse_shards():
+    spec = IndexSpec(kind="sparse", shards=3)
+    embedder = HashingEmbedder(dim=DIM)
+    sharded = store_class(spec)(dim=DIM, spec=spec)
+    sharded.add(embedder.embed_sparse(TEXTS), CHUNKS)
+    assert sharded.search(embedder.embed_sparse([TEXTS[9]]), k=1)[0].chunk.chunk_id == CHUNKS[9].chunk_id
+
+
+def test_save_and_load_each_shard(tmp_path):
+    spec = IndexSpec(shards=4, shard_by="doc")
+    sharded, _ = _pair(spec)
+    sharded.save(tmp_path)
+
+    header = json.loads((tmp_path / "shards" / "shards.json").read_text())
+    assert header == {"shards": 4, "shard_by": "doc", "next_id": sharded._next_id}
+    # a shard is a plain store on disk
+    alone = FaissVectorStore.load(ShardedVectorStore.shard_dir(tmp_path, 2))
+    assert len(alone) == len(sharded.shards[2])
+
+    loaded = ShardedVectorStore.load(tmp_path, spec=spec)
+    assert loaded.ids().tolist() == sharded.ids().tolist()
+    assert _ranked(loaded.search(VECTORS[11], k=5)) == _ranked(sharded.search(VECTORS[11], k=5))
+    with pytest.raises(ValueError, match="4 shards"):
+        ShardedVectorStore.load(tmp_path, spec=IndexSpec(shards=2))
+
+
+def test_loaded_and_copied_stores_share_one_pool(tmp_path, monkeypatch):
+    sharded, _ = _pair(IndexSpec(shards=4))
+    sharded.search(VECTORS[0], k=3)
+    pool = sharded_store._POOL
+    sharded.save(tmp_path)
+
+    def no_placeholders(self, *args, **kwargs):
+        raise AssertionError("load/copy must not build empty shards")
+
+    monkeypatch.setattr(ShardedVectorStore, "__init__", no_placeholders)
+    for other in (ShardedVectorStore.load(tmp_path), sharded.copy()):
+        assert _ranked(other.search(VECTORS[7], k=5)) == _ranked(sharded.search(VECTORS[7], k=5))
+    assert sharded_store._POOL is pool
+    assert sum(t.name.startswith("shard") for t in threading.enumerate()) <= sharded_store._POOL_SIZE
+
+
+def test_snapshot_reindex_and_cli(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 12, chunks_per_doc=3)
+    spec = IndexSpec(shards=3, shard_by="doc")
+    out = tmp_path / "index"
+    build_snapshot(str(folder), str(out), chunk_size=300, overlap=50, spec=spec)
+    retriever = Retriever.load(out, spec=spec)
+    assert isinstance(retriever.store, ShardedVectorStore)
+    plain = Retriever.from_chunks(list(c for _, c in retriever.store.items()), spec=IndexSpec())
+    query = retriever.store.text(int(retriever.store.ids()[4]))
+    assert [r.chunk.chunk_id for r in retriever.retrieve(query, k=3)] == [
+        r.chunk.chunk_id for r in plain.retrieve(query, k=3)
+    ]
+
+    # a snapshot with another shard count is rebuilt, not reused
+    rebuilt = load_or_build_retriever(str(folder), str(out), chunk_size=300, overlap=50, spec=IndexSpec(shards=2))
+    assert rebuilt.store.n_shards == 2
+
+    doc = sorted(folder.iterdir())[0]
+    doc.write_text("Shard rebalancing policy: documents move only on reindex.")
+    updated, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(rebuilt)
+    assert stats.docs_changed == 1
+    assert updated.retrieve("shard rebalancing policy", k=1)[0].chunk.doc_id == doc.stem
+
+    main(["--docs", str(folder), "--out", str(tmp_path / "cli"), "--shards", "2", "--shard-by", "chunk"])
+    assert Retriever.load(tmp_path / "cli").store.n_shards == 2
+
+
+def test_ingest_trains_every_ivf_shard(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 20, chunks_per_doc=4)
+    spec = IndexSpec(kind="ivf_flat", nlist=2, nprobe=2, shards=2)
+    retriever, stats = IngestPipeline(str(folder), chunk_size=300, overlap=50, spec=spec, workers=1, batch_size=8).run()
+    assert retriever.store.is_trained
+    assert all(shard.index.nlist == 2 for shard in retriever.store.shards)
+    assert len(retriever.store) == stats.chunk.chunks
@@ -0,0 +1,189 @@
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import process_memory
+from app.main import app
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_snapshot, load_snapshot, snapshot_problem
+from app.rag.snapshot import CURRENT_FILE, SnapshotGenerations
+from app.services import retriever_provider
+from app.services.retriever_provider import RetrieverProvider
+from app.services.shared_index import GenerationWatcher, SharedIndex
+
+client = TestClient(app)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _worker(folder, root, builds):
+    """One uvicorn worker's view of the shared index."""
+
+    def build(out):
+        builds.append(out)
+        build_snapshot(str(folder), str(out), chunk_size=300, overlap=50)
+
+    return SharedIndex(
+        SnapshotGenerations(root),
+        build=build,
+        load=load_snapshot,
+        problem=lambda path: snapshot_problem(path, str(folder), chunk_size=300, overlap=50, dim=256),
+    )
+
+
+def test_generations_publish_prune_and_lock(tmp_path):
+    generations = SnapshotGenerations(tmp_path / "index", keep=2)
+    assert generations.current() is None and generations.generations() == []
+
+    with generations.lock():
+        for _ in range(3):
+            generations.publish(lambda out: out.mkdir())
+    assert generations.current() == 3
+    assert (tmp_path / "index" / CURRENT_FILE).read_text() == "3"
+    # gen 1 is pruned; the previous one stays for workers still loading it
+    assert generations.generations() == [2, 3]
+
+    held, released = threading.Event(), threading.Event()
+    order = []
+
+    def holder():
+        with generations.lock():
+            held.set()
+            released.wait()
+            order.append("holder")
+
+    def waiter():
+        with generations.lock():
+            order.append("waiter")
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait()
+    waiting = threading.Thread(target=waiter)
+    waiting.start()
+    time.sleep(0.1)
+    assert order == []
+    released.set()
+    thread.join()
+    waiting.join()
+    assert order == ["holder", "waiter"]
+
+
+def test_workers_share_one_mapped_generation(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    builds = []
+    first, second = _worker(folder, tmp_path / "index", builds), _worker(folder, tmp_path / "index", builds)
+
+    a, b = first.open(), second.open()
+    # only the first worker built; both serve generation 1 from the same files
+    assert len(builds) == 1
+    assert first.generation == second.generation == 1
+    for retriever in (a, b):
+        assert retriever.store._mmap_path == first.generations.path(1) / "index.faiss"
+        assert not retriever.bm25.segments[0].ids.flags.writeable
+    assert [r.id for r in a.retrieve("password expiry", k=3)] == [r.id for r in b.retrieve("password expiry", k=3)]
+
+    # a snapshot built with other settings is replaced by a new generation
+    stale = _worker(folder, tmp_path / "index", builds)
+    stale._problem = lambda path: "built with different settings"
+    stale.open()
+    assert len(builds) == 2 and stale.generation == 2
+
+
+def test_reindex_publishes_and_other_workers_follow(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    builds = []
+    first, second = _worker(folder, tmp_path / "index", builds), _worker(folder, tmp_path / "index", builds)
+    a, b = first.open(), second.open()
+    indexer = IncrementalIndexer(str(folder), chunk_size=300, overlap=50)
+
+    (folder / "policy_vpn.md").write_text("VPN access requires multi-factor authentication via token VPN-4410.")
+    a2, stats = first.reindex(indexer, a)
+    assert stats.added == 1 and first.generation == 2
+    assert a2.store._mmap_path is not None
+    assert a2.retrieve("VPN-4410", k=1)[0].chunk.doc_id == "policy_vpn"
+
+    b2, generation = second.follow(b)
+    assert generation == 2 and second.generation == 2
+    assert b2.retrieve("VPN-4410", k=1)[0].chunk.doc_id == "policy_vpn"
+
+    # the other worker's reindex of the same change finds nothing left to do
+    b3, stats = second.reindex(indexer, b2)
+    assert (stats.added, stats.removed) == (0, 0)
+    assert b3 is b2 and first.generations.current() == 2
+
+
+def test_generation_watcher_fires_when_current_moves(tmp_path):
+    generations = SnapshotGenerations(tmp_path / "index")
+    calls = []
+    watcher = GenerationWatcher(generations, on_change=lambda: calls.append(generations.current()), interval_s=0.02)
+    watcher.start()
+    try:
+        time.sleep(0.1)
+        assert calls == []  # nothing published yet
+        with generations.lock():
+            generations.publish(lambda out: out.mkdir())
+        assert _wait_for(lambda: calls == [1])
+    finally:
+        watcher.stop()
+
+
+def test_provider_serves_the_shared_index(tmp_path, monkeypatch):
+    from app.core.config import settings
+
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    monkeypatch.setattr(settings, "docs_dir", str(folder))
+    monkeypatch.setattr(settings, "index_snapshot_dir", str(tmp_path / "index"))
+    monkeypatch.setattr(settings, "index_shared", True)
+    monkeypatch.setattr(retriever_provider, "_SHARED_INDEX", None)
+    provider = RetrieverProvider(factory=retriever_provider.build_default_retriever)
+    monkeypatch.setattr(retriever_provider, "RETRIEVER_PROVIDER", provider)
+
+    provider.get()
+    assert retriever_provider.index_generation() == 1
+    assert retriever_provider.follow_generation() is None
+
+    (folder / "policy_vpn.md").write_text("VPN access requires multi-factor authentication via token VPN-4410.")
+    stats = retriever_provider.reindex()
+    assert stats.added == 1 and retriever_provider.index_generation() == 2
+    assert provider.get().retrieve("VPN-4410", k=1)[0].chunk.doc_id == "policy_vpn"
+
+    # polls and reindexes that change nothing keep the last real reload on record
+    reload = {k: provider.index_info()[k] for k in ("reloads", "last_reload_ms", "last_reload_at")}
+    assert retriever_provider.follow_generation() is None
+    assert retriever_provider.reindex().added == 0
+    assert {k: provider.index_info()[k] for k in reload} == reload
+
+    worker = client.get("/api/v1/version").json()["worker"]
+    assert worker["index_generation"] == 2
+    assert worker["pid"] == process_memory()["pid"]
+
+
+def test_shared_index_needs_a_snapshot_dir(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "index_snapshot_dir", None)
+    monkeypatch.setattr(retriever_provider, "_SHARED_INDEX", None)
+    with pytest.raises(ValueError, match="INDEX_SNAPSHOT_DIR"):
+        retriever_provider.shared_index()
+
+
+def test_app_imports_without_fcntl():
+    # only SnapshotGenerations.lock() needs it; non-POSIX platforms can still serve unshared
+    code = "import sys; sys.modules['fcntl'] = None; import app.main"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True).returncode == 0
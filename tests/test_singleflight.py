@@ -0,0 +1,114 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.llm.client import AsyncStubLLMClient
+from app.main import app
+from app.services import ask_service
+from app.services.ask_service import AskService
+from app.services.singleflight import SingleFlight
+
+client = TestClient(app)
+
+QUESTION = "What is the password expiry policy?"
+
+
+class _SlowLLM(AsyncStubLLMClient):
+    calls = 0
+
+    async def generate_structured(self, prompt, schema):
+        _SlowLLM.calls += 1
+        await asyncio.sleep(0.1)
+        parsed, raw = await super().generate_structured(prompt, schema)
+        return parsed, replace(raw, tokens_used=50)
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(ask_service, "get_async_llm_client", lambda: _SlowLLM())
+    _SlowLLM.calls = 0
+
+
+def test_shared_call_and_errors():
+    flight = SingleFlight()
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        errors = await asyncio.gather(*(flight.do("e", fail) for _ in range(3)), return_exceptions=True)
+        again = await flight.do("k", work)  # finished calls are not reused
+        return results, errors, again
+
+    results, errors, again = asyncio.run(main())
+    assert runs == 2
+    assert [r for r, _ in results] == ["value"] * 5
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert again == ("value", False)
+    assert flight.stats() == {"in_flight": 0, "calls": 3, "coalesced": 6, "coalesced_rate": 6 / 9}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.1)
+        return "value"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", work))
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == ("value", True)
+
+
+def test_identical_concurrent_questions_share_one_llm_call(slow_llm):
+    async def main():
+        return await asyncio.gather(
+            *(AskService().answer(q) for q in [QUESTION] * 4 + ["what is the PASSWORD expiry policy"]),
+            AskService().answer(QUESTION, k=5),  # different retrieval: its own call
+        )
+
+    results = asyncio.run(main())
+    assert _SlowLLM.calls == 2
+    assert len({r.answer for r in results}) == 1
+    assert sum(1 for r in results if r.tokens_used) == 2  # tokens counted once per call
+
+
+def test_coalesced_count_in_metrics(slow_llm):
+    before = client.get("/api/v1/metrics/summary").json()["coalescing"]
+
+    async def main():
+        await asyncio.gather(*(AskService().answer(QUESTION) for _ in range(3)))
+
+    asyncio.run(main())
+    after = client.get("/api/v1/metrics/summary").json()["coalescing"]
+    assert after["coalesced"] == before["coalesced"] + 2
+    assert after["calls"] == before["calls"] + 1
+
+
+def test_coalescing_can_be_disabled(slow_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ask_coalesce_enabled", False)
+
+    async def main():
+        await asyncio.gather(*(AskService().answer(QUESTION) for _ in range(3)))
+
+    asyncio.run(main())
+    assert _SlowLLM.calls == 3
@@ -0,0 +1,101 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.rag.embeddings import HashingEmbedder
+from app.rag.index_builder import (
+    build_retriever_from_folder,
+    build_snapshot,
+    load_or_build_retriever,
+    main,
+    snapshot_problem,
+)
+from app.rag.retriever import Retriever
+from app.rag.snapshot import MANIFEST_FILE, SNAPSHOT_VERSION, corpus_hash, read_manifest
+
+
+def test_snapshot_round_trip_matches_in_memory(tmp_path):
+    out = tmp_path / "index"
+    manifest = build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+
+    assert manifest.num_chunks > 0
+    assert manifest.corpus_hash == corpus_hash("data/docs")
+    assert read_manifest(out) == manifest
+
+    fresh = build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    loaded = Retriever.load(out, mmap=True)
+
+    for query in ["passwords expire", "least privilege access", "incident response"]:
+        a = fresh.retrieve(query, k=3)
+        b = loaded.retrieve(query, k=3)
+        assert [r.chunk for r in a] == [r.chunk for r in b]
+        assert np.allclose([r.score for r in a], [r.score for r in b])
+
+
+def test_mmapped_store_detaches_before_add(tmp_path):
+    out = tmp_path / "index"
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    loaded = Retriever.load(out, mmap=True)
+    before = len(loaded.store)
+
+    extra = build_retriever_from_folder("data/docs", chunk_size=300, overlap=50, dim=256)
+    chunks = [r.chunk for r in extra.retrieve("passwords", k=1)]
+    loaded.store.add(loaded.embedder.embed_texts([c.text for c in chunks]), chunks)
+    assert len(loaded.store) == before + 1
+
+
+def test_load_or_build_falls_back_on_mismatched_settings(tmp_path):
+    out = tmp_path / "index"
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+
+    retriever = load_or_build_retriever("data/docs", snapshot_dir=str(out), chunk_size=300, overlap=50, dim=128)
+    assert retriever.store.dim == 128
+
+
+class OtherModel(HashingEmbedder):
+    """Same dim, different vectors as far as the manifest can tell."""
+
+    @property
+    def identity(self):
+        return "other-model:v1"
+
+
+def test_snapshot_of_another_embedder_is_not_served(tmp_path):
+    out = tmp_path / "index"
+    manifest = build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    assert manifest.embedder == HashingEmbedder().identity
+    assert snapshot_problem(out, "data/docs", chunk_size=300, overlap=50, dim=256) is None
+
+    other = OtherModel(dim=256)
+    problem = snapshot_problem(out, "data/docs", chunk_size=300, overlap=50, dim=256, embedder=other.identity)
+    assert problem == f"built with another embedder ({HashingEmbedder().identity})"
+    assert not manifest.matches(chunk_size=300, overlap=50, dim=256, embedder=other.identity)
+    with pytest.raises(ValueError, match="other-model:v1"):
+        Retriever.load(out, embedder=other)
+
+    retriever = load_or_build_retriever(
+        "data/docs", snapshot_dir=str(out), chunk_size=300, overlap=50, dim=256, embedder=other
+    )
+    assert retriever.store._mmap_path is None  # rebuilt in memory with the running embedder
+
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256, embedder=other)
+    assert read_manifest(out).embedder == "other-model:v1"
+    assert Retriever.load(out, embedder=other).embedder is other
+
+
+def test_unsupported_snapshot_version_is_rejected(tmp_path):
+    out = tmp_path / "index"
+    build_snapshot("data/docs", str(out), chunk_size=300, overlap=50, dim=256)
+    data = json.loads((out / MANIFEST_FILE).read_text())
+    data["version"] = SNAPSHOT_VERSION + 1
+    (out / MANIFEST_FILE).write_text(json.dumps(data))
+
+    with pytest.raises(ValueError):
+        Retriever.load(out)
+
+
+def test_index_builder_cli_writes_snapshot(tmp_path):
+    out = tmp_path / "cli_index"
+    main(["--docs", "data/docs", "--out", str(out), "--chunk-size", "300", "--overlap", "50"])
+    assert read_manifest(out).chunk_size == 300
@@ -0,0 +1,165 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from app.models.documents import Chunk
+from app.rag.embeddings import HashingEmbedder, SparseRows
+from app.rag.incremental import IncrementalIndexer
+from app.rag.index_builder import build_snapshot, load_or_build_retriever
+from app.rag.ingest import IngestPipeline
+from app.rag.retriever import Retriever
+from app.rag.sparse_index import SparseIndex
+from app.rag.vector_store import FaissVectorStore, IndexSpec, SparseVectorStore
+from benchmarks.common import synthetic_chunks, write_synthetic_docs
+
+SPARSE = IndexSpec(kind="sparse")
+
+
+def _chunks(texts, team_count=3):
+    return [
+        Chunk(doc_id="d", chunk_id=f"d_{i}", text=t, metadata={"team": f"t{i % team_count}"})
+        for i, t in enumerate(texts)
+    ]
+
+
+def _stores(n=400, dim=256):
+    embedder = HashingEmbedder(dim=dim)
+    texts = synthetic_chunks(n, tokens_per_chunk=20)
+    chunks = _chunks(texts)
+    dense = FaissVectorStore(dim=dim)
+    dense.add(embedder.embed_texts(texts), chunks)
+    sparse = SparseVectorStore(dim=dim, spec=SPARSE)
+    # several adds: the index merges segments as it grows
+    for start in range(0, n, 64):
+        sparse.add(embedder.embed_sparse(texts[start:start + 64]), chunks[start:start + 64])
+    return embedder, dense, sparse
+
+
+def _ids(results):
+    return [r.id for r in results]
+
+
+def test_sparse_rows_match_dense_embeddings():
+    embedder = HashingEmbedder(dim=64)
+    texts = ["Passwords expire", "", "the the access review", "VPN access requires MFA"]
+    rows = embedder.embed_sparse(texts)
+    assert len(rows) == 4 and rows.shape == (4, 64)
+    np.testing.assert_allclose(rows.toarray(), embedder.embed_texts(texts), atol=1e-6)
+    assert np.all(np.diff(rows.indices[rows.indptr[2]:rows.indptr[3]]) > 0)
+    np.testing.assert_allclose(SparseRows.vstack([rows[:2], rows[2:]]).toarray(), rows.toarray())
+
+
+def test_sparse_search_matches_exact_dense_search():
+    embedder, dense, sparse = _stores()
+    queries = synthetic_chunks(20, tokens_per_chunk=8, seed=1)
+    expected = dense.search_batch(embedder.embed_texts(queries), k=5)
+    got = sparse.search_batch(embedder.embed_sparse(queries), k=5)
+    for e, g in zip(expected, got):
+        np.testing.assert_allclose([r.score for r in g], [r.score for r in e], atol=1e-5)
+        # same ranking up to float rounding between near-ties
+        exact = {r.id: r.score for r in e}
+        assert all(abs(exact.get(r.id, e[-1].score) - r.score) < 1e-5 for r in g)
+
+    filters = {"team": ["t1"]}
+    for e, g in zip(dense.search_batch(embedder.embed_texts(queries), k=5, filters=filters),
+                    sparse.search_batch(embedder.embed_sparse(queries), k=5, filters=filters)):
+        assert all(r.chunk.metadata["team"] == "t1" for r in g)
+        np.testing.assert_allclose([r.score for r in g], [r.score for r in e], atol=1e-5)
+
+
+def test_only_matching_rows_are_returned():
+    embedder = HashingEmbedder(dim=1 << 16)
+    store = SparseVectorStore(dim=1 << 16, spec=SPARSE)
+    store.add(embedder.embed_sparse(["alpha beta", "gamma delta"]), _chunks(["alpha beta", "gamma delta"]))
+    results = store.search(embedder.embed_sparse(["alpha"]), k=5)
+    assert [r.chunk.chunk_id for r in results] == ["d_0"]
+    assert store.search(embedder.embed_sparse(["unrelated"]), k=5) == []
+    with pytest.raises(ValueError):
+        store.add(embedder.embed_texts(["x"]), _chunks(["x"]))
+
+
+def test_remove_and_readd_ids():
+    embedder, _, sparse = _stores(n=200)
+    query = embedder.embed_sparse([sparse.text(7)])
+    assert sparse.search(query, k=1)[0].id == 7
+
+    assert sparse.remove([7, 8, 999]) == 2
+    assert len(sparse) == sparse.index.ntotal == 198
+    assert 7 not in _ids(sparse.search(query, k=50))
+
+    # re-adding a removed id must not bring back its old postings
+    sparse.add(embedder.embed_sparse(["brand new text"]), _chunks(["brand new text"]), ids=np.array([7]))
+    assert 7 not in _ids(sparse.search(query, k=50))
+    assert sparse.search(embedder.embed_sparse(["brand new text"]), k=1)[0].id == 7
+
+    # removing most rows compacts the postings
+    nnz = sparse.index.nnz
+    sparse.remove(list(range(150)))
+    assert sparse.index.nnz < nnz / 2
+    assert sparse.index.ntotal == len(sparse) == 50
+
+
+def test_copy_is_independent():
+    embedder, _, sparse = _stores(n=100)
+    other = sparse.copy()
+    assert isinstance(other, SparseVectorStore)
+    other.remove([0])
+    other.add(embedder.embed_sparse(["extra"]), _chunks(["extra"]))
+    assert len(sparse) == 100 and sparse.index.ntotal == 100
+    assert sparse.search(embedder.embed_sparse([sparse.text(0)]), k=1)[0].id == 0
+
+
+def test_save_and_mmap_load(tmp_path):
+    embedder, _, sparse = _stores(n=200)
+    sparse.remove([3])
+    sparse.save(tmp_path)
+    loaded = SparseVectorStore.load(tmp_path, mmap=True, spec=SPARSE)
+    assert isinstance(loaded.index.segments[0].ids, np.memmap)
+
+    queries = embedder.embed_sparse(synthetic_chunks(10, tokens_per_chunk=8, seed=2))
+    for e, g in zip(sparse.search_batch(queries, k=5), loaded.search_batch(queries, k=5)):
+        np.testing.assert_allclose([r.score for r in g], [r.score for r in e], atol=1e-6)
+
+    # updates go to new segments; the mmapped postings are never written
+    assert loaded.remove([4]) == 1
+    loaded.add(embedder.embed_sparse(["fresh text"]), _chunks(["fresh text"]))
+    assert loaded.search(embedder.embed_sparse(["fresh text"]), k=1)[0].chunk.text == "fresh text"
+    assert SparseIndex.load(tmp_path).ntotal == 199
+
+
+def test_sparse_spec_is_validated():
+    with pytest.raises(ValueError):
+        IndexSpec(kind="sparse", quantization="fp16")
+    assert SPARSE.is_sparse and not SPARSE.needs_training
+
+
+def test_sparse_snapshot_at_large_dim(tmp_path):
+    folder = tmp_path / "docs"
+    shutil.copytree("data/docs", folder)
+    out = tmp_path / "index"
+    dim = 1 << 20
+    build_snapshot(str(folder), str(out), chunk_size=300, overlap=50, dim=dim, spec=SPARSE)
+
+    retriever = load_or_build_retriever(str(folder), str(out), chunk_size=300, overlap=50, dim=dim, spec=SPARSE)
+    assert isinstance(retriever.store, SparseVectorStore)
+    assert retriever.retrieve("password expiry", k=1)[0].chunk.chunk_id == "policy_passwords::chunk_0"
+    assert retriever.retrieve("password expiry", k=1, hybrid_weight=0)[0].chunk.chunk_id == "policy_passwords::chunk_0"
+    # postings, not dim-wide rows
+    assert retriever.store.index.nbytes < 1 << 20
+
+    (folder / "policy_passwords.txt").write_text("Passwords expire after 30 days under the new rules.")
+    updated, stats = IncrementalIndexer(str(folder), chunk_size=300, overlap=50).reindex(retriever)
+    assert stats.added and stats.removed
+    assert "30 days" in updated.retrieve("passwords expire", k=1)[0].chunk.text
+
+
+def test_ingest_pipeline_builds_sparse_index(tmp_path):
+    folder = tmp_path / "docs"
+    write_synthetic_docs(folder, 8, chunks_per_doc=3)
+    retriever, _ = IngestPipeline(
+        str(folder), chunk_size=300, overlap=50, dim=1 << 18, spec=SPARSE, workers=1, batch_size=5
+    ).run()
+    rebuilt = Retriever.from_chunks([c for _, c in retriever.store.items()], dim=1 << 18, spec=SPARSE)
+    query = retriever.store.text(0)
+    assert _ids(retriever.retrieve(query, k=3)) == _ids(rebuilt.retrieve(query, k=3))